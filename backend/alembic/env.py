@@ -5,15 +5,13 @@ from alembic import context
 from sqlmodel import SQLModel
 import sqlmodel
 from models import Resource, Recommendation
-import os
-from dotenv import load_dotenv
+from config import settings
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-load_dotenv()
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+config.set_main_option("sqlalchemy.url", settings.database_url)
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -42,7 +40,7 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = os.environ.get("DATABASE_URL")
+    url = settings.database_url
     context.configure(
         url=url,
         target_metadata=target_metadata,
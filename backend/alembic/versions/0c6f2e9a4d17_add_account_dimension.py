@@ -0,0 +1,105 @@
+"""Add account_id to resources, recommendations, refresh state and rollups
+
+Revision ID: 0c6f2e9a4d17
+Revises: 4e1d7a0c2b93
+Create Date: 2026-10-18 23:48:09.551274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6f2e9a4d17'
+down_revision: Union[str, Sequence[str], None] = '4e1d7a0c2b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (old name, new name, columns after account_id) of resource indexes that gain an account_id prefix
+RESOURCE_INDEXES = [
+    ('ix_resource_type_cpu_memory', 'ix_resource_account_type_cpu_memory', ['type', 'cpu_utilization', 'memory_utilization']),
+    ('ix_resource_type_storage_gb', 'ix_resource_account_type_storage_gb', ['type', 'storage_gb']),
+    ('ix_resource_provider_id', 'ix_resource_account_provider_id', ['provider', 'id']),
+    ('ix_resource_type_id', 'ix_resource_account_type_id', ['type', 'id']),
+    ('ix_resource_monthly_cost_id', 'ix_resource_account_monthly_cost_id', ['monthly_cost', 'id']),
+    ('ix_resource_updated_at', 'ix_resource_account_updated_at', ['updated_at']),
+]
+
+
+def _create_rollup_table(*key: str) -> None:
+    op.create_table('costrollup',
+    *(sa.Column(column, sa.String(), nullable=False) for column in key),
+    sa.Column('resources', sa.Integer(), nullable=False),
+    sa.Column('monthly_cost', sa.Float(), nullable=False),
+    sa.Column('open_recommendations', sa.Integer(), nullable=False),
+    sa.Column('potential_savings', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint(*key)
+    )
+
+
+def _backfill_rollups(*key: str) -> None:
+    # Same totals as rollups.rebuild_rollups
+    group = ', '.join(f'r.{column}' for column in key[:-1]) + ", COALESCE(r.instance_type, '')"
+    op.execute(f"""
+        INSERT INTO costrollup ({', '.join(key)}, resources, monthly_cost,
+                                open_recommendations, potential_savings, updated_at)
+        SELECT {group}, COUNT(*), SUM(r.monthly_cost),
+               COALESCE(SUM(o.n), 0), COALESCE(SUM(o.saving), 0), CURRENT_TIMESTAMP
+        FROM resource r
+        LEFT JOIN (
+            SELECT resource_id, COUNT(*) AS n, SUM(potential_saving) AS saving
+            FROM recommendation WHERE NOT implemented GROUP BY resource_id
+        ) o ON o.resource_id = r.id
+        GROUP BY {group}
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant default fills existing rows without rewriting the table on Postgres
+    for table in ('resource', 'recommendation', 'recommendationrefresh'):
+        op.add_column(table, sa.Column('account_id', sa.String(), server_default='default', nullable=False))
+
+    op.drop_constraint('uq_resource_provider_name', 'resource', type_='unique')
+    op.create_unique_constraint('uq_resource_account_provider_name', 'resource', ['account_id', 'provider', 'name'])
+    op.create_index('ix_resource_account_id', 'resource', ['account_id', 'id'], unique=False)
+    for old, new, columns in RESOURCE_INDEXES:
+        op.drop_index(old, table_name='resource')
+        op.create_index(new, 'resource', ['account_id', *columns], unique=False)
+
+    op.drop_index('ix_recommendation_potential_saving_id', table_name='recommendation')
+    op.create_index('ix_recommendation_account_id', 'recommendation', ['account_id', 'id'], unique=False)
+    op.create_index('ix_recommendation_account_potential_saving_id', 'recommendation',
+                    ['account_id', sa.text('potential_saving DESC'), 'id'], unique=False)
+    op.create_index('ix_recommendationrefresh_account_id', 'recommendationrefresh', ['account_id'], unique=True)
+
+    # The rollup key gains the account; the table is derived, so rebuild it
+    op.drop_table('costrollup')
+    _create_rollup_table('account_id', 'provider', 'type', 'instance_type')
+    _backfill_rollups('account_id', 'provider', 'type', 'instance_type')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('costrollup')
+    _create_rollup_table('provider', 'type', 'instance_type')
+    _backfill_rollups('provider', 'type', 'instance_type')
+
+    op.drop_index('ix_recommendationrefresh_account_id', table_name='recommendationrefresh')
+    op.drop_index('ix_recommendation_account_potential_saving_id', table_name='recommendation')
+    op.drop_index('ix_recommendation_account_id', table_name='recommendation')
+    op.create_index('ix_recommendation_potential_saving_id', 'recommendation', [sa.text('potential_saving DESC'), 'id'], unique=False)
+
+    for old, new, columns in RESOURCE_INDEXES:
+        op.drop_index(new, table_name='resource')
+        op.create_index(old, 'resource', columns, unique=False)
+    op.drop_index('ix_resource_account_id', table_name='resource')
+    # Fails if two accounts share a (provider, name)
+    op.drop_constraint('uq_resource_account_provider_name', 'resource', type_='unique')
+    op.create_unique_constraint('uq_resource_provider_name', 'resource', ['provider', 'name'])
+
+    for table in ('recommendationrefresh', 'recommendation', 'resource'):
+        op.drop_column(table, 'account_id')
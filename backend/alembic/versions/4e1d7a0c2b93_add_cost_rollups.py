@@ -0,0 +1,51 @@
+"""Add per-group cost rollups
+
+Revision ID: 4e1d7a0c2b93
+Revises: b9052c0cc335
+Create Date: 2026-10-18 23:05:17.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1d7a0c2b93'
+down_revision: Union[str, Sequence[str], None] = 'b9052c0cc335'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('costrollup',
+    sa.Column('provider', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('instance_type', sa.String(), nullable=False),
+    sa.Column('resources', sa.Integer(), nullable=False),
+    sa.Column('monthly_cost', sa.Float(), nullable=False),
+    sa.Column('open_recommendations', sa.Integer(), nullable=False),
+    sa.Column('potential_savings', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('provider', 'type', 'instance_type')
+    )
+    # Backfill from the existing fleet (same totals as rollups.rebuild_rollups)
+    op.execute("""
+        INSERT INTO costrollup (provider, type, instance_type, resources, monthly_cost,
+                                open_recommendations, potential_savings, updated_at)
+        SELECT r.provider, r.type, COALESCE(r.instance_type, ''), COUNT(*), SUM(r.monthly_cost),
+               COALESCE(SUM(o.n), 0), COALESCE(SUM(o.saving), 0), CURRENT_TIMESTAMP
+        FROM resource r
+        LEFT JOIN (
+            SELECT resource_id, COUNT(*) AS n, SUM(potential_saving) AS saving
+            FROM recommendation WHERE NOT implemented GROUP BY resource_id
+        ) o ON o.resource_id = r.id
+        GROUP BY r.provider, r.type, COALESCE(r.instance_type, '')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('costrollup')
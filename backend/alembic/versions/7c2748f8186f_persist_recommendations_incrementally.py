@@ -0,0 +1,38 @@
+"""Persist recommendations with incremental refresh
+
+Revision ID: 7c2748f8186f
+Revises: f3f18cb49d7c
+Create Date: 2026-10-18 10:03:17.552810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2748f8186f'
+down_revision: Union[str, Sequence[str], None] = 'f3f18cb49d7c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('recommendationrefresh',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('last_refreshed_at', sa.DateTime(), nullable=False),
+    sa.Column('rules_fingerprint', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_resource_updated_at', 'resource', ['updated_at'], unique=False)
+    op.create_index('ix_recommendation_resource_id_implemented', 'recommendation', ['resource_id', 'implemented'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recommendation_resource_id_implemented', table_name='recommendation')
+    op.drop_index('ix_resource_updated_at', table_name='resource')
+    op.drop_table('recommendationrefresh')
@@ -0,0 +1,63 @@
+"""Add utilization samples, daily rollups and resource p95 columns
+
+Revision ID: b9052c0cc335
+Revises: da9eef12dc6b
+Create Date: 2026-10-18 19:12:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9052c0cc335'
+down_revision: Union[str, Sequence[str], None] = 'da9eef12dc6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # Daily range partitions are created on ingest (metrics_store.ensure_sample_partitions)
+        op.execute("""
+            CREATE TABLE resourcemetricsample (
+                resource_id integer NOT NULL,
+                recorded_at timestamp without time zone NOT NULL,
+                cpu_utilization double precision,
+                memory_utilization double precision,
+                PRIMARY KEY (resource_id, recorded_at)
+            ) PARTITION BY RANGE (recorded_at)
+        """)
+    else:
+        op.create_table('resourcemetricsample',
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime(), nullable=False),
+        sa.Column('cpu_utilization', sa.Float(), nullable=True),
+        sa.Column('memory_utilization', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('resource_id', 'recorded_at')
+        )
+    op.create_table('resourcemetricrollup',
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.Column('cpu_sketch', sa.LargeBinary(), nullable=False),
+    sa.Column('memory_sketch', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('resource_id', 'day')
+    )
+    op.create_index('ix_resourcemetricrollup_updated_at', 'resourcemetricrollup', ['updated_at'], unique=False)
+    op.add_column('resource', sa.Column('cpu_p95', sa.Float(), nullable=True))
+    op.add_column('resource', sa.Column('memory_p95', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('resource', 'memory_p95')
+    op.drop_column('resource', 'cpu_p95')
+    op.drop_index('ix_resourcemetricrollup_updated_at', table_name='resourcemetricrollup')
+    op.drop_table('resourcemetricrollup')
+    # Drops the partitions with it on Postgres
+    op.drop_table('resourcemetricsample')
@@ -0,0 +1,28 @@
+"""Add index for recommendations sorted by potential saving
+
+Revision ID: b9dc7e7be395
+Revises: d59d40a5feaf
+Create Date: 2026-10-18 12:41:52.307116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9dc7e7be395'
+down_revision: Union[str, Sequence[str], None] = 'd59d40a5feaf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_recommendation_potential_saving_id', 'recommendation', [sa.text('potential_saving DESC'), 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recommendation_potential_saving_id', table_name='recommendation')
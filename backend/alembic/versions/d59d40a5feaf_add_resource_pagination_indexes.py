@@ -0,0 +1,32 @@
+"""Add indexes for keyset pagination of resources
+
+Revision ID: d59d40a5feaf
+Revises: 7c2748f8186f
+Create Date: 2026-10-18 11:26:05.914372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd59d40a5feaf'
+down_revision: Union[str, Sequence[str], None] = '7c2748f8186f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_resource_provider_id', 'resource', ['provider', 'id'], unique=False)
+    op.create_index('ix_resource_type_id', 'resource', ['type', 'id'], unique=False)
+    op.create_index('ix_resource_monthly_cost_id', 'resource', ['monthly_cost', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_resource_monthly_cost_id', table_name='resource')
+    op.drop_index('ix_resource_type_id', table_name='resource')
+    op.drop_index('ix_resource_provider_id', table_name='resource')
@@ -0,0 +1,28 @@
+"""Add (provider, name) unique key for bulk upserts
+
+Revision ID: da9eef12dc6b
+Revises: b9dc7e7be395
+Create Date: 2026-10-18 14:08:33.716254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'da9eef12dc6b'
+down_revision: Union[str, Sequence[str], None] = 'b9dc7e7be395'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_unique_constraint('uq_resource_provider_name', 'resource', ['provider', 'name'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_resource_provider_name', 'resource', type_='unique')
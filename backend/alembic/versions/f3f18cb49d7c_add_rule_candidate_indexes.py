@@ -0,0 +1,30 @@
+"""Add indexes for rule candidate filtering
+
+Revision ID: f3f18cb49d7c
+Revises: 5f03b93a1f28
+Create Date: 2026-10-18 09:12:41.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3f18cb49d7c'
+down_revision: Union[str, Sequence[str], None] = '5f03b93a1f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_resource_type_cpu_memory', 'resource', ['type', 'cpu_utilization', 'memory_utilization'], unique=False)
+    op.create_index('ix_resource_type_storage_gb', 'resource', ['type', 'storage_gb'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_resource_type_storage_gb', table_name='resource')
+    op.drop_index('ix_resource_type_cpu_memory', table_name='resource')
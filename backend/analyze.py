@@ -0,0 +1,144 @@
+"""Offline analysis of a resource export, without a database or the web stack.
+
+Runs the API's rules over a CSV (e.g. from fleetgen.py or ingest.py's
+input) or Parquet export (needs the optional pyarrow package), a chunk at
+a time. Only the core modules are imported (optimizer, rules, columnar,
+catalog, records), not SQLAlchemy, FastAPI or config, so jobs start quickly
+and need no DATABASE_URL. Rows are checked like ingest.py's input, except
+that `name` is optional; rows without an `id` column are numbered from 1.
+
+CLI usage:
+    python analyze.py fleet.csv                                   # summary as JSON
+    python analyze.py fleet.parquet --recommendations recs.ndjson
+    python analyze.py fleet.csv --vectorized --downsize-cpu-threshold 20
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import fields
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from columnar import ResourceRow
+from optimizer import OptimizationEngine
+from records import IngestError, normalize_row, parse_lines
+from rules import RuleThresholds
+
+DEFAULT_CHUNK_SIZE = 50_000
+# An export's rows need no name: it only labels the recommendations
+REQUIRED_FIELDS = ("type", "provider", "monthly_cost")
+
+
+def normalize_record(raw: Dict[str, Any], line: int) -> Dict[str, Any]:
+    """An export record checked and coerced like an ingested row, keeping its `id`."""
+    record = normalize_row(raw, line, required=REQUIRED_FIELDS)
+    value = raw.get("id")
+    try:
+        record["id"] = None if value in ("", None) else int(value)
+    except (TypeError, ValueError):
+        raise IngestError(line, f"invalid id: {value!r}")
+    return record
+
+
+def read_records(path: str, fmt: str = "csv") -> Iterator[Dict[str, Any]]:
+    """Checked rows of a CSV file (- for stdin) or Parquet file as dicts.
+
+    Raises IngestError for a malformed row, naming its CSV line (or Parquet
+    row, counted from 1).
+    """
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:  # optional: only Parquet input needs it
+            raise ImportError("Reading Parquet needs the optional pyarrow package") from None
+        line = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=DEFAULT_CHUNK_SIZE):
+            for line, raw in enumerate(batch.to_pylist(), line + 1):
+                yield normalize_record(raw, line)
+        return
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    with stream:
+        yield from parse_lines(stream, "csv", normalize=normalize_record)
+
+
+def to_row(record: Dict[str, Any], position: int) -> ResourceRow:
+    """ResourceRow from a checked record; `position` stands in for a missing id."""
+    row = ResourceRow._make(record.get(field) for field in ResourceRow._fields)
+    return row if row.id is not None else row._replace(id=position)
+
+
+def analyze_export(records: Iterable[Dict[str, Any]], optimizer: OptimizationEngine,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   on_recommendations: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
+    """Summary of the recommendations for checked export records (see
+    read_records), analyzed
+    `chunk_size` rows at a time. Each chunk's recommendations (with the
+    resource's name, when the export has one) go to `on_recommendations`."""
+    total_resources, total_monthly_cost, total_savings, open_recommendations = 0, 0.0, 0.0, 0
+    rows: List[ResourceRow] = []
+    names: Dict[int, str] = {}
+
+    def flush() -> None:
+        nonlocal total_resources, total_monthly_cost, total_savings, open_recommendations
+        recommendations = optimizer.analyze_rows(rows)
+        total_resources += len(rows)
+        total_monthly_cost += sum(row.monthly_cost for row in rows)
+        total_savings += sum(rec["potential_saving"] for rec in recommendations)
+        open_recommendations += len(recommendations)
+        if on_recommendations is not None and recommendations:
+            on_recommendations([{**rec, "name": names[rec["resource_id"]]} if rec["resource_id"] in names else rec
+                                for rec in recommendations])
+        rows.clear()
+        names.clear()
+
+    for position, record in enumerate(records, start=1):
+        row = to_row(record, position)
+        rows.append(row)
+        if record.get("name"):
+            names[row.id] = record["name"]
+        if len(rows) >= chunk_size:
+            flush()
+    if rows:
+        flush()
+    return optimizer.build_summary(total_resources, total_monthly_cost, total_savings, open_recommendations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or Parquet export, or - for CSV on stdin")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the file extension")
+    parser.add_argument("--recommendations", metavar="PATH", help="also write recommendations as NDJSON (- for stdout)")
+    parser.add_argument("--vectorized", action="store_true", help="NumPy columnar rule evaluation")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    # Same thresholds and defaults as the API's settings
+    for threshold in fields(RuleThresholds):
+        parser.add_argument(f"--{threshold.name.replace('_', '-')}", type=threshold.type, default=threshold.default)
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.path.endswith((".parquet", ".pq")) else "csv")
+    thresholds = RuleThresholds(**{threshold.name: getattr(args, threshold.name) for threshold in fields(RuleThresholds)})
+    optimizer = OptimizationEngine(thresholds=thresholds, vectorized=args.vectorized)
+
+    out = None
+    if args.recommendations:
+        out = sys.stdout if args.recommendations == "-" else open(args.recommendations, "w", encoding="utf-8")
+
+    def write(recommendations: List[Dict[str, Any]]) -> None:
+        out.writelines(json.dumps(rec) + "\n" for rec in recommendations)
+
+    start = time.perf_counter()
+    try:
+        summary = analyze_export(read_records(args.path, fmt), optimizer, args.chunk_size,
+                                 write if out is not None else None)
+    except IngestError as e:
+        raise SystemExit(f"error: {e}")
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - start
+    # Keep stdout for the recommendations when they go there
+    print(json.dumps(summary, indent=2), file=sys.stderr if out is sys.stdout else sys.stdout)
+    print(f"Analyzed {summary['total_resources']} resources in {seconds:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
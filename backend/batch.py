@@ -0,0 +1,187 @@
+"""Full analysis of one account's fleet, sharded by id range across worker processes.
+
+Each worker opens its own engine, streams its shard's candidate rows in
+chunks and returns only totals, so the parent never holds the inventory.
+Like /summary, savings of implemented recommendations are left out.
+Use `run_batch()` from a background job, or the CLI:
+
+    python batch.py [--account team-a] [--workers 8] [--shards 32] [--chunk-size 50000]
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Engine, and_, create_engine, func
+from sqlmodel import Session, select
+from models import DEFAULT_ACCOUNT, Resource
+from optimizer import OptimizationEngine
+from recommendation_store import still_implemented
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+@dataclass
+class ShardResult:
+    shard: int
+    first_id: int
+    last_id: int
+    resources: int
+    monthly_cost: float
+    candidates: int
+    recommendations: int
+    potential_savings: float
+    by_type: Dict[str, int] = field(default_factory=dict)
+    fetch_seconds: float = 0.0
+    analyze_seconds: float = 0.0
+    pid: int = 0
+
+
+@dataclass
+class BatchReport:
+    summary: Dict[str, Any]
+    shards: List[ShardResult]
+    workers: int
+    seconds: float
+    account_id: str = DEFAULT_ACCOUNT
+
+
+def shard_ranges(session: Session, shards: int, account_id: str = DEFAULT_ACCOUNT) -> List[Tuple[int, int]]:
+    """Inclusive id ranges holding roughly equal numbers of the account's resources."""
+    bucket = func.ntile(shards).over(order_by=Resource.id).label("bucket")
+    ids = select(Resource.id, bucket).where(Resource.account_id == account_id).subquery()
+    return [tuple(r) for r in session.exec(
+        select(func.min(ids.c.id), func.max(ids.c.id)).group_by(ids.c.bucket).order_by(ids.c.bucket)
+    ).all()]
+
+
+# Per-process state, set up once by _init_worker
+_engine: Optional[Engine] = None
+_optimizer: Optional[OptimizationEngine] = None
+
+
+def _init_worker(database_url: str, optimizer: OptimizationEngine) -> None:
+    global _engine, _optimizer
+    # A fresh single-connection engine: pools must not be shared across processes
+    options = {} if database_url.startswith("sqlite") else {"pool_size": 1, "max_overflow": 0}
+    _engine = create_engine(database_url, **options)
+    _optimizer = optimizer
+
+
+def analyze_shard(shard: int, first_id: int, last_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  account_id: str = DEFAULT_ACCOUNT) -> ShardResult:
+    """Analyze the account's resources with ids in [first_id, last_id]; runs in a worker."""
+    optimizer = _optimizer
+    # Other accounts' ids interleave with the account's inside the range
+    in_shard = and_(Resource.account_id == account_id, Resource.id.between(first_id, last_id))
+    result = ShardResult(shard, first_id, last_id, 0, 0.0, 0, 0, 0.0, pid=os.getpid())
+    by_type: Counter = Counter()
+
+    with Session(_engine) as session:
+        start = time.perf_counter()
+        result.resources, result.monthly_cost = session.exec(
+            select(func.count(Resource.id), func.coalesce(func.sum(Resource.monthly_cost), 0.0)).where(in_shard)
+        ).one()
+        closed = still_implemented(session, select(Resource.id).where(in_shard))
+        source = select(*optimizer.candidate_columns(Resource)).where(in_shard).subquery("candidate")
+        rows = session.exec(
+            select(*source.c).where(optimizer.candidate_filter(source.c)).execution_options(yield_per=chunk_size)
+        )
+        for chunk in rows.partitions():
+            fetched = time.perf_counter()
+            result.fetch_seconds += fetched - start
+            recommendations = optimizer.analyze_rows(chunk)
+            if closed:
+                recommendations = [r for r in recommendations
+                                   if (r["resource_id"], r["recommendation_type"]) not in closed]
+            result.candidates += len(chunk)
+            result.recommendations += len(recommendations)
+            result.potential_savings += sum(r["potential_saving"] for r in recommendations)
+            by_type.update(r["recommendation_type"] for r in recommendations)
+            start = time.perf_counter()
+            result.analyze_seconds += start - fetched
+        result.fetch_seconds += time.perf_counter() - start
+
+    result.by_type = dict(by_type)
+    return result
+
+
+def merge_results(optimizer: OptimizationEngine, results: List[ShardResult]) -> Dict[str, Any]:
+    """Fleet summary from per-shard totals, shaped like /summary."""
+    summary = optimizer.build_summary(
+        sum(r.resources for r in results),
+        sum(r.monthly_cost for r in results),
+        sum(r.potential_savings for r in results),
+        sum(r.recommendations for r in results),
+    )
+    by_type: Counter = Counter()
+    for r in results:
+        by_type.update(r.by_type)
+    summary["recommendations_by_type"] = dict(by_type)
+    return summary
+
+
+def run_batch(optimizer: Optional[OptimizationEngine] = None, database_url: Optional[str] = None,
+              workers: Optional[int] = None, shards: Optional[int] = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, account_id: str = DEFAULT_ACCOUNT) -> BatchReport:
+    """Analyze the account's whole fleet across `workers` processes (default: CPU count).
+
+    More shards than workers (default 4 per worker) keeps every core busy
+    when shards take uneven time.
+    """
+    from config import settings
+
+    optimizer = optimizer or OptimizationEngine(
+        thresholds=settings.rule_thresholds(), vectorized=settings.optimizer_vectorized,
+        utilization=settings.utilization_source, utilization_window_days=settings.utilization_window_days,
+    )
+    database_url = database_url or settings.database_url
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * 4
+
+    start = time.perf_counter()
+    engine = create_engine(database_url)
+    try:
+        with Session(engine) as session:
+            ranges = shard_ranges(session, shards, account_id)
+    finally:
+        engine.dispose()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(database_url, optimizer)) as pool:
+        futures = [pool.submit(analyze_shard, i, first, last, chunk_size, account_id)
+                   for i, (first, last) in enumerate(ranges)]
+        results = [f.result() for f in futures]
+
+    return BatchReport(merge_results(optimizer, results), results, workers, time.perf_counter() - start, account_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--account", default=DEFAULT_ACCOUNT, help="account to analyze")
+    parser.add_argument("--workers", type=int, help="default: CPU count")
+    parser.add_argument("--shards", type=int, help="default: 4 per worker")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows fetched per round trip")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = run_batch(workers=args.workers, shards=args.shards, chunk_size=args.chunk_size, account_id=args.account)
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+        return
+
+    print(f"{'shard':>5} {'ids':>23} {'resources':>10} {'recs':>8} {'fetch s':>8} {'analyze s':>9} {'pid':>7}")
+    for r in report.shards:
+        print(f"{r.shard:>5} {f'{r.first_id}-{r.last_id}':>23} {r.resources:>10} {r.recommendations:>8} "
+              f"{r.fetch_seconds:>8.2f} {r.analyze_seconds:>9.2f} {r.pid:>7}")
+    busy = sum(r.fetch_seconds + r.analyze_seconds for r in report.shards)
+    print(f"{len(report.shards)} shards on {report.workers} workers in {report.seconds:.2f}s "
+          f"({busy / report.seconds:.1f}x parallelism)")
+    print(json.dumps(report.summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Benchmark suite for the optimizer and the API, checked against a stored baseline.
+
+    python benchmark.py                      # SQLite stand-in, 20k resources
+    python benchmark.py --count 1000000 --database-url postgresql+psycopg2://.../cloudopt_bench
+    python benchmark.py --save-baseline      # record the current numbers for this profile
+    python benchmark.py --add-cases          # record only cases the baseline doesn't have yet
+
+The target database is scratch space: its resources and recommendations are
+replaced by a generated fleet (see fleetgen.py). Results are compared with
+bench_baseline.json under a profile key (backend/count); the run exits
+non-zero if any case regressed by more than --tolerance. Baselines are
+machine-specific, so re-save them when the hardware changes; a change that
+adds a case should record just that case with --add-cases, so existing
+numbers (and any regression in them) aren't silently re-baselined.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+from sqlalchemy import delete
+from sqlalchemy.engine import make_url
+from sqlmodel import SQLModel, create_engine
+import fleetgen
+import simulate
+from columnar import ResourceRow
+from ingest import iter_batches
+from models import Resource
+from optimizer import OptimizationEngine
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+# Metrics gated against the baseline, and whether larger is worse. p99 is
+# reported but not gated: over a few hundred requests it mostly measures GC
+# and scheduler noise.
+GATED_METRICS = {"p50_ms": True, "seconds": True, "throughput": False}
+# Resources the optimizer cases hold in memory at once (Resource objects take ~2.4 KiB each)
+OPTIMIZER_CHUNK_SIZE = 100_000
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1)
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+        "throughput": round(len(ordered) / total, 1) if total > 0 else None,
+    }
+
+
+def timed_runs(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Median wall time of `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"seconds": round(statistics.median(times), 4)}
+
+
+def run_optimizer_cases(count: int, seed: int, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """Optimizer cases over the fleet OPTIMIZER_CHUNK_SIZE resources at a time,
+    so memory stays flat from 20k to 10M resources; each case reports the sum
+    of its per-chunk medians."""
+    row_engine, columnar_engine = OptimizationEngine(), OptimizationEngine(vectorized=True)
+    seconds: Dict[str, float] = defaultdict(float)
+    snapshot = simulate.SnapshotBuilder(row_engine)
+    for batch in iter_batches(fleetgen.generate(count, seed), OPTIMIZER_CHUNK_SIZE):
+        resources = [Resource(**row) for row in batch]
+        rows = [ResourceRow._make([row[field] for field in ResourceRow._fields]) for row in batch]
+        recommendations = row_engine.analyze_resources(resources)
+        chunk_cases = {
+            "analyze_resources": lambda: row_engine.analyze_resources(resources),
+            "analyze_rows": lambda: row_engine.analyze_rows(rows),
+            "analyze_resources[vectorized]": lambda: columnar_engine.analyze_resources(resources),
+            "analyze_rows[vectorized]": lambda: columnar_engine.analyze_rows(rows),
+            "calculate_summary": lambda: row_engine.calculate_summary(resources, recommendations),
+        }
+        for case, fn in chunk_cases.items():
+            seconds[case] += timed_runs(fn, repeat)["seconds"]
+        snapshot.add(rows)
+    cases = {case: {"seconds": round(total, 4)} for case, total in seconds.items()}
+    snapshot = snapshot.build()
+    grid = [float(v) for v in range(1, 101)]
+    cases["simulate[100x100]"] = timed_runs(lambda: simulate.simulate(snapshot, row_engine, grid, grid), repeat)
+    return cases
+
+
+def run_startup_cases(repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Cold start of a fresh interpreter importing the offline CLI (optimizer
+    and rules included), as a CLI job or worker pays it."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    run = lambda: subprocess.run([sys.executable, "-c", "import analyze"], cwd=here, env=env, check=True)
+    return {"cold start: import analyze": timed_runs(run, repeat)}
+
+
+def prepare_database(database_url: str, count: int, seed: int) -> None:
+    """Replace the scratch database's contents with a generated fleet."""
+    engine = create_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Every table, dependents first: leftover rollups or samples would skew later cases
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(delete(table))
+        fleetgen.load(conn, fleetgen.generate(count, seed))
+    engine.dispose()
+
+
+def run_api_cases(requests: int) -> Dict[str, Dict[str, float]]:
+    """Time endpoints in-process; DATABASE_URL must point at the scratch database."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    results = {}
+
+    # The first /recommendations call runs a full refresh of the fleet
+    start = time.perf_counter()
+    client.get("/recommendations?limit=1").raise_for_status()
+    results["refresh (first /recommendations)"] = {"seconds": round(time.perf_counter() - start, 4)}
+
+    def walk(path: str) -> List[float]:
+        latencies, cursor = [], None
+        for _ in range(requests):
+            start = time.perf_counter()
+            res = client.get(path + (f"&cursor={cursor}" if cursor else ""))
+            latencies.append(time.perf_counter() - start)
+            res.raise_for_status()
+            cursor = res.headers.get("x-next-cursor")
+        return latencies
+
+    results["GET /resources?limit=100"] = latency_stats(walk("/resources?limit=100"))
+    results["GET /resources?limit=100&type=instance&max_cpu_utilization=20"] = latency_stats(
+        walk("/resources?limit=100&type=instance&max_cpu_utilization=20"))
+    results["GET /recommendations?limit=100"] = latency_stats(walk("/recommendations?limit=100"))
+    results["GET /recommendations?limit=100&sort=potential_saving"] = latency_stats(
+        walk("/recommendations?limit=100&sort=potential_saving"))
+    results["GET /summary"] = latency_stats(walk("/summary?"))
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for case, metrics in baseline.get("cases", {}).items():
+        current = results["cases"].get(case)
+        if current is None:
+            regressions.append(f"{case}: missing from this run")
+            continue
+        for metric, base in metrics.items():
+            if metric not in GATED_METRICS or base is None or current.get(metric) is None:
+                continue
+            value = current[metric]
+            worse = value > base * (1 + tolerance) if GATED_METRICS[metric] else value < base / (1 + tolerance)
+            if worse:
+                regressions.append(f"{case}: {metric} {value} vs baseline {base} (tolerance {tolerance:.0%})")
+    base_rss, rss = baseline.get("peak_rss_mb"), results.get("peak_rss_mb")
+    if base_rss and rss and rss > base_rss * (1 + tolerance):
+        regressions.append(f"peak_rss_mb {rss} vs baseline {base_rss} (tolerance {tolerance:.0%})")
+    return regressions
+
+
+def add_cases(baseline: Dict[str, Any], results: Dict[str, Any]) -> List[str]:
+    """Copy cases of `results` missing from `baseline` into it, leaving the
+    recorded ones untouched; returns the names added."""
+    added = [case for case in results["cases"] if case not in baseline.setdefault("cases", {})]
+    for case in added:
+        baseline["cases"][case] = results["cases"][case]
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20_000, help="resources in the generated fleet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="scratch database (default: a temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint case")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown, e.g. 0.3 = 30%%")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    saving = parser.add_mutually_exclusive_group()
+    saving.add_argument("--save-baseline", action="store_true", help="replace this profile's baseline")
+    saving.add_argument("--add-cases", action="store_true", help="add new cases to this profile's baseline")
+    parser.add_argument("--skip-api", action="store_true", help="optimizer cases only")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    # Must be set before main/config are imported
+    os.environ["DATABASE_URL"] = database_url
+    profile = f"{make_url(database_url).get_backend_name()}/{args.count}" + ("/optimizer" if args.skip_api else "")
+
+    cases = run_optimizer_cases(args.count, args.seed)
+    cases.update(run_startup_cases())
+    if not args.skip_api:
+        prepare_database(database_url, args.count, args.seed)
+        cases.update(run_api_cases(args.requests))
+    results = {"cases": cases, "peak_rss_mb": peak_rss_mb()}
+
+    for case, metrics in cases.items():
+        print(f"{case:<60} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+    print(f"{'peak RSS':<60} {results['peak_rss_mb']} MB")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    if args.save_baseline:
+        baselines[profile] = results
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline '{profile}' to {args.baseline}")
+        return
+    if args.add_cases:
+        if profile not in baselines:
+            raise SystemExit(f"No baseline for '{profile}'; record one with --save-baseline")
+        added = add_cases(baselines[profile], results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Added {', '.join(added) or 'no new cases'} to baseline '{profile}'")
+        return
+    if profile not in baselines:
+        print(f"No baseline for '{profile}'; run with --save-baseline to record one")
+        return
+
+    regressions = compare(results, baselines[profile], args.tolerance)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        raise SystemExit(1)
+    print(f"\nNo regressions against baseline '{profile}'")
+
+
+if __name__ == "__main__":
+    main()
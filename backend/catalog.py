@@ -0,0 +1,118 @@
+"""Instance-type catalog used to right-size over-provisioned instances.
+
+One JSON file per provider in catalog/ lists each type's family, vCPUs,
+memory and hourly list price. At load time every (provider, family) is
+turned into arrays sorted by price, so "cheapest type that fits" is the
+first fitting entry: a scan of a handful of entries per lookup, vectorized
+across all instances of the same type when evaluating in bulk.
+"""
+import glob
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog")
+HOURS_PER_MONTH = 730
+
+
+@dataclass(frozen=True)
+class InstanceType:
+    provider: str
+    instance_type: str
+    family: str
+    vcpu: float
+    memory_gb: float
+    monthly_price: float
+
+
+class FamilyIndex:
+    """The types of one (provider, family), sorted cheapest first."""
+
+    def __init__(self, types: Iterable[InstanceType]):
+        self.types: List[InstanceType] = sorted(types, key=lambda t: (t.monthly_price, t.vcpu, t.memory_gb))
+        self.vcpu = np.array([t.vcpu for t in self.types], dtype=np.float64)
+        self.memory_gb = np.array([t.memory_gb for t in self.types], dtype=np.float64)
+        self.monthly_price = np.array([t.monthly_price for t in self.types], dtype=np.float64)
+
+    def cheapest_fit(self, vcpu: float, memory_gb: float, below_price: float) -> Optional[InstanceType]:
+        for t in self.types:
+            if t.monthly_price >= below_price:
+                return None
+            if t.vcpu >= vcpu and t.memory_gb >= memory_gb:
+                return t
+        return None
+
+    def cheapest_fits(self, vcpu: np.ndarray, memory_gb: np.ndarray, below_price: float) -> np.ndarray:
+        """Vectorized cheapest_fit: index into `types` per row, -1 where nothing cheaper fits."""
+        fits = ((self.vcpu[None, :] >= vcpu[:, None]) & (self.memory_gb[None, :] >= memory_gb[:, None])
+                & (self.monthly_price[None, :] < below_price))
+        first = np.argmax(fits, axis=1)
+        return np.where(fits.any(axis=1), first, -1)
+
+
+class InstanceCatalog:
+    """Instance types indexed by (provider, type) and by (provider, family)."""
+
+    def __init__(self, types: Iterable[InstanceType], fingerprint: str = ""):
+        self.by_type: Dict[Tuple[str, str], InstanceType] = {}
+        grouped: Dict[Tuple[str, str], List[InstanceType]] = {}
+        for t in types:
+            self.by_type[(t.provider, t.instance_type)] = t
+            grouped.setdefault((t.provider, t.family), []).append(t)
+        self.families: Dict[Tuple[str, str], FamilyIndex] = {key: FamilyIndex(ts) for key, ts in grouped.items()}
+        # Changes whenever the catalog contents change (see Rule.cache_key)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, directory: str = CATALOG_DIR) -> "InstanceCatalog":
+        types, digest = [], hashlib.sha1()
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path, "rb") as f:
+                raw = f.read()
+            digest.update(raw)
+            document = json.loads(raw)
+            for entry in document["instance_types"]:
+                types.append(InstanceType(
+                    provider=document["provider"],
+                    instance_type=entry["instance_type"],
+                    family=entry["family"],
+                    vcpu=float(entry["vcpu"]),
+                    memory_gb=float(entry["memory_gb"]),
+                    monthly_price=entry["hourly_price"] * HOURS_PER_MONTH,
+                ))
+        return cls(types, digest.hexdigest()[:16])
+
+    def __len__(self) -> int:
+        return len(self.by_type)
+
+    def get(self, provider: str, instance_type: str) -> Optional[InstanceType]:
+        return self.by_type.get((provider, instance_type))
+
+    def family(self, current: InstanceType) -> FamilyIndex:
+        return self.families[(current.provider, current.family)]
+
+    def rightsize(self, provider: str, instance_type: str, cpu_utilization: float,
+                  memory_utilization: float, headroom: float) -> Optional[Tuple[InstanceType, InstanceType]]:
+        """(current, target): the cheapest type in the same family that fits
+        observed usage plus `headroom` (a fraction) and costs less. None if
+        the type is unknown or nothing cheaper fits."""
+        current = self.get(provider, instance_type)
+        if current is None:
+            return None
+        scale = 1 + headroom
+        target = self.family(current).cheapest_fit(
+            current.vcpu * cpu_utilization / 100 * scale,
+            current.memory_gb * memory_utilization / 100 * scale,
+            current.monthly_price,
+        )
+        return (current, target) if target is not None else None
+
+
+@lru_cache(maxsize=None)
+def load_catalog(directory: str = CATALOG_DIR) -> InstanceCatalog:
+    """The catalog in `directory`, loaded and indexed once per process."""
+    return InstanceCatalog.load(directory)
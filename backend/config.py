@@ -0,0 +1,115 @@
+import os
+import threading
+from typing import Any, Dict, Literal, Optional
+from dotenv import load_dotenv
+from pydantic import PrivateAttr
+from pydantic_settings import BaseSettings
+from sqlalchemy.engine import Engine
+from rules import RuleThresholds
+
+load_dotenv()
+
+_engine_lock = threading.Lock()
+
+
+class Settings(BaseSettings):
+    """Application settings, read from the environment (and .env).
+
+    Also owns the database engines: they are created on first use, so
+    importing models or the optimizer never touches the database.
+    """
+    database_url: str = os.environ.get("DATABASE_URL", "")
+    db_echo: bool = False  # log every SQL statement
+    # Async mode uses asyncpg (aiosqlite for SQLite) instead of blocking psycopg2
+    db_async: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800  # seconds; -1 disables
+    db_pool_pre_ping: bool = True
+    # Seconds between background recommendation refreshes (ingests also trigger one); 0 = on change only
+    refresh_interval: float = 60.0
+    refresh_workers: int = 4  # accounts refreshed concurrently (Postgres only)
+    summary_cache_ttl: float = 30.0  # seconds
+    summary_cache_maxsize: int = 128
+    simulation_cache_ttl: float = 3600.0  # seconds; the snapshot is also rebuilt when resources change
+    simulation_cache_maxsize: int = 8  # accounts whose snapshots are kept
+    event_history: int = 1000  # events kept for clients reconnecting to /events with Last-Event-ID
+    event_queue_size: int = 256  # frames a slow /events client may lag before it gets a reset
+    event_keepalive: float = 15.0  # seconds between keepalive comments on an idle /events stream
+    ingest_batch_size: int = 10_000  # rows per COPY batch on /resources/bulk
+    optimizer_vectorized: bool = False  # NumPy columnar rule evaluation
+    # Rules read the latest utilization snapshot, or p95 over a window of metric samples
+    utilization_source: Literal["snapshot", "p95"] = "snapshot"
+    utilization_window_days: int = 14
+    metrics_retention_days: int = 30  # raw samples; daily rollups are kept
+    metrics_enabled: bool = True  # Prometheus metrics at /metrics
+    # Encode large JSON responses straight from column rows with orjson,
+    # skipping per-row model copies and response_model re-validation
+    json_fast_path: bool = True
+    # gzip/brotli (per Accept-Encoding) for fast-path responses of at least this size; 0 disables
+    compression_min_bytes: int = 1024
+    profiler_enabled: bool = False  # expose the sampling profiler under /debug/profiler
+    # Rule thresholds
+    downsize_cpu_threshold: float = 30.0
+    downsize_memory_threshold: float = 50.0
+    shrink_storage_gb_threshold: int = 500
+    shrink_factor: float = 0.7
+    rightsize_headroom: float = 0.3
+
+    _engine: Optional[Engine] = PrivateAttr(default=None)
+    _async_engine: Optional[Any] = PrivateAttr(default=None)
+
+    def engine_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {
+            "echo": self.db_echo,
+            "pool_pre_ping": self.db_pool_pre_ping,
+            "pool_recycle": self.db_pool_recycle,
+        }
+        if not self.database_url.startswith("sqlite"):
+            # SQLite uses a single-connection pool without sizing options
+            options.update(pool_size=self.db_pool_size, max_overflow=self.db_max_overflow,
+                           pool_timeout=self.db_pool_timeout)
+        return options
+
+    def get_engine(self) -> Engine:
+        """The shared sync engine, created on first call."""
+        if self._engine is None:
+            with _engine_lock:
+                if self._engine is None:
+                    from sqlmodel import create_engine
+                    self._engine = create_engine(self.database_url, **self.engine_options())
+        return self._engine
+
+    def get_async_engine(self):
+        """The shared async engine (see DB_ASYNC), created on first call."""
+        if self._async_engine is None:
+            with _engine_lock:
+                if self._async_engine is None:
+                    from sqlalchemy.ext.asyncio import create_async_engine
+                    from database import async_database_url
+                    self._async_engine = create_async_engine(
+                        async_database_url(self.database_url), **self.engine_options()
+                    )
+        return self._async_engine
+
+    def pools(self) -> Dict[str, Any]:
+        """Connection pools of the engines created so far, for monitoring."""
+        pools = {}
+        if self._engine is not None:
+            pools["sync"] = self._engine.pool
+        if self._async_engine is not None:
+            pools["async"] = self._async_engine.sync_engine.pool
+        return pools
+
+    def rule_thresholds(self) -> RuleThresholds:
+        return RuleThresholds(
+            downsize_cpu_threshold=self.downsize_cpu_threshold,
+            downsize_memory_threshold=self.downsize_memory_threshold,
+            shrink_storage_gb_threshold=self.shrink_storage_gb_threshold,
+            shrink_factor=self.shrink_factor,
+            rightsize_headroom=self.rightsize_headroom,
+        )
+
+
+settings = Settings()
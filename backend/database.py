@@ -0,0 +1,86 @@
+from typing import Any, AsyncIterator, Callable, List, TypeVar
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+T = TypeVar("T")
+
+# Async DBAPI driver used for each backend when DB_ASYNC is enabled
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Rewrite a sync database URL (e.g. postgresql+psycopg2://) for its async driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def _all(session: Session, stmt):
+    return session.exec(stmt).all()
+
+
+def _one(session: Session, stmt):
+    return session.exec(stmt).one()
+
+
+def _rows(session: Session, stmt):
+    # Plain rows, like AsyncSession.stream (Session.exec would unwrap one-column rows)
+    return session.connection().execute(stmt)
+
+
+class Database:
+    """Runs session work from async handlers without blocking the event loop.
+
+    Query logic is written once against a sync `Session`; `run(fn, *args)`
+    calls `fn(session, *args)` in a way suited to the configured driver.
+    With the async driver `fn` itself runs on the event loop, so it should
+    only do I/O: CPU-bound work on the results belongs in run_in_threadpool.
+    """
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        raise NotImplementedError
+
+    def partitions(self, stmt, size: int) -> AsyncIterator[List[Any]]:
+        """The rows of `stmt`, `size` at a time, fetched without blocking the loop."""
+        raise NotImplementedError
+
+    async def all(self, stmt) -> list:
+        return await self.run(_all, stmt)
+
+    async def one(self, stmt):
+        return await self.run(_one, stmt)
+
+
+class SyncDatabase(Database):
+    """Blocking driver (psycopg2): session work runs in the threadpool."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await run_in_threadpool(fn, self.session, *args)
+
+    async def partitions(self, stmt, size: int) -> AsyncIterator[List[Any]]:
+        result = await run_in_threadpool(_rows, self.session, stmt.execution_options(yield_per=size))
+        chunks = result.partitions()
+        while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+            yield chunk
+
+
+class AsyncDatabase(Database):
+    """Async driver (asyncpg): `run_sync` drives the same code over non-blocking I/O."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await self.session.run_sync(fn, *args)
+
+    async def partitions(self, stmt, size: int) -> AsyncIterator[List[Any]]:
+        result = await self.session.stream(stmt.execution_options(yield_per=size))
+        async for chunk in result.partitions():
+            yield chunk
@@ -0,0 +1,174 @@
+"""Account-scoped change events, streamed to dashboards as server-sent events.
+
+Instead of re-fetching whole lists to pick up changes, clients subscribe to
+GET /events and apply small deltas:
+
+    resources        {"resources": [ResourceResponse, ...]}  rows changed since the last refresh
+    recommendations  {"resource_ids": [...], "recommendations": [...]}  the open
+                     recommendations of these resources are now exactly these
+    implemented      {"implemented": [{"resource_id", "implemented_at"}, ...]}
+    summary          the account's fleet_summary, when it changed
+    reset            too much changed (or events were missed); re-fetch everything
+
+The background refresh publishes resources/recommendations (ingests reach
+clients through the refresh they trigger), implement endpoints publish
+implemented. The bus is in-process: each API process streams the changes
+it refreshed or implemented itself.
+"""
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Hashable, List, Optional, Set, Tuple
+from sqlmodel import Session, select
+from models import Recommendation, Resource, ResourceResponse
+from serialization import RECOMMENDATION_COLUMNS, encode, recommendation_dicts
+
+EVENT_MAX_ITEMS = 1000  # larger changes are sent as a reset
+RESOURCE_FIELDS = tuple(ResourceResponse.model_fields)
+RESOURCE_COLUMNS = [getattr(Resource, f) for f in RESOURCE_FIELDS]
+
+
+def format_event(event_id: int, event: str, data: Any) -> bytes:
+    """One text/event-stream frame; `data` is encoded once for all subscribers."""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode(), encode(data))
+
+
+class Subscription:
+    """One client's queue of frames, filled from any thread and read on its event loop.
+
+    A client that falls `maxsize` frames behind loses its backlog and gets a
+    reset instead, so a slow reader can't hold memory or block writers.
+    """
+
+    def __init__(self, account_id: str, maxsize: int):
+        self.account_id = account_id
+        self._loop = asyncio.get_running_loop()
+        self._queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize)
+        self.overflows = 0
+
+    def deliver(self, event_id: int, frame: bytes) -> bool:
+        """Queue a frame from any thread; False once the reading loop is closed."""
+        try:
+            self._loop.call_soon_threadsafe(self._put, event_id, frame)
+        except RuntimeError:
+            return False
+        return True
+
+    def _put(self, event_id: int, frame: bytes) -> None:
+        if self._queue.full():
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.overflows += 1
+            frame = format_event(event_id, "reset", {})
+        self._queue.put_nowait(frame)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """The next frame, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """Thread-safe fan-out of change events to the subscribers of an account.
+
+    The last `history` events are kept so a client reconnecting with
+    Last-Event-ID gets what it missed; one that missed more gets a reset.
+    """
+
+    def __init__(self, history: int = 1000, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._history: Deque[Tuple[int, str, bytes]] = deque(maxlen=history)
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._states: Dict[Hashable, Any] = {}
+        self.published = 0
+        self.skipped = 0
+
+    def publish(self, account_id: str, event: str, data: Any) -> int:
+        """Send an event to the account's subscribers; returns its id."""
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            frame = format_event(event_id, event, data)
+            self._history.append((event_id, account_id, frame))
+            # Delivered under the lock, so every subscriber sees events in id order
+            subscribers = self._subscribers.get(account_id, set())
+            for subscription in [s for s in subscribers if not s.deliver(event_id, frame)]:
+                subscribers.discard(subscription)
+            self.published += 1
+        return event_id
+
+    def publish_state(self, account_id: str, event: str, data: Any) -> Optional[int]:
+        """Publish `data` unless it equals the last state published as this
+        event for the account (e.g. an unchanged summary)."""
+        key = (account_id, event)
+        with self._lock:
+            if self._states.get(key) == data:
+                self.skipped += 1
+                return None
+            self._states[key] = data
+        return self.publish(account_id, event, data)
+
+    def subscribe(self, account_id: str, last_event_id: Optional[int] = None) -> Subscription:
+        """Subscribe to the account's events (call on the event loop that reads
+        them), first replaying those after `last_event_id` if given."""
+        subscription = Subscription(account_id, self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                evicted = self._last_id - len(self._history)  # newest id no longer held
+                if evicted <= last_event_id <= self._last_id:
+                    for event_id, account, frame in self._history:
+                        if event_id > last_event_id and account == account_id:
+                            subscription._put(event_id, frame)
+                else:
+                    subscription._put(self._last_id, format_event(self._last_id, "reset", {}))
+            self._subscribers.setdefault(account_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.account_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.account_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "last_event_id": self._last_id,
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+                "skipped": self.skipped,
+            }
+
+
+def refresh_changes(session: Session, account_id: str, since: datetime,
+                    limit: int = EVENT_MAX_ITEMS) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+    """The (event, data) pairs describing the account's resources changed
+    since `since` and their open recommendations: [] when nothing changed,
+    None when more than `limit` resources did (send a reset instead)."""
+    resources = session.exec(
+        select(*RESOURCE_COLUMNS)
+        .where(Resource.account_id == account_id, Resource.updated_at >= since)
+        .order_by(Resource.id)
+        .limit(limit + 1)
+    ).all()
+    if len(resources) > limit:
+        return None
+    if not resources:
+        return []
+    ids = [row.id for row in resources]
+    recommendations = session.exec(
+        select(*RECOMMENDATION_COLUMNS)
+        .where(Recommendation.resource_id.in_(ids), Recommendation.implemented == False)  # noqa: E712
+        .order_by(Recommendation.id)
+    ).all()
+    return [
+        ("resources", {"resources": [dict(zip(RESOURCE_FIELDS, row)) for row in resources]}),
+        ("recommendations", {"resource_ids": ids, "recommendations": recommendation_dicts(recommendations)}),
+    ]
@@ -0,0 +1,136 @@
+"""Reproducible synthetic fleets for benchmarks and load tests.
+
+Rows follow the shapes seen in real inventories: mostly AWS, a 60/40
+instance/storage split, utilization skewed low (plenty of downsize
+candidates, a long busy tail), log-normal volume sizes and per-type prices.
+The same seed always yields the same rows; spreading them over accounts
+only changes their account_id.
+
+CLI usage:
+    python fleetgen.py --count 1000000 --out fleet.csv   # CSV for POST /resources/bulk or ingest.py
+    python fleetgen.py --count 1000000 --db              # straight into DATABASE_URL
+    python fleetgen.py --count 1000000 --accounts 40 --db  # round-robin over account-00 .. account-39
+"""
+import argparse
+import csv
+import sys
+import time
+from typing import Any, Dict, Iterator, List
+import numpy as np
+from columnar import ResourceRow
+from ingest import INGEST_FIELDS, ingest_report, iter_batches, upsert_batch
+from models import DEFAULT_ACCOUNT, Resource
+
+# Provider share of the fleet and on-demand $/month per instance type
+PROVIDERS = {
+    "aws": (0.5, {"t3.medium": 30, "t3.large": 60, "t3.xlarge": 120, "m5.large": 70,
+                  "m5.xlarge": 140, "m5.2xlarge": 280, "c5.xlarge": 125, "r5.xlarge": 185}),
+    "azure": (0.3, {"Standard_B2s": 35, "Standard_D2s_v3": 70, "Standard_D4s_v3": 140, "Standard_E4s_v3": 185}),
+    "gcp": (0.2, {"e2-standard-2": 50, "n1-standard-1": 25, "n1-standard-2": 50, "n1-standard-4": 100}),
+}
+STORAGE_PRICE_PER_GB = {"aws": 0.10, "azure": 0.12, "gcp": 0.10}
+INSTANCE_SHARE = 0.6
+CHUNK_SIZE = 100_000  # part of the seed's meaning: changing it changes the rows
+
+
+def account_name(index: int, accounts: int) -> str:
+    return DEFAULT_ACCOUNT if accounts <= 1 else f"account-{index:02d}"
+
+
+def generate(count: int, seed: int = 42, accounts: int = 1) -> Iterator[Dict[str, Any]]:
+    """Yield `count` resource rows (INGEST_FIELDS plus a 1-based `id`),
+    dealt round-robin over `accounts` accounts."""
+    rng = np.random.default_rng(seed)
+    providers = list(PROVIDERS)
+    provider_p = [PROVIDERS[p][0] for p in providers]
+    instance_types = {p: list(PROVIDERS[p][1]) for p in providers}
+
+    for offset in range(0, count, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, count - offset)
+        provider_idx = rng.choice(len(providers), size=n, p=provider_p)
+        is_instance = rng.random(n) < INSTANCE_SHARE
+        type_draw = rng.random(n)
+        # Beta(2, 5) has mean ~29%: most machines idle along, a few run hot
+        cpu = np.round(rng.beta(2, 5, n) * 100, 1)
+        memory = np.round(np.clip(cpu * 0.6 + rng.normal(25, 12, n), 1, 99), 1)
+        storage_gb = np.clip(rng.lognormal(np.log(200), 1.0, n), 8, 16_384).astype(np.int64)
+        jitter = rng.uniform(0.9, 1.1, n)
+
+        for i in range(n):
+            provider = providers[provider_idx[i]]
+            row_id = offset + i + 1
+            account_id = account_name(row_id % accounts, accounts)
+            if is_instance[i]:
+                prices, types = PROVIDERS[provider][1], instance_types[provider]
+                instance_type = types[int(type_draw[i] * len(types))]
+                yield {
+                    "id": row_id, "account_id": account_id, "name": f"vm-{row_id:08d}", "type": "instance", "provider": provider,
+                    "instance_type": instance_type, "size": None,
+                    "cpu_utilization": float(cpu[i]), "memory_utilization": float(memory[i]),
+                    "storage_gb": None, "monthly_cost": round(prices[instance_type] * float(jitter[i]), 2),
+                }
+            else:
+                gb = int(storage_gb[i])
+                yield {
+                    "id": row_id, "account_id": account_id, "name": f"vol-{row_id:08d}", "type": "storage", "provider": provider,
+                    "instance_type": None, "size": f"{gb}GB",
+                    "cpu_utilization": None, "memory_utilization": None,
+                    "storage_gb": gb, "monthly_cost": round(gb * STORAGE_PRICE_PER_GB[provider] * float(jitter[i]), 2),
+                }
+
+
+def make_resources(count: int, seed: int = 42) -> List[Resource]:
+    """In-memory Resource objects (not attached to a session)."""
+    return [Resource(**row) for row in generate(count, seed)]
+
+
+def make_rows(count: int, seed: int = 42) -> List[ResourceRow]:
+    """The same fleet as compact ResourceRow records, as a column-only query returns it."""
+    fields = ResourceRow._fields
+    return [ResourceRow._make([row[f] for f in fields]) for row in generate(count, seed)]
+
+
+def write_csv(rows: Iterator[Dict[str, Any]], out) -> int:
+    writer = csv.writer(out)
+    writer.writerow(INGEST_FIELDS)
+    total = 0
+    for row in rows:
+        writer.writerow(["" if row[f] is None else row[f] for f in INGEST_FIELDS])
+        total += 1
+    return total
+
+
+def load(conn, rows: Iterator[Dict[str, Any]], batch_size: int = 10_000) -> int:
+    """Upsert generated rows by (account_id, provider, name), letting the database assign ids."""
+    fields = INGEST_FIELDS
+    return sum(upsert_batch(conn, [{f: row[f] for f in fields} for row in batch])
+               for batch in iter_batches(rows, batch_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--accounts", type=int, default=1, help="spread rows over this many accounts")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="CSV path, or - for stdout")
+    target.add_argument("--db", action="store_true", help="upsert into DATABASE_URL")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate(args.count, args.seed, args.accounts)
+    if args.db:
+        from config import settings
+        with settings.get_engine().begin() as conn:
+            total = load(conn, rows)
+    elif args.out == "-":
+        total = write_csv(rows, sys.stdout)
+    else:
+        with open(args.out, "w", newline="", encoding="utf-8") as out:
+            total = write_csv(rows, out)
+    report = ingest_report(total, time.perf_counter() - start)
+    print(f"Generated {report['rows']} resources in {report['seconds']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
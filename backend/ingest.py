@@ -0,0 +1,224 @@
+"""Bulk upsert of Resource rows from CSV or NDJSON.
+
+Rows are matched on (account_id, provider, name); rows without an
+account_id belong to the default account. On Postgres each batch is COPY'd into a
+temporary staging table and merged with INSERT ... ON CONFLICT; SQLite (used
+in tests) falls back to multi-row upserts sized to its bound-variable limit.
+Either way the cost rollups of the batch's resources are moved to their new
+groups (see rollups.py). Lines are parsed and checked by records.py.
+
+CLI usage: python ingest.py resources.csv [--format ndjson] [--batch-size 10000]
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+from sqlalchemy import Connection, column, or_, select, table, tuple_
+from models import Resource
+from records import INGEST_FIELDS, IngestError, Normalizer, normalize_row, parse_lines
+from rollups import tracking
+
+CONFLICT_KEY = ("account_id", "provider", "name")
+# Rewritten on conflict; a row whose values all match is left alone, updated_at included
+UPDATE_FIELDS = tuple(field for field in INGEST_FIELDS if field not in CONFLICT_KEY)
+DEFAULT_BATCH_SIZE = 10_000
+# Bound parameters per statement allowed by SQLite (3.32+; 999 before)
+SQLITE_MAX_VARIABLES = 32_766
+
+STAGING_TABLE = "resource_ingest"
+_STAGING_DDL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+    seq bigserial,
+    account_id text, name text, type text, provider text, instance_type text, size text,
+    cpu_utilization double precision, memory_utilization double precision,
+    storage_gb integer, monthly_cost double precision
+) ON COMMIT DELETE ROWS
+"""
+
+
+class LineBatchParser:
+    """Parses consecutive batches of lines from one upload, remembering the CSV header."""
+
+    def __init__(self, fmt: str, normalize: Normalizer = normalize_row):
+        self.fmt = fmt
+        self.normalize = normalize
+        self.header: Optional[List[str]] = None
+        self.next_line = 1
+        # Line of each row of the last batch, for errors found after parsing
+        self.row_lines: List[int] = []
+
+    def parse(self, lines: List[str]) -> List[Dict[str, Any]]:
+        first = self.next_line
+        self.next_line += len(lines)
+        if self.fmt == "csv" and self.header is None and lines:
+            self.header = next(csv.reader(lines[:1]), None)
+            lines, first = lines[1:], first + 1
+        self.row_lines = []
+
+        def normalize(raw: Dict[str, Any], line: int) -> Dict[str, Any]:
+            self.row_lines.append(line)
+            return self.normalize(raw, line)
+
+        return list(parse_lines(lines, self.fmt, self.header, first, normalize))
+
+
+async def aiter_line_batches(chunks: AsyncIterator[bytes], batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[List[str]]:
+    """Split a streamed request body into batches of lines without buffering it.
+
+    CSV records must not contain embedded newlines. A line that isn't valid
+    UTF-8 raises IngestError.
+    """
+    pending = b""
+    lines: List[str] = []
+    line = 1  # of the next line to decode
+
+    def decode(part: bytes) -> str:
+        try:
+            return part.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError:
+            raise IngestError(line, "invalid UTF-8")
+
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for part in complete:
+            lines.append(decode(part))
+            line += 1
+        if len(lines) >= batch_size:
+            yield lines
+            lines = []
+    if pending:
+        lines.append(decode(pending))
+    if lines:
+        yield lines
+
+
+def ingest_lines(conn: Connection, parser: LineBatchParser, lines: List[str],
+                 write: Optional[Callable[[Connection, List[Dict[str, Any]]], int]] = None) -> int:
+    """Parse one batch of lines and pass it to `write` (default: upsert_batch);
+    meant to run off the event loop."""
+    return (write or upsert_batch)(conn, parser.parse(lines))
+
+
+def iter_batches(rows: Iterable[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def upsert_batch(conn: Connection, rows: List[Dict[str, Any]]) -> int:
+    """Insert or update `rows` by (account_id, provider, name) within the caller's transaction.
+
+    Rows identical to the stored ones are not rewritten and keep their
+    updated_at, so re-sent resources don't count as changed for the refresh.
+
+    The Postgres path uses the raw DBAPI cursor, so the caller must have begun
+    the transaction explicitly (e.g. `engine.begin()`).
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    if conn.dialect.name == "postgresql":
+        _copy_upsert(conn, rows, now)
+    else:
+        _insert_upsert(conn, rows, now)
+    return len(rows)
+
+
+def _copy_upsert(conn: Connection, rows: List[Dict[str, Any]], now: datetime) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # None is written as an empty unquoted field, which COPY reads as NULL
+        writer.writerow([row[field] for field in INGEST_FIELDS])
+    buffer.seek(0)
+
+    columns = ", ".join(INGEST_FIELDS)
+    key = ", ".join(CONFLICT_KEY)
+    updates = ", ".join(f"{field} = EXCLUDED.{field}" for field in UPDATE_FIELDS)
+    current = ", ".join(f"resource.{field}" for field in UPDATE_FIELDS)
+    incoming = ", ".join(f"EXCLUDED.{field}" for field in UPDATE_FIELDS)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(_STAGING_DDL)
+        cursor.copy_expert(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        staged = table(STAGING_TABLE, *(column(field) for field in CONFLICT_KEY))
+        batch = tuple_(*(getattr(Resource, field) for field in CONFLICT_KEY)).in_(select(*staged.c))
+        with tracking(conn, batch, {row["account_id"] for row in rows}):
+            # DISTINCT ON keeps the last occurrence of a key within the batch
+            cursor.execute(
+                f"""
+                INSERT INTO resource ({columns}, created_at, updated_at)
+                SELECT DISTINCT ON ({key}) {columns}, %(now)s, %(now)s
+                FROM {STAGING_TABLE}
+                ORDER BY {key}, seq DESC
+                ON CONFLICT ({key}) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+                WHERE ({current}) IS DISTINCT FROM ({incoming})
+                """,
+                {"now": now},
+            )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+    finally:
+        cursor.close()
+
+
+def _insert_upsert(conn: Connection, rows: List[Dict[str, Any]], now: datetime,
+                   max_variables: int = SQLITE_MAX_VARIABLES) -> None:
+    from sqlalchemy.dialects.sqlite import insert
+
+    latest = list({tuple(row[k] for k in CONFLICT_KEY): row for row in rows}.items())
+    # A multi-row INSERT binds every value: keep each statement under the variable limit
+    per_statement = max(1, max_variables // (len(INGEST_FIELDS) + 2))
+    for start in range(0, len(latest), per_statement):
+        part = dict(latest[start:start + per_statement])
+        stmt = insert(Resource.__table__).values(
+            [{**row, "created_at": now, "updated_at": now} for row in part.values()]
+        )
+        updates = {field: stmt.excluded[field] for field in UPDATE_FIELDS}
+        changed = or_(*(Resource.__table__.c[field].is_distinct_from(stmt.excluded[field]) for field in UPDATE_FIELDS))
+        batch = tuple_(*(getattr(Resource, field) for field in CONFLICT_KEY)).in_(list(part))
+        with tracking(conn, batch, {key[0] for key in part}):
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=list(CONFLICT_KEY), set_={**updates, "updated_at": stmt.excluded.updated_at},
+                where=changed,
+            ))
+
+
+def ingest_report(rows: int, seconds: float) -> Dict[str, Any]:
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def main():
+    from config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    start = time.perf_counter()
+    total = 0
+    with stream, settings.get_engine().begin() as conn:
+        for batch in iter_batches(parse_lines(stream, fmt), args.batch_size):
+            total += upsert_batch(conn, batch)
+    report = ingest_report(total, time.perf_counter() - start)
+    print(f"Upserted {report['rows']} resources in {report['seconds']}s ({report['rows_per_sec']} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Concurrent load test for a running API server.
+
+Start the server once per mode and compare:
+
+    DB_ASYNC=false uvicorn main:app --workers 1 --port 8000
+    python loadtest.py --url http://localhost:8000 --concurrency 64 --duration 20
+
+    DB_ASYNC=true uvicorn main:app --workers 1 --port 8000
+    python loadtest.py --url http://localhost:8000 --concurrency 64 --duration 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+DEFAULT_PATHS = ["/resources?limit=20", "/summary", "/recommendations?limit=50", "/healthz"]
+
+
+async def worker(client: httpx.AsyncClient, paths, deadline: float, latencies, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            res = await client.get(path)
+            if res.status_code >= 400:
+                errors.append(res.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(url: str, paths, concurrency: int, duration: float):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(client, paths, deadline, latencies, errors) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--path", action="append", dest="paths", help="repeatable; defaults to a dashboard mix")
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    latencies, errors = asyncio.run(run(args.url, paths, args.concurrency, args.duration))
+    if not latencies:
+        raise SystemExit(f"No successful requests ({len(errors)} errors)")
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"requests:    {len(latencies)} ok, {len(errors)} errors")
+    print(f"throughput:  {len(latencies) / args.duration:.1f} req/s")
+    print(f"latency p50: {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p99: {p99 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,119 +1,568 @@
-import os
-from fastapi import FastAPI, HTTPException,  Depends, Query
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import FastAPI, HTTPException,  Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.openapi.utils import get_openapi
-from models import RecommendationResponse, RecommendationsListResponse
+from models import (
+    BulkImplementRequest, CostRollup, BulkImplementResponse, RecommendationResponse, RecommendationsListResponse, SimulationRequest,
+)
 from optimizer import OptimizationEngine
+from cache import TTLCache
+from profiler import SamplingProfiler
+from scheduler import RefreshScheduler
+from telemetry import MetricsMiddleware, PoolCollector, instrument_engines, observe_rule, phase, registry
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from serialization import RECOMMENDATION_COLUMNS, encode, encode_line, encode_recommendations, json_response
+from simulate import SNAPSHOT_CHUNK_SIZE, SimulationSnapshot, SnapshotBuilder, simulate, snapshot_query, snapshot_version
+from catalog import load_catalog
+from rollups import BREAKDOWN_FIELDS, cost_breakdown
+from events import EventBus, refresh_changes
+from ingest import IngestError, LineBatchParser, aiter_line_batches, ingest_lines, ingest_report, normalize_row, upsert_batch
+from metrics_store import RollupBuffer, check_sample_accounts, ingest_samples, normalize_sample
+from database import AsyncDatabase, Database, SyncDatabase
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from recommendation_store import (
+    fleet_summary, implement_many, keyset_position, mark_implemented, recommendations_query, refresh_accounts,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel, create_engine, Session
-from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-from typing import List, Dict, Any
-from sqlmodel import Session, select, text
-from models import Resource, ResourceResponse, engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Dict, Any, Literal, Optional
+from sqlmodel import Session, select, text, func
+from models import DEFAULT_ACCOUNT, Resource, ResourceResponse
 from datetime import datetime
 
 
 
-# 1. Load ENV
-load_dotenv()
-# Initialize the optimizer
-optimizer = OptimizationEngine()
+# 1. Settings (loads .env and owns the database engines)
+from config import settings
+
+# 2. Initialize the optimizer
+optimizer = OptimizationEngine(
+    thresholds=settings.rule_thresholds(),
+    vectorized=settings.optimizer_vectorized,
+    utilization=settings.utilization_source,
+    utilization_window_days=settings.utilization_window_days,
+    observer=observe_rule if settings.metrics_enabled else None,
+)
+
+# Summary responses, invalidated on writes (see get_summary)
+SUMMARY_CACHE_KEY = "summary"
+summary_cache = TTLCache(maxsize=settings.summary_cache_maxsize, ttl=settings.summary_cache_ttl)
+# The latest what-if snapshots, keyed by snapshot_version (see simulate.py)
+simulation_cache = TTLCache(maxsize=settings.simulation_cache_maxsize, ttl=settings.simulation_cache_ttl)
+
+# Change feed for /events (see events.py)
+events = EventBus(history=settings.event_history, queue_size=settings.event_queue_size)
+
+def _publish_summary(session: Session, account_id: str) -> None:
+    events.publish_state(account_id, "summary", fleet_summary(session, optimizer, account_id))
+
+def _publish_refresh(session: Session, account_id: str, since: Optional[datetime]) -> None:
+    changes = refresh_changes(session, account_id, since) if since is not None else None
+    if changes == []:
+        return
+    # Resources changed, so the summary may have even when no recommendation
+    # was written (one dropped, or only a cost moved): a /summary cached since
+    # the ingest invalidated it would otherwise be served until the TTL
+    summary_cache.invalidate((SUMMARY_CACHE_KEY, account_id))
+    if changes is None:
+        events.publish(account_id, "reset", {})
+    for event, data in changes or ():
+        events.publish(account_id, event, data)
+    _publish_summary(session, account_id)
 
-# 2. Pydantic Settings Class
-class Settings(BaseSettings):
-    database_url: str = os.environ.get("DATABASE_URL", "")
+def _refresh() -> int:
+    # _publish_refresh invalidates the summaries of accounts whose resources changed
+    return refresh_accounts(settings.get_engine(), optimizer, workers=settings.refresh_workers,
+                            listener=_publish_refresh)
 
-settings = Settings()
+# Recommendations are recomputed in the background; handlers serve the last snapshot
+scheduler = RefreshScheduler(_refresh, interval=settings.refresh_interval)
+SNAPSHOT_AGE_HEADER = "X-Snapshot-Age"
 
-# 3. DB Engine
-engine = create_engine(settings.database_url, echo=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler.start()
+    yield
+    await run_in_threadpool(scheduler.stop)
 
-# 4. App Setup
-app = FastAPI(title="Cloud Optimization Dashboard API")
+# 3. App Setup
+app = FastAPI(title="Cloud Optimization Dashboard API", lifespan=lifespan)
 
-# 5. CORS - Allow frontend dev server
+# 4. CORS - Allow frontend dev server
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],  # Vite default port
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, SNAPSHOT_AGE_HEADER],
 )
 
-# 6. Health Check Endpoint
+# Metrics: request latency, per-statement DB time, pool usage (see telemetry.py)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engines()
+    registry.register(PoolCollector(settings.pools))
+
+profiler = SamplingProfiler()
+
+# 5. Health Check Endpoint
 @app.get("/healthz", tags=["health"])
-def health_check():
+async def health_check():
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        # Pooled connection; pre-ping replaces stale ones transparently
+        if settings.db_async:
+            async with settings.get_async_engine().connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            await run_in_threadpool(_ping)
         return {"status": "ok"}
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
-# 7. Simple Root Path (optional)
+# 6. Simple Root Path (optional)
 @app.get("/")
 def root():
     return {"message": "Hello from FastAPI backend!"}
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+def _ping():
+    with settings.get_engine().connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+async def get_db():
+    if settings.db_async:
+        async with AsyncSession(settings.get_async_engine(), expire_on_commit=False) as session:
+            yield AsyncDatabase(session)
+    else:
+        session = Session(settings.get_engine(), expire_on_commit=False)
+        try:
+            yield SyncDatabase(session)
+        finally:
+            # Closing may roll back on the connection, so keep it off the loop
+            await run_in_threadpool(session.close)
+
+ACCOUNT_HEADER = "X-Account-Id"
+
+def get_account(
+    account_id: Optional[str] = Header(None, alias=ACCOUNT_HEADER, min_length=1, max_length=64,
+                                       description=f"Account to scope the request to (default: {DEFAULT_ACCOUNT})"),
+) -> str:
+    """Every endpoint reads and writes a single account's resources."""
+    return account_id or DEFAULT_ACCOUNT
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+INGEST_MEDIA_TYPES = {"text/csv": "csv", NDJSON_MEDIA_TYPE: "ndjson"}
 
 @app.get("/resources", response_model=List[ResourceResponse], tags=["resources"])
-def list_resources(
+async def list_resources(
+    response: Response,
     limit: int = Query(20, ge=1, le=100, description="Max results to return (default 20, max 100)"),
-    offset: int = Query(0, ge=0, description="How many items to skip (default 0)"),
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    offset: int = Query(0, ge=0, deprecated=True, description="How many items to skip (default 0); prefer cursor"),
+    provider: Optional[str] = Query(None, description="Only resources from this provider"),
+    type: Optional[str] = Query(None, description="Only resources of this type (instance/storage)"),
+    min_monthly_cost: Optional[float] = Query(None, ge=0),
+    max_monthly_cost: Optional[float] = Query(None, ge=0),
+    min_cpu_utilization: Optional[float] = Query(None, ge=0, le=100),
+    max_cpu_utilization: Optional[float] = Query(None, ge=0, le=100),
+    min_memory_utilization: Optional[float] = Query(None, ge=0, le=100),
+    max_memory_utilization: Optional[float] = Query(None, ge=0, le=100),
+    account_id: str = Depends(get_account),
+    db: Database = Depends(get_db)
 ):
-    stmt = select(Resource).offset(offset).limit(limit)
-    resources = session.exec(stmt).all()
+    """List the account's resources ordered by id, using keyset pagination."""
+    stmt = select(Resource).where(Resource.account_id == account_id).order_by(Resource.id)
+    if cursor is not None:
+        # Seek past the previous page instead of counting skipped rows
+        stmt = stmt.where(Resource.id > decode_cursor(cursor, id=int)["id"])
+    if provider is not None:
+        stmt = stmt.where(Resource.provider == provider)
+    if type is not None:
+        stmt = stmt.where(Resource.type == type)
+    if min_monthly_cost is not None:
+        stmt = stmt.where(Resource.monthly_cost >= min_monthly_cost)
+    if max_monthly_cost is not None:
+        stmt = stmt.where(Resource.monthly_cost <= max_monthly_cost)
+    if min_cpu_utilization is not None:
+        stmt = stmt.where(Resource.cpu_utilization >= min_cpu_utilization)
+    if max_cpu_utilization is not None:
+        stmt = stmt.where(Resource.cpu_utilization <= max_cpu_utilization)
+    if min_memory_utilization is not None:
+        stmt = stmt.where(Resource.memory_utilization >= min_memory_utilization)
+    if max_memory_utilization is not None:
+        stmt = stmt.where(Resource.memory_utilization <= max_memory_utilization)
+
+    # Fetch one extra row to know whether another page exists
+    resources = await db.all(stmt.offset(offset).limit(limit + 1))
+    if len(resources) > limit:
+        resources = resources[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": resources[-1].id})
     return resources
 
+def _ingest_format(request: Request, format: Optional[str]) -> str:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = format or INGEST_MEDIA_TYPES.get(content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+    return fmt
+
+async def _ingest_stream(request: Request, parser: LineBatchParser, write, finish=None) -> Dict[str, Any]:
+    """Feed the request body to `write(conn, rows)` in parsed batches, then
+    call `finish(conn)` if given, all in one transaction."""
+    start = time.perf_counter()
+    total = 0
+    conn = await run_in_threadpool(settings.get_engine().connect)
+    try:
+        # Explicit begin: COPY goes through the raw DBAPI cursor, which autobegin doesn't see
+        conn.begin()
+        async for lines in aiter_line_batches(request.stream(), settings.ingest_batch_size):
+            total += await run_in_threadpool(ingest_lines, conn, parser, lines, write)
+        if finish is not None:
+            await run_in_threadpool(finish, conn)
+        await run_in_threadpool(conn.commit)
+    except IngestError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IntegrityError as e:
+        raise HTTPException(status_code=409, detail=str(e.orig))
+    finally:
+        # Rolls back anything left uncommitted
+        await run_in_threadpool(conn.close)
+
+    summary_cache.invalidate()
+    scheduler.notify()
+    return ingest_report(total, time.perf_counter() - start)
+
+@app.post("/resources/bulk", tags=["resources"])
+async def bulk_ingest_resources(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the Content-Type (text/csv or application/x-ndjson)"),
+    account_id: str = Depends(get_account),
+) -> Dict[str, Any]:
+    """Upsert the account's resources by (provider, name) from a streamed CSV
+    or NDJSON body. Rows may omit account_id but not name another account.
+
+    The body is parsed and COPY'd in batches as it arrives, all in one
+    transaction: a malformed row rejects the whole upload.
+    """
+    parser = LineBatchParser(_ingest_format(request, format), partial(normalize_row, account_id=account_id))
+    return await _ingest_stream(request, parser, upsert_batch)
+
+@app.post("/metrics/samples", tags=["resources"])
+async def ingest_metric_samples(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the Content-Type (text/csv or application/x-ndjson)"),
+    account_id: str = Depends(get_account),
+) -> Dict[str, Any]:
+    """Append utilization samples (resource_id, recorded_at, cpu_utilization,
+    memory_utilization) and merge them into the daily p95 sketches.
+
+    Samples must be for the account's resources (422 otherwise); samples
+    already stored are rejected with 409.
+    """
+    parser = LineBatchParser(_ingest_format(request, format), normalize_sample)
+    # Rollups are merged once per upload rather than once per batch
+    rollups = RollupBuffer()
+
+    def write(conn, rows: List[Dict[str, Any]]) -> int:
+        check_sample_accounts(conn, rows, account_id, parser.row_lines)
+        return ingest_samples(conn, rows, rollups=rollups)
+
+    return await _ingest_stream(request, parser, write, rollups.flush)
+
+async def _snapshot() -> Dict[str, Any]:
+    """When the served recommendations were computed. Before the first
+    background run completes, the caller waits for (or joins) a refresh;
+    if that fails too there is nothing to serve yet (503)."""
+    if scheduler.refreshed_at is None:
+        try:
+            await run_in_threadpool(scheduler.refresh_now)
+        except Exception:
+            pass  # recorded in scheduler.last_error
+        if scheduler.refreshed_at is None:
+            raise HTTPException(status_code=503, detail=f"Recommendations are not available yet: {scheduler.last_error}")
+    return {"refreshed_at": scheduler.refreshed_at, "snapshot_age_seconds": round(scheduler.age(), 3)}
+
+# Keyset columns of each sort order and the type a cursor must carry for each
+RECOMMENDATION_SORT_KEYS = {"id": {"id": int}, "potential_saving": {"potential_saving": float, "id": int}}
+
+def _ndjson_line(rec):
+    if settings.json_fast_path:
+        return encode_line(rec)
+    return RecommendationResponse.model_validate(rec, from_attributes=True).model_dump_json() + "\n"
+
+def _stream_recommendations(stmt):
+    """Yield one JSON line per recommendation, fetching rows in batches."""
+    with Session(settings.get_engine()) as session:
+        for rec in session.exec(stmt.execution_options(yield_per=1000)):
+            yield _ndjson_line(rec)
+
+async def _stream_recommendations_async(stmt):
+    """Async variant of _stream_recommendations over a server-side cursor."""
+    async with AsyncSession(settings.get_async_engine()) as session:
+        # Column rows on the fast path, Recommendation objects otherwise
+        stream = session.stream if settings.json_fast_path else session.stream_scalars
+        result = await stream(stmt.execution_options(yield_per=1000))
+        async for rec in result:
+            yield _ndjson_line(rec)
+
 @app.get("/recommendations", response_model=RecommendationsListResponse, tags=["recommendations"])
-def get_recommendations(session: Session = Depends(get_session)):
-    """Get optimization recommendations for all resources."""
-    # Get all resources
-    resources = session.exec(select(Resource)).all()
-    
-    # Generate recommendations
-    recommendations_data = optimizer.analyze_resources(resources)
-    
-    # Calculate summary
-    summary = optimizer.calculate_summary(resources, recommendations_data)
-    
-    # Convert to response models
-    recommendations = [RecommendationResponse(**rec) for rec in recommendations_data]
-    
-    return RecommendationsListResponse(
-        recommendations=recommendations,
-        summary=summary
-    )
+async def get_recommendations(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return all recommendations"),
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    sort: Literal["id", "potential_saving"] = Query("id", description="potential_saving sorts highest first"),
+    format: Literal["json", "ndjson"] = Query("json", description=f"ndjson streams one recommendation per line (also selected by Accept: {NDJSON_MEDIA_TYPE}); fetch the summary from /summary"),
+    account_id: str = Depends(get_account),
+    db: Database = Depends(get_db)
+):
+    """Get optimization recommendations for the account's resources."""
+    route = "/recommendations"
+    with phase(route, "refresh"):
+        snapshot = await _snapshot()
+    response.headers[SNAPSHOT_AGE_HEADER] = str(snapshot["snapshot_age_seconds"])
+    after = decode_cursor(cursor, **RECOMMENDATION_SORT_KEYS[sort]) if cursor else None
+    # The fast path selects column rows and encodes them without response models
+    stmt = recommendations_query(sort, after, RECOMMENDATION_COLUMNS if settings.json_fast_path else None, account_id)
+
+    if format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        stream = _stream_recommendations_async(stmt) if settings.db_async else _stream_recommendations(stmt)
+        return StreamingResponse(stream, media_type=NDJSON_MEDIA_TYPE, headers=dict(response.headers))
+
+    with phase(route, "query"):
+        if limit is not None:
+            # Fetch one extra row to know whether another page exists
+            rows = await db.all(stmt.limit(limit + 1))
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor(keyset_position(rows[-1], sort))
+        else:
+            rows = await db.all(stmt)
+
+    with phase(route, "summary"):
+        summary = await db.run(fleet_summary, optimizer, account_id)
+    with phase(route, "serialize"):
+        if settings.json_fast_path:
+            # Encoding and compressing a whole fleet's page is CPU-bound: keep it off the event loop
+            return await run_in_threadpool(lambda: json_response(
+                encode_recommendations(rows, summary, **snapshot), request.headers.get("accept-encoding", ""),
+                min_size=settings.compression_min_bytes or None, headers=dict(response.headers)))
+        recommendations = [RecommendationResponse.model_validate(rec, from_attributes=True) for rec in rows]
+        return RecommendationsListResponse(recommendations=recommendations, summary=summary, **snapshot)
+
+def _summary_etag(summary: Dict[str, Any]) -> str:
+    digest = hashlib.sha1(json.dumps(summary, sort_keys=True).encode()).hexdigest()
+    return f'"{digest}"'
+
+@app.get("/summary", tags=["recommendations"])
+async def get_summary(request: Request, account_id: str = Depends(get_account), db: Database = Depends(get_db)):
+    """The account's totals and open savings, without the recommendation list.
+
+    Served from an in-process TTL cache; send If-None-Match with the last
+    ETag to get a 304 when nothing changed.
+    """
+    snapshot = await _snapshot()
+    key = (SUMMARY_CACHE_KEY, account_id)
+    cached = summary_cache.get(key)
+    if cached is None:
+        summary = await db.run(fleet_summary, optimizer, account_id)
+        cached = (summary, _summary_etag(summary))
+        summary_cache.set(key, cached)
+
+    summary, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache", SNAPSHOT_AGE_HEADER: str(snapshot["snapshot_age_seconds"])}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(summary, headers=headers)
+
+@app.get("/summary/breakdown", tags=["recommendations"])
+async def get_cost_breakdown(
+    group_by: List[str] = Query(list(BREAKDOWN_FIELDS[:3]), description=f"Repeatable; any of {', '.join(BREAKDOWN_FIELDS)}"),
+    account_id: str = Depends(get_account),
+    db: Database = Depends(get_db),
+):
+    """The account's resource count, monthly cost and open savings per group,
+    plus overall totals.
+
+    Read from the cost rollup table, which ingests, refreshes and
+    implements keep current, so the cost doesn't grow with the fleet.
+    """
+    rows = await db.all(select(CostRollup).where(CostRollup.account_id == account_id))
+    try:
+        return cost_breakdown(rows, group_by, load_catalog())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def _event_stream(subscription, keepalive: float):
+    try:
+        # Clients wait this long before reconnecting with Last-Event-ID
+        yield b"retry: 3000\n\n"
+        while True:
+            frame = await subscription.next(timeout=keepalive)
+            # A comment line keeps proxies from closing an idle stream
+            yield frame if frame is not None else b": keepalive\n\n"
+    finally:
+        events.unsubscribe(subscription)
+
+@app.get("/events", tags=["recommendations"])
+async def stream_events(
+    account: Optional[str] = Query(None, min_length=1, max_length=64,
+                                   description=f"Overrides {ACCOUNT_HEADER}, which EventSource can't send"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    account_id: str = Depends(get_account),
+):
+    """Server-sent events with the account's changes as they happen:
+    resources, recommendations, implemented, summary and reset (see
+    events.py for the payloads).
+
+    Apply them to lists fetched once instead of polling. Browsers
+    reconnect with Last-Event-ID and get the events they missed, or a
+    reset when too many were.
+    """
+    subscription = events.subscribe(account or account_id, last_event_id)
+    return StreamingResponse(_event_stream(subscription, settings.event_keepalive),
+                             media_type="text/event-stream", headers=EVENT_STREAM_HEADERS)
+
+@app.get("/cache/stats", tags=["health"])
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for in-process caches."""
+    return {"summary": summary_cache.stats(), "simulation": simulation_cache.stats(), "events": events.stats()}
+
+@app.post("/recommendations/refresh", tags=["recommendations"])
+async def refresh_now() -> Dict[str, Any]:
+    """Recompute recommendations now and wait for the result. Concurrent
+    calls share one run; returns the scheduler's state afterwards."""
+    await run_in_threadpool(scheduler.refresh_now)
+    return scheduler.stats()
+
+async def _simulation_snapshot(db: Database, account_id: str) -> SimulationSnapshot:
+    """The account's cached snapshot, or one built from rows streamed in chunks:
+    the database only fetches, the threadpool does the per-chunk NumPy work."""
+    version = await db.run(snapshot_version, optimizer, account_id)
+    snapshot = simulation_cache.get(version)
+    if snapshot is None:
+        builder = SnapshotBuilder(optimizer)
+        async for chunk in db.partitions(snapshot_query(optimizer, account_id), SNAPSHOT_CHUNK_SIZE):
+            await run_in_threadpool(builder.add, chunk)
+        snapshot = await run_in_threadpool(builder.build)
+        simulation_cache.set(version, snapshot)
+    return snapshot
+
+@app.post("/recommendations/simulate", tags=["recommendations"])
+async def simulate_thresholds(body: SimulationRequest, request: Request,
+                              account_id: str = Depends(get_account), db: Database = Depends(get_db)):
+    """The account's recommendation counts and savings for every combination
+    of threshold values, e.g. {"cpu_thresholds": [10, 20, ...], "memory_thresholds": [...]}.
+
+    Evaluated in one vectorized pass over a per-resource snapshot that is
+    cached until resources or rules change; nothing is persisted.
+    """
+    snapshot = await _simulation_snapshot(db, account_id)
+    try:
+        body_bytes = await run_in_threadpool(lambda: encode(simulate(snapshot, optimizer, **body.model_dump())))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Compression is CPU-bound: keep it off the event loop
+    return await run_in_threadpool(json_response, body_bytes, request.headers.get("accept-encoding", ""),
+                                   min_size=settings.compression_min_bytes or None)
+
+@app.post("/recommendations/implement", response_model=BulkImplementResponse, tags=["recommendations"])
+async def implement_recommendations(body: BulkImplementRequest, account_id: str = Depends(get_account),
+                                    db: Database = Depends(get_db)):
+    """Mark the open recommendations of many of the account's resources
+    implemented at once.
+
+    Pass resource_ids, filters (recommendation_type, provider,
+    min_potential_saving), or both. Each listed resource gets a result:
+    implemented, already_implemented (e.g. on retry), no_recommendation
+    or not_found.
+    """
+    criteria = body.model_dump(exclude_none=True)
+    if not criteria or criteria == {"resource_ids": []}:
+        raise HTTPException(status_code=422, detail="Pass resource_ids or at least one filter")
+    results = await db.run(partial(implement_many, **criteria, account_id=account_id))
+    implemented = [r for r in results if r["status"] == "implemented"]
+    if implemented:
+        summary_cache.invalidate()
+        await db.run(_publish_implemented, account_id, implemented)
+    return {"implemented": len(implemented), "results": results}
+
+def _publish_implemented(session: Session, account_id: str, results: List[Dict[str, Any]]) -> None:
+    events.publish(account_id, "implemented", {"implemented": [
+        {"resource_id": r["resource_id"], "implemented_at": r["implemented_at"]} for r in results
+    ]})
+    _publish_summary(session, account_id)
+
+def _implement(session: Session, resource_id: int, account_id: str):
+    resource = session.get(Resource, resource_id)
+    if not resource or resource.account_id != account_id:
+        return None, []
+    return resource, mark_implemented(session, resource_id, account_id)
 
 @app.post("/recommendations/{resource_id}/implement", tags=["recommendations"])
-def implement_recommendation(
+async def implement_recommendation(
     resource_id: int,
-    session: Session = Depends(get_session)
+    account_id: str = Depends(get_account),
+    db: Database = Depends(get_db)
 ):
     """Mark a recommendation as implemented."""
-    # In a real app, you'd store implemented recommendations in the DB
-    # For this demo, we'll just return success
-    
+    resource, updated = await db.run(_implement, resource_id, account_id)
     # Verify the resource exists
-    resource = session.get(Resource, resource_id)
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
-    
-    # In production, you'd:
-    # 1. Store the implementation in the recommendations table
-    # 2. Update timestamps
-    # 3. Possibly update the resource itself
+    if updated:
+        summary_cache.invalidate()
+        await db.run(_publish_implemented, account_id,
+                     [{"resource_id": resource_id, "implemented_at": updated[0].implemented_at}])
+
+    implemented_at = updated[0].implemented_at if updated else datetime.utcnow()
     
     return {
         "message": f"Recommendation for resource {resource_id} marked as implemented",
         "resource_name": resource.name,
-        "implemented_at": datetime.utcnow().isoformat()
+        "implemented_at": implemented_at.isoformat()
     }
     
+@app.get("/metrics", tags=["health"])
+def metrics():
+    """Prometheus metrics (see telemetry.py)."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+def _require_profiler():
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set PROFILER_ENABLED=true")
+
+@app.post("/debug/profiler/start", tags=["debug"], dependencies=[Depends(_require_profiler)])
+def start_profiler(
+    interval_ms: float = Query(10, ge=1, le=1000, description="Sampling interval"),
+    seconds: Optional[float] = Query(30, gt=0, le=3600, description="Stop automatically after this long"),
+):
+    """Start sampling all thread stacks (clears previous samples)."""
+    profiler.start(interval=interval_ms / 1000, duration=seconds)
+    return {"running": profiler.running, "interval_ms": interval_ms}
+
+@app.post("/debug/profiler/stop", tags=["debug"], dependencies=[Depends(_require_profiler)])
+def stop_profiler():
+    profiler.stop()
+    return {"running": False, "samples": profiler.samples}
+
+@app.get("/debug/profiler", tags=["debug"], dependencies=[Depends(_require_profiler)])
+def profiler_stacks():
+    """Sampled stacks in folded format, hottest first (feed to flamegraph.pl or speedscope)."""
+    return Response(profiler.folded(), media_type="text/plain")
+
 @app.get("/openapi.json")
 def openapi_schema():
     return get_openapi(title="CloudOpt API", version="1.0", routes=app.routes)
\ No newline at end of file
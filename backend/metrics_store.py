@@ -0,0 +1,337 @@
+"""Utilization samples, daily sketch rollups and windowed p95.
+
+Samples are appended (COPY on Postgres, into daily partitions) and, in the
+same transaction, folded into per-resource daily histograms (see sketch.py).
+The p95 over a window is then computed by merging at most `window_days`
+small sketches per resource, never by re-reading raw samples.
+
+CLI usage:
+    python metrics_store.py load samples.csv [--format ndjson]
+    python metrics_store.py prune [--days 30]
+"""
+import argparse
+import csv
+import io
+import math
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import Connection, Float, and_, bindparam, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from ingest import DEFAULT_BATCH_SIZE, IngestError, ingest_report, iter_batches, parse_lines
+from models import Resource, ResourceMetricRollup, ResourceMetricSample
+from sketch import BINS, decode, decode_many, encode, grouped_histograms, quantiles
+
+SAMPLE_FIELDS = ("resource_id", "recorded_at", "cpu_utilization", "memory_utilization")
+SAMPLE_TABLE = ResourceMetricSample.__tablename__
+P95 = 0.95
+# pg_advisory_xact_lock key serializing sample ingestion (rollup read-modify-write)
+INGEST_LOCK_KEY = 0x6D6574726963
+
+
+def normalize_sample(raw: Dict[str, Any], line: int) -> Dict[str, Any]:
+    """Coerce one parsed sample; timestamps are ISO 8601 and stored as naive UTC."""
+    try:
+        resource_id = int(raw["resource_id"])
+        recorded_at = raw["recorded_at"]
+        if not isinstance(recorded_at, datetime):
+            recorded_at = datetime.fromisoformat(recorded_at)
+    except KeyError as e:
+        raise IngestError(line, f"missing {e.args[0]}")
+    except (TypeError, ValueError):
+        raise IngestError(line, "invalid resource_id or recorded_at")
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    sample = {"resource_id": resource_id, "recorded_at": recorded_at}
+    for field in ("cpu_utilization", "memory_utilization"):
+        value = raw.get(field)
+        try:
+            sample[field] = None if value in (None, "") else float(value)
+        except (TypeError, ValueError):
+            raise IngestError(line, f"invalid {field}: {value!r}")
+    return sample
+
+
+def _is_partitioned(conn: Connection) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%(table)s)", {"table": SAMPLE_TABLE}
+    ).scalar() is True
+
+
+def ensure_sample_partitions(conn: Connection, days: Iterable[date]) -> None:
+    """Create the daily partitions for `days` (Postgres only)."""
+    if conn.dialect.name != "postgresql" or not _is_partitioned(conn):
+        return
+    for day in sorted(set(days)):
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {SAMPLE_TABLE}_{day:%Y%m%d} PARTITION OF {SAMPLE_TABLE} "
+            f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+        )
+
+
+def prune_samples(conn: Connection, before: date) -> None:
+    """Drop raw samples recorded before `before`; rollups are kept.
+
+    On Postgres whole daily partitions are dropped, which is instant.
+    """
+    if conn.dialect.name == "postgresql" and _is_partitioned(conn):
+        partitions = conn.exec_driver_sql(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%(table)s)", {"table": SAMPLE_TABLE}
+        ).scalars().all()
+        for name in partitions:
+            if datetime.strptime(name.rsplit("_", 1)[1], "%Y%m%d").date() < before:
+                conn.exec_driver_sql(f"DROP TABLE {name}")
+    else:
+        table = ResourceMetricSample.__table__
+        conn.execute(table.delete().where(table.c.recorded_at < datetime.combine(before, datetime.min.time())))
+
+
+def check_sample_accounts(conn: Connection, rows: List[Dict[str, Any]], account_id: str, lines: List[int]) -> None:
+    """Raise IngestError at the first sample whose resource is not one of
+    `account_id`'s (or does not exist); `lines` holds each row's line."""
+    ids = {row["resource_id"] for row in rows}
+    if not ids:
+        return
+    owned = set(conn.execute(
+        select(Resource.id).where(Resource.account_id == account_id, Resource.id.in_(sorted(ids)))).scalars())
+    for row, line in zip(rows, lines):
+        if row["resource_id"] not in owned:
+            raise IngestError(line, f"resource {row['resource_id']} is not one of account {account_id!r}'s resources")
+
+
+def ingest_samples(conn: Connection, rows: List[Dict[str, Any]], rollups: Optional["RollupBuffer"] = None) -> int:
+    """Append samples within the caller's (explicitly begun, see
+    ingest.upsert_batch) transaction and fold them into the daily rollups.
+
+    Pass a RollupBuffer to defer the rollup write to its `flush`, so an
+    upload of many batches rewrites each rollup row once. Re-sending a
+    sample already stored violates the primary key and fails the
+    transaction, so rollups never double count.
+    """
+    if not rows:
+        return 0
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("SELECT pg_advisory_xact_lock(%(key)s)", {"key": INGEST_LOCK_KEY})
+        ensure_sample_partitions(conn, {row["recorded_at"].date() for row in rows})
+        _copy_samples(conn, rows)
+    else:
+        conn.execute(insert(ResourceMetricSample.__table__), rows)
+    if rollups is None:
+        RollupBuffer().add(rows).flush(conn)
+    else:
+        rollups.add(rows)
+    return len(rows)
+
+
+def _copy_samples(conn: Connection, rows: List[Dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[field] for field in SAMPLE_FIELDS])
+    buffer.seek(0)
+    statement = f"COPY {SAMPLE_TABLE} ({', '.join(SAMPLE_FIELDS)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except conn.dialect.dbapi.IntegrityError as e:
+        # Raw cursor errors bypass SQLAlchemy's wrapping; match what conn.execute raises
+        raise IntegrityError(statement, None, e)
+    finally:
+        cursor.close()
+
+
+class RollupBuffer:
+    """Per-(resource_id, day) sample histograms accumulated in memory across
+    batches, merged into ResourceMetricRollup by `flush`.
+
+    Memory is O(distinct keys x BINS), independent of the number of samples.
+    """
+
+    def __init__(self):
+        self.position: Dict[Tuple[int, int], int] = {}
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.cpu = np.zeros((0, BINS), dtype=np.int64)
+        self.memory = np.zeros((0, BINS), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def add(self, rows: List[Dict[str, Any]]) -> "RollupBuffer":
+        ids = np.fromiter((row["resource_id"] for row in rows), dtype=np.int64, count=len(rows))
+        days = np.fromiter((row["recorded_at"].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+        keys, groups = np.unique(np.stack([ids, days], axis=1), axis=0, return_inverse=True)
+        groups = groups.ravel()
+        cpu = grouped_histograms(groups, np.array([row["cpu_utilization"] for row in rows], dtype=np.float64), len(keys))
+        memory = grouped_histograms(groups, np.array([row["memory_utilization"] for row in rows], dtype=np.float64), len(keys))
+
+        slots = np.fromiter((self.position.setdefault(key, len(self.position)) for key in map(tuple, keys.tolist())),
+                            dtype=np.int64, count=len(keys))
+        self._reserve(len(self.position))
+        # Keys are unique within a batch, so plain fancy-index addition is safe
+        self.counts[slots] += np.bincount(groups, minlength=len(keys))
+        self.cpu[slots] += cpu
+        self.memory[slots] += memory
+        return self
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self.counts)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        self.counts = np.resize(self.counts, capacity)
+        self.counts[len(self.position):] = 0
+        for name in ("cpu", "memory"):
+            grown = np.zeros((capacity, BINS), dtype=np.int64)
+            grown[:len(getattr(self, name))] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def flush(self, conn: Connection) -> None:
+        """Add the buffered histograms to the stored rollups and clear the buffer."""
+        if not self.position:
+            return
+        keys = [(resource_id, date.fromordinal(day)) for resource_id, day in self.position]
+        counts, cpu, memory = self.counts[:len(keys)], self.cpu[:len(keys)], self.memory[:len(keys)]
+        position = {key: p for p, key in enumerate(keys)}
+        table = ResourceMetricRollup.__table__
+        existing = conn.execute(
+            select(table.c.resource_id, table.c.day, table.c.sample_count, table.c.cpu_sketch, table.c.memory_sketch)
+            .where(table.c.resource_id.in_(sorted({k[0] for k in keys})), table.c.day.in_(sorted({k[1] for k in keys})))
+        )
+        for resource_id, day, sample_count, cpu_sketch, memory_sketch in existing:
+            p = position.get((resource_id, day))
+            if p is not None:
+                counts[p] += sample_count
+                cpu[p] += decode(cpu_sketch)
+                memory[p] += decode(memory_sketch)
+
+        if conn.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["resource_id", "day"],
+            set_={field: stmt.excluded[field] for field in ("sample_count", "cpu_sketch", "memory_sketch", "updated_at")},
+        )
+        now = datetime.utcnow()
+        conn.execute(stmt, [
+            {"resource_id": resource_id, "day": day, "sample_count": int(counts[p]),
+             "cpu_sketch": encode(cpu[p]), "memory_sketch": encode(memory[p]), "updated_at": now}
+            for p, (resource_id, day) in enumerate(keys)
+        ])
+        self.__init__()
+
+
+def window_start(today: date, window_days: int) -> date:
+    """First day of a `window_days` window ending today (inclusive)."""
+    return today - timedelta(days=window_days - 1)
+
+
+def refresh_p95(session: Session, window_days: int, since: Optional[datetime] = None,
+                today: Optional[date] = None, account_id: Optional[str] = None) -> int:
+    """Recompute Resource.cpu_p95/memory_p95 over the last `window_days` days,
+    for one account's resources or (by default) all.
+
+    With `since`, only resources whose rollups changed after it, or whose
+    oldest days slid out of the window since then, are recomputed; otherwise
+    every resource with samples (or a stale p95) is. Resources left without
+    samples in the window get NULL. Returns the number recomputed; rows whose
+    values changed get a new updated_at, so the recommendation refresh picks
+    them up.
+    """
+    today = today or datetime.utcnow().date()
+    start = window_start(today, window_days)
+    rollup = ResourceMetricRollup
+    in_window = select(rollup.resource_id).where(rollup.day >= start)
+    if since is None:
+        targets = select(Resource.id).where(or_(
+            Resource.id.in_(in_window), Resource.cpu_p95.is_not(None), Resource.memory_p95.is_not(None)
+        ))
+    else:
+        targets = select(rollup.resource_id).distinct().where(or_(
+            and_(rollup.updated_at >= since, rollup.day >= start),
+            and_(rollup.day >= window_start(since.date(), window_days), rollup.day < start),
+        ))
+    if account_id is not None:
+        targets = targets.where(
+            (Resource.account_id == account_id) if since is None
+            else rollup.resource_id.in_(select(Resource.id).where(Resource.account_id == account_id))
+        )
+    target_ids = session.exec(targets).all()
+    if not target_ids:
+        return 0
+
+    # Merge each resource's daily sketches, a fetched batch at a time;
+    # memory stays O(resources x BINS)
+    position = {resource_id: p for p, resource_id in enumerate(target_ids)}
+    merged = np.zeros((2, len(target_ids), BINS), dtype=np.int64)
+    rows = session.exec(
+        select(rollup.resource_id, rollup.cpu_sketch, rollup.memory_sketch)
+        .where(rollup.day >= start, rollup.resource_id.in_(targets))
+        .execution_options(yield_per=10_000)
+    )
+    for batch in rows.partitions():
+        resource_ids, cpu_sketches, memory_sketches = zip(*batch)
+        positions = [position[resource_id] for resource_id in resource_ids]
+        # A resource has one row per day, so positions repeat: add.at accumulates them
+        np.add.at(merged[0], positions, decode_many(cpu_sketches))
+        np.add.at(merged[1], positions, decode_many(memory_sketches))
+
+    # Resources without samples in the window get NaN, stored as NULL
+    params = [
+        {"rid": resource_id, "cpu": None if math.isnan(cpu) else cpu, "memory": None if math.isnan(memory) else memory}
+        for resource_id, cpu, memory in zip(target_ids, quantiles(merged[0], P95).tolist(),
+                                            quantiles(merged[1], P95).tolist())
+    ]
+
+    table = Resource.__table__
+    cpu, memory = bindparam("cpu", type_=Float), bindparam("memory", type_=Float)
+    # Only rows whose values change are written (and get a new updated_at)
+    session.exec(
+        update(table)
+        .where(table.c.id == bindparam("rid"),
+               or_(table.c.cpu_p95.is_distinct_from(cpu), table.c.memory_p95.is_distinct_from(memory)))
+        .values(cpu_p95=cpu, memory_p95=memory),
+        params=params,
+    )
+    return len(params)
+
+
+def main():
+    from config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="append samples from a CSV/NDJSON file")
+    load.add_argument("path", help="input file, or - for stdin")
+    load.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    load.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    prune = commands.add_parser("prune", help="drop raw samples older than the retention period")
+    prune.add_argument("--days", type=int, default=settings.metrics_retention_days)
+    args = parser.parse_args()
+
+    if args.command == "prune":
+        with settings.get_engine().begin() as conn:
+            prune_samples(conn, datetime.utcnow().date() - timedelta(days=args.days))
+        return
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    start = time.perf_counter()
+    total = 0
+    rollups = RollupBuffer()
+    with stream, settings.get_engine().begin() as conn:
+        for batch in iter_batches(parse_lines(stream, fmt, normalize=normalize_sample), args.batch_size):
+            total += ingest_samples(conn, batch, rollups)
+        rollups.flush(conn)
+    report = ingest_report(total, time.perf_counter() - start)
+    print(f"Loaded {report['rows']} samples in {report['seconds']}s ({report['rows_per_sec']} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,34 @@
 # backend/models.py
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
-from sqlmodel import SQLModel, Field,create_engine
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, UniqueConstraint, text
 from typing import Optional
 from typing import List, Dict, Any
 from datetime import datetime
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
+from records import DEFAULT_ACCOUNT
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
 
 class Resource(SQLModel, table=True):
+    __table_args__ = (
+        # Every key and index leads with account_id, so a query scoped to one
+        # account only reads that account's slice of it.
+        # Natural key for bulk upserts (see ingest.py)
+        UniqueConstraint("account_id", "provider", "name", name="uq_resource_account_provider_name"),
+        # Support the optimizer's candidate filters (see OptimizationEngine.candidate_filter)
+        Index("ix_resource_account_type_cpu_memory", "account_id", "type", "cpu_utilization", "memory_utilization"),
+        Index("ix_resource_account_type_storage_gb", "account_id", "type", "storage_gb"),
+        # Keyset pagination of /resources listings, unfiltered and filtered
+        Index("ix_resource_account_id", "account_id", "id"),
+        Index("ix_resource_account_provider_id", "account_id", "provider", "id"),
+        Index("ix_resource_account_type_id", "account_id", "type", "id"),
+        Index("ix_resource_account_monthly_cost_id", "account_id", "monthly_cost", "id"),
+        # Incremental refreshes (resources changed since the account's watermark)
+        Index("ix_resource_account_updated_at", "account_id", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: str = Field(default=DEFAULT_ACCOUNT, sa_column_kwargs={"server_default": DEFAULT_ACCOUNT})
     name: str
     type: str  # 'instance' or 'storage'
     provider: str  # e.g., 'aws', 'azure', 'gcp'
@@ -24,11 +38,22 @@ class Resource(SQLModel, table=True):
     memory_utilization: Optional[float] = None
     storage_gb: Optional[int] = None
     monthly_cost: float
+    # p95 utilization over the configured window, from metric rollups (see metrics_store.py)
+    cpu_p95: Optional[float] = None
+    memory_p95: Optional[float] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
 
 class Recommendation(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_recommendation_resource_id_implemented", "resource_id", "implemented"),
+        # Keyset pagination of an account's /recommendations, by id or by potential_saving
+        Index("ix_recommendation_account_id", "account_id", "id"),
+        Index("ix_recommendation_account_potential_saving_id", "account_id", text("potential_saving DESC"), "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: str = Field(default=DEFAULT_ACCOUNT, sa_column_kwargs={"server_default": DEFAULT_ACCOUNT})  # the resource's
     resource_id: int = Field(foreign_key="resource.id")
     recommendation_type: str  # e.g., "downsize", "shrink"
     current_config: str
@@ -39,9 +64,48 @@ class Recommendation(SQLModel, table=True):
     implemented: bool = Field(default=False)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     implemented_at: Optional[datetime] = None
+
+class RecommendationRefresh(SQLModel, table=True):
+    """Watermark for incremental recommendation refreshes (one row per account)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: str = Field(default=DEFAULT_ACCOUNT, index=True, unique=True,
+                            sa_column_kwargs={"server_default": DEFAULT_ACCOUNT})
+    last_refreshed_at: datetime
+    rules_fingerprint: str
+
+class ResourceMetricSample(SQLModel, table=True):
+    """Raw utilization samples. On Postgres the table is range-partitioned
+    by day on recorded_at, so retention drops whole partitions."""
+    resource_id: int = Field(primary_key=True)
+    recorded_at: datetime = Field(primary_key=True)
+    cpu_utilization: Optional[float] = None
+    memory_utilization: Optional[float] = None
+
+class ResourceMetricRollup(SQLModel, table=True):
+    """Daily utilization histograms per resource (see sketch.py), merged as samples arrive."""
+    resource_id: int = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    sample_count: int = 0
+    cpu_sketch: bytes
+    memory_sketch: bytes
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     
+class CostRollup(SQLModel, table=True):
+    """Resource and open-recommendation totals per (account, provider, type,
+    instance_type), kept current by every writer (see rollups.py)."""
+    account_id: str = Field(primary_key=True)
+    provider: str = Field(primary_key=True)
+    type: str = Field(primary_key=True)
+    instance_type: str = Field(default="", primary_key=True)  # '' for resources without one
+    resources: int = 0
+    monthly_cost: float = 0.0
+    open_recommendations: int = 0
+    potential_savings: float = 0.0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 class ResourceResponse(SQLModel):
     id: int
+    account_id: str
     name: str
     type: str
     provider: str
@@ -51,6 +115,8 @@ class ResourceResponse(SQLModel):
     memory_utilization: Optional[float] = None
     storage_gb: Optional[int] = None
     monthly_cost: float
+    cpu_p95: Optional[float] = None
+    memory_p95: Optional[float] = None
     created_at: datetime
     updated_at: datetime
     
@@ -64,6 +130,34 @@ class RecommendationResponse(SQLModel):
     reason: str
     implemented: bool = False
 
+class SimulationRequest(SQLModel):
+    """Threshold values to combine in /recommendations/simulate; omitted
+    dimensions stay at the configured value."""
+    cpu_thresholds: Optional[List[float]] = Field(default=None, max_length=1000)
+    memory_thresholds: Optional[List[float]] = Field(default=None, max_length=1000)
+    storage_gb_thresholds: Optional[List[float]] = Field(default=None, max_length=1000)
+    shrink_factors: Optional[List[float]] = Field(default=None, max_length=1000)
+
+class BulkImplementRequest(SQLModel):
+    """Recommendations to mark implemented: listed resources, and/or those
+    matching every filter given. At least one criterion is required."""
+    resource_ids: Optional[List[int]] = Field(default=None, max_length=10_000)
+    recommendation_type: Optional[str] = None
+    provider: Optional[str] = None
+    min_potential_saving: Optional[float] = None
+
+class ImplementResult(SQLModel):
+    resource_id: int
+    status: str  # implemented, already_implemented, no_recommendation, not_found
+    implemented_at: Optional[datetime] = None
+
+class BulkImplementResponse(SQLModel):
+    implemented: int
+    results: List[ImplementResult]
+
 class RecommendationsListResponse(SQLModel):
     recommendations: List[RecommendationResponse]
     summary: Dict[str, Any]
+    # When the served recommendations were computed (see scheduler.py)
+    refreshed_at: Optional[datetime] = None
+    snapshot_age_seconds: Optional[float] = None
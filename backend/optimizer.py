@@ -1,104 +1,151 @@
-from typing import List, Dict, Any
-from models import Resource
-from datetime import datetime
+import time
+from typing import Callable, Iterable, List, Dict, Any, Optional
+import numpy as np
+from columnar import ResourceColumns, ResourceRow
+from rules import RuleRegistry, RuleThresholds, default_registry
+
+# Called once per rule per analysis with (rule name, rows evaluated, matches, seconds)
+RuleObserver = Callable[[str, int, int, float], None]
 
 class OptimizationEngine:
-    """Pure business logic for cloud resource optimization recommendations."""
+    """Pure business logic for cloud resource optimization recommendations.
+
+    Imports no database or web modules (SQLAlchemy only when building SQL
+    via candidate_filter/candidate_columns), so CLI jobs and workers start
+    quickly and need no DATABASE_URL; see analyze.py.
+    """
+
+    def __init__(self, thresholds: Optional[RuleThresholds] = None,
+                 registry: RuleRegistry = default_registry, vectorized: bool = False,
+                 utilization: str = "snapshot", utilization_window_days: int = 14,
+                 observer: Optional[RuleObserver] = None):
+        # Rules are instantiated once and indexed by resource type, so each
+        # resource only visits the rules that apply to it.
+        self.rules = registry.compile(thresholds)
+        # Columnar mode evaluates rules as NumPy masks over the whole inventory;
+        # the per-row path remains the reference implementation.
+        self.vectorized = vectorized
+        # "p95" evaluates rules on windowed p95 utilization (see metrics_store.refresh_p95)
+        self.utilization = utilization
+        self.utilization_window_days = utilization_window_days
+        # Optional per-rule instrumentation (see telemetry.py); timing costs
+        # a little on the per-row path, so it is off unless an observer is set.
+        self.observer = observer
+
+    @property
+    def fingerprint(self) -> str:
+        """Rules fingerprint, qualified by the utilization source when it isn't the snapshot."""
+        if self.utilization == "snapshot":
+            return self.rules.fingerprint
+        return f"{self.rules.fingerprint}:{self.utilization}/{self.utilization_window_days}d"
     
-    def analyze_resources(self, resources: List[Resource]) -> List[Dict[str, Any]]:
-        """Generate optimization recommendations for a list of resources."""
+    def analyze_resources(self, resources: List[ResourceRow]) -> List[Dict[str, Any]]:
+        """Generate optimization recommendations for a list of resources (any
+        objects with the ResourceRow attributes, e.g. Resource or ResourceRow)."""
+        if self.vectorized:
+            return self.analyze_columns(ResourceColumns.from_resources(resources))
+        if self.observer is not None:
+            return self._analyze_observed(resources)
+
         recommendations = []
-        
+        for_type = self.rules.for_type
         for resource in resources:
-            # Rule 1: Over-provisioned instances
-            if resource.type == "instance":
-                rec = self._check_overprovisioned_instance(resource)
-                if rec:
-                    recommendations.append(rec)
-            
-            # Rule 2: Oversized storage
-            elif resource.type == "storage":
-                rec = self._check_oversized_storage(resource)
-                if rec:
-                    recommendations.append(rec)
-        
+            for rule in for_type(resource.type):
+                if rule.matches(resource):
+                    recommendations.append(rule.build(resource))
         return recommendations
+
+    def _analyze_observed(self, resources: List[ResourceRow]) -> List[Dict[str, Any]]:
+        """analyze_resources with per-rule counts and timings reported to the observer."""
+        stats = {rule.name: [0, 0, 0.0] for rule in self.rules.rules}
+        recommendations = []
+        for_type = self.rules.for_type
+        clock = time.perf_counter
+        for resource in resources:
+            for rule in for_type(resource.type):
+                entry = stats[rule.name]
+                start = clock()
+                if rule.matches(resource):
+                    recommendations.append(rule.build(resource))
+                    entry[1] += 1
+                entry[0] += 1
+                entry[2] += clock() - start
+        for name, (evaluated, matched, seconds) in stats.items():
+            self.observer(name, evaluated, matched, seconds)
+        return recommendations
+
+    def analyze_rows(self, rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+        """Generate recommendations from plain tuples in ResourceRow field order,
+        e.g. a column-only SELECT of candidate_columns().
+
+        Rows are held as ResourceRow records, roughly a tenth of the memory
+        of Resource instances (no validation or ORM instance state); the
+        columnar mode transposes them straight into arrays instead."""
+        if self.vectorized:
+            return self.analyze_columns(ResourceColumns.from_rows(rows))
+        return self.analyze_resources([ResourceRow._make(row) for row in rows])
+
+    def analyze_columns(self, columns: ResourceColumns) -> List[Dict[str, Any]]:
+        """Generate recommendations from a columnar snapshot using batched rule masks."""
+        hit_indices, hit_rules, built = [], [], []
+        type_masks: Dict[str, np.ndarray] = {}
+        for position, rule in enumerate(self.rules.rules):
+            start = time.perf_counter()
+            applies = np.zeros(len(columns), dtype=bool)
+            for resource_type in rule.resource_types:
+                if resource_type not in type_masks:
+                    type_masks[resource_type] = columns.type == resource_type
+                applies |= type_masks[resource_type]
+            if not applies.any():
+                continue
+            indices = np.flatnonzero(applies & rule.mask(columns))
+            hit_indices.append(indices)
+            hit_rules.append(np.full(len(indices), position))
+            built.extend(rule.build_many(columns, indices))
+            if self.observer is not None:
+                self.observer(rule.name, int(applies.sum()), len(indices), time.perf_counter() - start)
+
+        if not hit_indices:
+            return []
+        if len(hit_indices) == 1:
+            return built
+        # Emit in resource order, then rule registration order, like the per-row path
+        order = np.lexsort((np.concatenate(hit_rules), np.concatenate(hit_indices)))
+        return [built[i] for i in order.tolist()]
     
-    def _check_overprovisioned_instance(self, resource: Resource) -> Dict[str, Any]:
-        """Check if instance is over-provisioned (CPU < 30% AND memory < 50%)."""
-        if (resource.cpu_utilization is not None and 
-            resource.memory_utilization is not None and
-            resource.cpu_utilization < 30 and 
-            resource.memory_utilization < 50):
-            
-            # Estimate savings (40-60% range, based on utilization)
-            utilization_avg = (resource.cpu_utilization + resource.memory_utilization) / 2
-            if utilization_avg < 15:
-                savings_percent = 0.6  # 60% savings for very low utilization
-            elif utilization_avg < 25:
-                savings_percent = 0.5  # 50% savings
-            else:
-                savings_percent = 0.4  # 40% savings
-            
-            monthly_saving = resource.monthly_cost * savings_percent
-            
-            # Suggest a smaller instance type (simplified logic)
-            suggested_type = self._suggest_smaller_instance(resource.instance_type)
-            
-            confidence = min(0.95, 0.5 + (30 - utilization_avg) / 60)  # Higher confidence for lower utilization
-            
-            return {
-                "resource_id": resource.id,
-                "recommendation_type": "downsize",
-                "current_config": f"{resource.instance_type} - ${resource.monthly_cost}/month",
-                "suggested_config": f"{suggested_type} - ${resource.monthly_cost - monthly_saving:.0f}/month",
-                "potential_saving": monthly_saving,
-                "confidence": round(confidence, 2),
-                "reason": f"Low utilization: {resource.cpu_utilization}% CPU, {resource.memory_utilization}% memory. Downsize to save costs.",
-                "implemented": False
-            }
-        return None
-    
-    def _check_oversized_storage(self, resource: Resource) -> Dict[str, Any]:
-        """Check if storage volume is oversized (> 500GB)."""
-        if resource.storage_gb and resource.storage_gb > 500:
-            # Suggest reducing to 70% of current size
-            suggested_size = int(resource.storage_gb * 0.7)
-            savings_percent = 0.3  # 30% savings on average
-            monthly_saving = resource.monthly_cost * savings_percent
-            
-            confidence = min(0.9, 0.6 + (resource.storage_gb - 500) / 1000)  # Higher confidence for larger volumes
-            
-            return {
-                "resource_id": resource.id,
-                "recommendation_type": "shrink",
-                "current_config": f"{resource.storage_gb}GB - ${resource.monthly_cost}/month",
-                "suggested_config": f"{suggested_size}GB - ${resource.monthly_cost - monthly_saving:.0f}/month",
-                "potential_saving": monthly_saving,
-                "confidence": round(confidence, 2),
-                "reason": f"Large storage volume ({resource.storage_gb}GB). Consider reducing size to optimize costs.",
-                "implemented": False
-            }
-        return None
-    
-    def _suggest_smaller_instance(self, current_type: str) -> str:
-        """Simple mapping to suggest smaller instance types."""
-        downsizing_map = {
-            "t3.xlarge": "t3.large",
-            "m5.xlarge": "m5.large", 
-            "m5.large": "t3.medium",
-            "Standard_D2s_v3": "Standard_B2s",
-            "n1-standard-2": "n1-standard-1"
-        }
-        return downsizing_map.get(current_type, "smaller-instance")
-    
-    def calculate_summary(self, resources: List[Resource], recommendations: List[Dict]) -> Dict[str, Any]:
+    def candidate_filter(self, model=None):
+        """SQL WHERE clause matching the rows the registered rules could flag
+        (`model` defaults to Resource)."""
+        if model is None:
+            from models import Resource as model
+        return self.rules.sql_filter(model)
+
+    def candidate_columns(self, model=None) -> list:
+        """SELECT columns in ResourceRow order (`model` defaults to Resource). In p95 mode
+        utilization comes from the windowed p95, falling back to the snapshot for
+        resources without samples."""
+        from sqlalchemy import func
+        if model is None:
+            from models import Resource as model
+        columns = {field: getattr(model, field) for field in ResourceRow._fields}
+        if self.utilization == "p95":
+            columns["cpu_utilization"] = func.coalesce(model.cpu_p95, model.cpu_utilization)
+            columns["memory_utilization"] = func.coalesce(model.memory_p95, model.memory_utilization)
+        return [column.label(field) for field, column in columns.items()]
+
+    def calculate_summary(self, resources: List[ResourceRow], recommendations: List[Dict]) -> Dict[str, Any]:
         """Calculate summary statistics."""
-        total_resources = len(resources)
-        total_monthly_cost = sum(r.monthly_cost for r in resources)
+        return self.summarize(len(resources), sum(r.monthly_cost for r in resources), recommendations)
+
+    def summarize(self, total_resources: int, total_monthly_cost: float, recommendations: List[Dict]) -> Dict[str, Any]:
+        """Calculate summary statistics from precomputed fleet totals (e.g. a SQL aggregate)."""
         total_potential_savings = sum(r["potential_saving"] for r in recommendations if not r["implemented"])
         open_recommendations = len([r for r in recommendations if not r["implemented"]])
-        
+        return self.build_summary(total_resources, total_monthly_cost, total_potential_savings, open_recommendations)
+
+    def build_summary(self, total_resources: int, total_monthly_cost: float,
+                      total_potential_savings: float, open_recommendations: int) -> Dict[str, Any]:
+        """Assemble the summary payload from precomputed totals."""
         return {
             "total_resources": total_resources,
             "total_monthly_cost": total_monthly_cost,
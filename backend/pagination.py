@@ -0,0 +1,38 @@
+import base64
+import json
+import math
+from typing import Any, Dict
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Opaque, URL-safe cursor for the last row of a page."""
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _valid_key(value: Any, kind: type) -> bool:
+    """Whether a decoded key value can be bound as a `kind` (int or float) column value."""
+    if isinstance(value, bool) or not isinstance(value, (int, float) if kind is float else kind):
+        return False
+    if isinstance(value, int):
+        return _INT64_MIN <= value <= _INT64_MAX
+    return math.isfinite(value)
+
+
+def decode_cursor(cursor: str, **key_types: type) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor, checking it carries every
+    key of `key_types` with a value of that type (int or float), so a
+    tampered cursor fails here rather than in the database."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or not all(
+            key in position and _valid_key(position[key], kind) for key, kind in key_types.items()):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for a running server.
+
+    A daemon thread snapshots every other thread's stack each `interval`
+    seconds and counts identical stacks. Output is in folded format
+    ("outer;inner;leaf count"), which flamegraph.pl and speedscope read.
+    Overhead is proportional to the sampling rate, not the request rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = 0.01
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01, duration: Optional[float] = None) -> None:
+        """Start sampling (clearing previous samples); stops by itself after `duration` seconds."""
+        with self._lock:
+            if self.running:
+                return
+            self._stacks.clear()
+            self.samples = 0
+            self.interval = interval
+            self._stop.clear()
+            deadline = time.monotonic() + duration if duration else None
+            self._thread = threading.Thread(target=self._run, args=(deadline,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self) -> str:
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def _run(self, deadline: Optional[float]) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != me:
+                        self._stacks[_fold(frame)] += 1
+                self.samples += 1
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
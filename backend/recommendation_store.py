@@ -0,0 +1,309 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import Engine, and_, delete, distinct, insert, or_, text, update
+from sqlmodel import Session, func, select
+from models import DEFAULT_ACCOUNT, Resource, Recommendation, RecommendationRefresh
+from optimizer import OptimizationEngine
+from metrics_store import refresh_p95
+from rollups import RollupDelta, lock_rollups, rebuild_rollups, tracking
+
+REFRESH_CHUNK_SIZE = 50_000  # candidate rows fetched and analyzed at a time
+IMPLEMENT_BATCH_SIZE = 1000  # resource ids per UPDATE in implement_many
+
+
+# listener(session, account_id, since) is called after each account's refresh
+# commits; `since` is the previous watermark, or None after a full recompute
+RefreshListener = Callable[[Session, str, Optional[datetime]], None]
+
+
+def refresh_recommendations(session: Session, optimizer: OptimizationEngine,
+                            account_id: str = DEFAULT_ACCOUNT, listener: Optional[RefreshListener] = None) -> int:
+    """Recompute open recommendations for the account's resources changed
+    since its last refresh.
+
+    Open recommendations of changed resources are replaced; implemented ones
+    are kept as history, and not reopened unless their resource changed
+    after they were implemented. A change of rules or thresholds forces a full
+    recompute. Returns the number of recommendations written.
+
+    In p95 mode the resources' windowed p95 is brought up to date first;
+    resources whose p95 moved count as changed.
+
+    Each account has its own watermark and row lock, so refreshes of
+    different accounts can run concurrently (see refresh_accounts).
+
+    `listener` is told what the refresh covered once it has committed
+    (see events.py).
+    """
+    fingerprint = optimizer.fingerprint
+    started_at = datetime.utcnow()
+    # Rows stamped by transactions still open are invisible to this refresh:
+    # the next one has to look back to when the oldest of them started
+    oldest_open = _oldest_open_transaction(session)
+    watermark = started_at if oldest_open is None else min(started_at, oldest_open)
+    # Row lock serializes concurrent refreshes on Postgres
+    state = session.exec(
+        select(RecommendationRefresh)
+        .where(RecommendationRefresh.account_id == account_id)
+        .with_for_update()
+    ).first()
+
+    incremental = state is not None and state.rules_fingerprint == fingerprint
+    since = state.last_refreshed_at if incremental else None
+    if optimizer.utilization == "p95":
+        refresh_p95(session, optimizer.utilization_window_days,
+                    since=since, account_id=account_id)
+
+    changed = select(Resource.id).where(Resource.account_id == account_id)
+    if incremental:
+        # Inclusive bound: rows touched at the watermark are re-evaluated, which is
+        # harmless (see still_implemented)
+        changed = changed.where(Resource.updated_at >= since)
+
+    # Cost rollups follow the changed resources' recommendations; a full
+    # recompute rebuilds them instead
+    tracked = tracking(session.connection(), Resource.id.in_(changed), [account_id])
+    with tracked if incremental else nullcontext():
+        session.exec(
+            delete(Recommendation)
+            .where(Recommendation.resource_id.in_(changed), Recommendation.implemented == False)  # noqa: E712
+        )
+
+        # Implemented recommendations aren't reopened, however often their resource is re-evaluated
+        closed = still_implemented(session, changed)
+
+        # Rules see utilization as the engine defines it (snapshot or p95). Candidates
+        # are streamed in chunks of compact rows, so memory doesn't grow with the fleet.
+        source = select(*optimizer.candidate_columns(Resource)).subquery("candidate")
+        candidates = session.exec(
+            select(*source.c)
+            .where(optimizer.candidate_filter(source.c), source.c.id.in_(changed))
+            .execution_options(yield_per=REFRESH_CHUNK_SIZE)
+        )
+        written = 0
+        for chunk in candidates.partitions():
+            recommendations = optimizer.analyze_rows(chunk)
+            if closed:
+                recommendations = [rec for rec in recommendations
+                                   if (rec["resource_id"], rec["recommendation_type"]) not in closed]
+            if recommendations:
+                session.exec(insert(Recommendation), params=[
+                    {**rec, "account_id": account_id, "created_at": started_at} for rec in recommendations
+                ])
+                written += len(recommendations)
+    if not incremental:
+        rebuild_rollups(session.connection(), account_id)
+
+    if state is None:
+        state = RecommendationRefresh(account_id=account_id, last_refreshed_at=watermark,
+                                      rules_fingerprint=fingerprint)
+    else:
+        state.last_refreshed_at = watermark
+        state.rules_fingerprint = fingerprint
+    session.add(state)
+    session.commit()
+    if listener is not None:
+        listener(session, account_id, since)
+    return written
+
+
+def still_implemented(session: Session, resource_ids) -> Set[Tuple[int, str]]:
+    """(resource_id, recommendation_type) of implemented recommendations of
+    the resources selected by `resource_ids` that still stand: an implemented
+    recommendation stays closed until its resource changes again."""
+    return set(session.exec(
+        select(Recommendation.resource_id, Recommendation.recommendation_type)
+        .join(Resource, Resource.id == Recommendation.resource_id)
+        .where(Recommendation.resource_id.in_(resource_ids), Recommendation.implemented == True,  # noqa: E712
+               Recommendation.implemented_at >= Resource.updated_at)
+    ).all())
+
+
+def _oldest_open_transaction(session: Session) -> Optional[datetime]:
+    """When the oldest other open transaction on the database started (naive
+    UTC), or None if there is none or it can't be known (SQLite).
+
+    Ingests stamp updated_at batch by batch but commit at the end of the
+    upload, so their rows can become visible after a refresh that started
+    later than their stamps. Compared with updated_at, which the app stamps,
+    so the app and database clocks are assumed to agree. Sessions of other
+    roles are only seen with pg_read_all_stats.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    return session.connection().execute(text(
+        "SELECT min(xact_start) AT TIME ZONE 'UTC' FROM pg_stat_activity"
+        " WHERE datname = current_database() AND pid <> pg_backend_pid()"
+    )).scalar()
+
+
+def list_accounts(session: Session) -> List[str]:
+    """Every account with resources, sorted."""
+    return list(session.exec(select(distinct(Resource.account_id)).order_by(Resource.account_id)).all())
+
+
+def refresh_accounts(engine: Engine, optimizer: OptimizationEngine, workers: int = 1,
+                     listener: Optional[RefreshListener] = None) -> int:
+    """Refresh every account, up to `workers` at a time, each in its own
+    session; returns the total written. SQLite runs them one at a time."""
+    with Session(engine) as session:
+        accounts = list_accounts(session)
+
+    def refresh(account_id: str) -> int:
+        with Session(engine, expire_on_commit=False) as session:
+            return refresh_recommendations(session, optimizer, account_id, listener)
+
+    if engine.dialect.name == "sqlite" or workers <= 1 or len(accounts) <= 1:
+        return sum(map(refresh, accounts))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh") as pool:
+        return sum(pool.map(refresh, accounts))
+
+
+def list_recommendations(session: Session) -> List[Recommendation]:
+    """All persisted recommendations, open and implemented, in creation order."""
+    return session.exec(select(Recommendation).order_by(Recommendation.id)).all()
+
+
+def recommendations_query(sort: str = "id", after: Optional[Dict[str, Any]] = None, columns: Optional[list] = None,
+                          account_id: str = DEFAULT_ACCOUNT):
+    """SELECT for the account's recommendations in `sort` order ("id" or
+    "potential_saving", highest first), starting after the keyset position
+    `after` if given.
+
+    Selects whole Recommendation objects, or just `columns` (which must
+    include the sort keys) as plain rows."""
+    stmt = select(*columns) if columns else select(Recommendation)
+    stmt = stmt.where(Recommendation.account_id == account_id)
+    if sort == "potential_saving":
+        stmt = stmt.order_by(Recommendation.potential_saving.desc(), Recommendation.id)
+        if after is not None:
+            stmt = stmt.where(or_(
+                Recommendation.potential_saving < after["potential_saving"],
+                and_(Recommendation.potential_saving == after["potential_saving"],
+                     Recommendation.id > after["id"]),
+            ))
+    else:
+        stmt = stmt.order_by(Recommendation.id)
+        if after is not None:
+            stmt = stmt.where(Recommendation.id > after["id"])
+    return stmt
+
+
+def keyset_position(recommendation: Recommendation, sort: str = "id") -> Dict[str, Any]:
+    """Keyset position of a row (object or column row), for recommendations_query(after=...)."""
+    if sort == "potential_saving":
+        return {"potential_saving": recommendation.potential_saving, "id": recommendation.id}
+    return {"id": recommendation.id}
+
+
+def fleet_summary(session: Session, optimizer: OptimizationEngine,
+                  account_id: str = DEFAULT_ACCOUNT) -> Dict[str, Any]:
+    """Summary statistics of the account, computed entirely with SQL aggregates."""
+    total_resources, total_monthly_cost = session.exec(
+        select(func.count(Resource.id), func.coalesce(func.sum(Resource.monthly_cost), 0.0))
+        .where(Resource.account_id == account_id)
+    ).one()
+    open_recommendations, total_potential_savings = session.exec(
+        select(func.count(Recommendation.id), func.coalesce(func.sum(Recommendation.potential_saving), 0.0))
+        .where(Recommendation.account_id == account_id, Recommendation.implemented == False)  # noqa: E712
+    ).one()
+    return optimizer.build_summary(total_resources, total_monthly_cost,
+                                   total_potential_savings, open_recommendations)
+
+
+def mark_implemented(session: Session, resource_id: int, account_id: str = DEFAULT_ACCOUNT) -> List[Recommendation]:
+    """Mark the resource's open recommendations implemented, if it is in the
+    account; returns the updated rows."""
+    implemented_at = datetime.utcnow()
+    lock_rollups(session.connection(), [account_id])
+    closed = session.exec(
+        update(Recommendation)
+        .where(Recommendation.resource_id == resource_id, Recommendation.account_id == account_id,
+               Recommendation.implemented == False)  # noqa: E712
+        .values(implemented=True, implemented_at=implemented_at)
+        .returning(Recommendation.resource_id, Recommendation.potential_saving)
+    ).all()
+    rollups = RollupDelta()
+    rollups.add_recommendations(session.connection(), closed, sign=-1)
+    rollups.apply(session.connection())
+    session.commit()
+    return session.exec(
+        select(Recommendation)
+        .where(Recommendation.resource_id == resource_id, Recommendation.implemented_at == implemented_at)
+    ).all()
+
+
+def implement_many(session: Session, resource_ids: Optional[List[int]] = None,
+                   recommendation_type: Optional[str] = None, provider: Optional[str] = None,
+                   min_potential_saving: Optional[float] = None,
+                   account_id: str = DEFAULT_ACCOUNT) -> List[Dict[str, Any]]:
+    """Mark open recommendations implemented in one transaction, using
+    batched UPDATE ... RETURNING statements.
+
+    Targets the account's listed resources (if any) restricted by the
+    filters given; resources of other accounts are not_found.
+    Returns one result per listed resource, or per updated resource when
+    only filters are given. Safe to retry: recommendations implemented by an
+    earlier call are reported as already_implemented with their original time.
+    """
+    criteria = [Recommendation.account_id == account_id]
+    if recommendation_type is not None:
+        criteria.append(Recommendation.recommendation_type == recommendation_type)
+    if min_potential_saving is not None:
+        criteria.append(Recommendation.potential_saving >= min_potential_saving)
+    if provider is not None:
+        criteria.append(Recommendation.resource_id.in_(
+            select(Resource.id).where(Resource.account_id == account_id, Resource.provider == provider)
+        ))
+
+    implemented_at = datetime.utcnow()
+    stmt = (
+        update(Recommendation)
+        .where(Recommendation.implemented == False, *criteria)  # noqa: E712
+        .values(implemented=True, implemented_at=implemented_at)
+        .returning(Recommendation.resource_id, Recommendation.potential_saving)
+        .execution_options(synchronize_session=False)
+    )
+    # Implemented savings leave the cost rollups of their resources' groups
+    lock_rollups(session.connection(), [account_id])
+    rollups = RollupDelta()
+    if resource_ids is None:
+        rows = session.exec(stmt).all()
+        rollups.add_recommendations(session.connection(), rows, sign=-1)
+        rollups.apply(session.connection())
+        updated = sorted({row.resource_id for row in rows})
+        session.commit()
+        return [{"resource_id": rid, "status": "implemented", "implemented_at": implemented_at} for rid in updated]
+
+    ids = list(dict.fromkeys(resource_ids))  # de-duplicated, in request order
+    results: Dict[int, Dict[str, Any]] = {}
+    for start in range(0, len(ids), IMPLEMENT_BATCH_SIZE):
+        batch = ids[start:start + IMPLEMENT_BATCH_SIZE]
+        rows = session.exec(stmt.where(Recommendation.resource_id.in_(batch))).all()
+        rollups.add_recommendations(session.connection(), rows, sign=-1)
+        for row in rows:
+            results[row.resource_id] = {"resource_id": row.resource_id, "status": "implemented",
+                                        "implemented_at": implemented_at}
+        rest = [rid for rid in batch if rid not in results]
+        if not rest:
+            continue
+        # Explain the rest: implemented earlier, nothing matching, or no such resource
+        earlier = dict(session.exec(
+            select(Recommendation.resource_id, func.max(Recommendation.implemented_at))
+            .where(Recommendation.resource_id.in_(rest), Recommendation.implemented == True, *criteria)  # noqa: E712
+            .group_by(Recommendation.resource_id)
+        ).all())
+        existing = set(session.exec(
+            select(Resource.id).where(Resource.id.in_(rest), Resource.account_id == account_id)
+        ).all())
+        for rid in rest:
+            if rid in earlier:
+                results[rid] = {"resource_id": rid, "status": "already_implemented", "implemented_at": earlier[rid]}
+            else:
+                status = "no_recommendation" if rid in existing else "not_found"
+                results[rid] = {"resource_id": rid, "status": status, "implemented_at": None}
+    rollups.apply(session.connection())
+    session.commit()
+    return [results[rid] for rid in ids]
@@ -0,0 +1,86 @@
+"""Parsing and checking of resource records from CSV or NDJSON lines.
+
+Shared by the loader (ingest.py) and the offline analysis CLI (analyze.py),
+so it imports nothing beyond the standard library: no SQLAlchemy or models.
+"""
+import csv
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# Account of resources ingested, and requests made, without one
+DEFAULT_ACCOUNT = "default"
+
+INGEST_FIELDS = (
+    "account_id", "name", "type", "provider", "instance_type", "size",
+    "cpu_utilization", "memory_utilization", "storage_gb", "monthly_cost",
+)
+REQUIRED_FIELDS = ("name", "type", "provider", "monthly_cost")
+FLOAT_FIELDS = ("cpu_utilization", "memory_utilization", "monthly_cost")
+INT_FIELDS = ("storage_gb",)
+
+
+class IngestError(ValueError):
+    """A malformed input row; `line` is 1-based."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def coerce(field: str, value: Any, line: int) -> Any:
+    """A FLOAT_FIELDS/INT_FIELDS value as a number (other fields as given);
+    empty strings become None."""
+    if value == "":
+        return None
+    try:
+        if value is not None and field in FLOAT_FIELDS:
+            return float(value)
+        if value is not None and field in INT_FIELDS:
+            return int(value)
+    except (TypeError, ValueError):
+        raise IngestError(line, f"invalid {field}: {value!r}")
+    return value
+
+
+def normalize_row(raw: Dict[str, Any], line: int, account_id: Optional[str] = None,
+                  required: Sequence[str] = REQUIRED_FIELDS) -> Dict[str, Any]:
+    """Coerce one parsed record to INGEST_FIELDS; empty strings become NULL.
+
+    With `account_id`, records must belong to that account (or name none).
+    """
+    row = {field: coerce(field, raw.get(field), line) for field in INGEST_FIELDS}
+    missing = [field for field in required if row[field] is None]
+    if missing:
+        raise IngestError(line, f"missing {', '.join(missing)}")
+    if account_id is not None and row["account_id"] not in (None, account_id):
+        raise IngestError(line, f"account_id {row['account_id']!r} is not the request's account {account_id!r}")
+    row["account_id"] = row["account_id"] or account_id or DEFAULT_ACCOUNT
+    return row
+
+
+Normalizer = Callable[[Dict[str, Any], int], Dict[str, Any]]
+
+
+def parse_lines(lines: Iterable[str], fmt: str, header: Optional[List[str]] = None,
+                first_line: int = 1, normalize: Normalizer = normalize_row) -> Iterator[Dict[str, Any]]:
+    """Parse CSV (with `header`, or a header line first) or NDJSON lines into
+    records checked by `normalize` (resource rows by default)."""
+    if fmt == "ndjson":
+        for line, text in enumerate(lines, first_line):
+            if text.strip():
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    raise IngestError(line, f"invalid JSON: {e}")
+                if not isinstance(record, dict):
+                    raise IngestError(line, "expected a JSON object")
+                yield normalize(record, line)
+        return
+
+    reader = csv.reader(lines)
+    if header is None:
+        header = next(reader, None)
+        first_line += 1
+    for line, values in enumerate(reader, first_line):
+        if values:
+            yield normalize(dict(zip(header, values)), line)
@@ -0,0 +1,205 @@
+"""Cost and savings totals per (account, provider, type, instance_type), kept current on write.
+
+CostRollup holds one row per group: resource count and monthly cost, plus
+the count and savings of open recommendations. Every write path measures
+the groups of the resources it touches before and after the change and
+applies the difference as an additive upsert in the same transaction, so a
+breakdown reads an account's few hundred rows however large the fleet is.
+
+On Postgres, writers hold a transaction-level advisory lock per account from
+the first measurement to commit, so each sees the others' changes to that
+account either completely or not at all, and accounts don't wait on each
+other.
+
+Float totals can drift by rounding over many deltas, and writes that bypass
+these paths (ad-hoc SQL, ORM scripts) are not seen; rebuild_rollups
+recomputes the table from scratch and runs on every full refresh.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import Connection, delete, distinct, text, true
+from sqlmodel import func, select
+from catalog import InstanceCatalog
+from models import CostRollup, Recommendation, Resource
+
+GROUP_FIELDS = ("account_id", "provider", "type", "instance_type")
+TOTAL_FIELDS = ("resources", "monthly_cost", "open_recommendations", "potential_savings")
+BREAKDOWN_FIELDS = ("provider", "type", "instance_type", "family")
+LOOKUP_BATCH_SIZE = 1000
+ROLLUP_LOCK_KEY = 0x726F6C6C  # pg_advisory_xact_lock(key, hashtext(account_id)) for rollup writers
+
+Group = Tuple[str, str, str, str]
+
+
+def lock_rollups(conn: Connection, accounts: Iterable[str]) -> None:
+    """Serialize rollup writers of `accounts` until the transaction ends
+    (Postgres only; SQLite allows a single writer anyway).
+
+    Locks are taken in sorted order, so writers of overlapping accounts
+    can't deadlock within one call.
+    """
+    if conn.dialect.name == "postgresql":
+        for account_id in sorted(set(accounts)):
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key, hashtext(:account_id))"),
+                         {"key": ROLLUP_LOCK_KEY, "account_id": account_id})
+
+
+def resource_totals(conn: Connection, where=None) -> List[Tuple]:
+    """(*GROUP_FIELDS, *TOTAL_FIELDS) per group for the resources matching
+    `where` (all when None)."""
+    open_recs = (Recommendation.resource_id == Resource.id, Recommendation.implemented == False)  # noqa: E712
+    per_resource = select(
+        Resource.account_id, Resource.provider, Resource.type,
+        func.coalesce(Resource.instance_type, "").label("instance_type"),
+        Resource.monthly_cost,
+        select(func.count()).where(*open_recs).scalar_subquery().label("open_recommendations"),
+        select(func.coalesce(func.sum(Recommendation.potential_saving), 0.0))
+        .where(*open_recs).scalar_subquery().label("potential_savings"),
+    ).where(where if where is not None else true()).subquery()
+    c = per_resource.c
+    return conn.execute(
+        select(c.account_id, c.provider, c.type, c.instance_type, func.count(),
+               func.sum(c.monthly_cost), func.sum(c.open_recommendations), func.sum(c.potential_savings))
+        .group_by(c.account_id, c.provider, c.type, c.instance_type)
+    ).all()
+
+
+class RollupDelta:
+    """Signed changes to CostRollup rows, accumulated in memory and written at once."""
+
+    def __init__(self):
+        self.totals: Dict[Group, List[float]] = {}
+
+    def add(self, group: Sequence[str], totals: Sequence[float], sign: int = 1) -> None:
+        current = self.totals.setdefault(tuple(group), [0, 0.0, 0, 0.0])
+        for i, value in enumerate(totals):
+            # Postgres sums counts as numeric; keep ints and floats apart
+            current[i] += sign * type(current[i])(value or 0)
+
+    def add_totals(self, rows: Iterable[Tuple], sign: int = 1) -> None:
+        """Add resource_totals rows (sign -1 subtracts them)."""
+        for row in rows:
+            self.add(row[:len(GROUP_FIELDS)], row[len(GROUP_FIELDS):], sign)
+
+    def add_recommendations(self, conn: Connection, recommendations: Iterable[Tuple[int, float]],
+                            sign: int = 1) -> None:
+        """Count (resource_id, potential_saving) pairs of recommendations that
+        opened (sign 1) or closed (sign -1) in their resources' groups.
+
+        Lock their accounts (lock_rollups) before changing the recommendations."""
+        per_resource: Dict[int, List[float]] = {}
+        for resource_id, saving in recommendations:
+            totals = per_resource.setdefault(resource_id, [0, 0.0])
+            totals[0] += 1
+            totals[1] += saving
+        ids = list(per_resource)
+        for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+            rows = conn.execute(
+                select(Resource.id, Resource.account_id, Resource.provider, Resource.type,
+                       func.coalesce(Resource.instance_type, ""))
+                .where(Resource.id.in_(ids[start:start + LOOKUP_BATCH_SIZE]))
+            )
+            for resource_id, *group in rows:
+                count, saving = per_resource[resource_id]
+                self.add(group, (0, 0.0, count, saving), sign)
+
+    def apply(self, conn: Connection) -> None:
+        """Upsert the accumulated changes and drop groups left empty."""
+        now = datetime.utcnow()
+        # Sorted, so concurrent writers lock group rows in the same order
+        rows = [
+            {**dict(zip(GROUP_FIELDS, group)), **dict(zip(TOTAL_FIELDS, totals)), "updated_at": now}
+            for group, totals in sorted(self.totals.items()) if any(totals)
+        ]
+        self.totals.clear()
+        if not rows:
+            return
+        if conn.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        table = CostRollup.__table__
+        stmt = insert(table)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=list(GROUP_FIELDS),
+            set_={**{field: table.c[field] + stmt.excluded[field] for field in TOTAL_FIELDS},
+                  "updated_at": stmt.excluded.updated_at},
+        ), rows)
+        conn.execute(delete(table).where(table.c.resources <= 0))
+
+
+@contextmanager
+def tracking(conn: Connection, where, accounts: Iterable[str]) -> Iterator[None]:
+    """Roll changes made inside the block to the resources matching `where`
+    (and their recommendations), all in `accounts`, into CostRollup.
+
+    `where` must select the same resources before and after the change,
+    e.g. by id or natural key rather than by a column the block updates.
+    """
+    lock_rollups(conn, accounts)
+    delta = RollupDelta()
+    delta.add_totals(resource_totals(conn, where), sign=-1)
+    yield
+    delta.add_totals(resource_totals(conn, where))
+    delta.apply(conn)
+
+
+def rebuild_rollups(conn: Connection, account_id: Optional[str] = None) -> int:
+    """Recompute the CostRollup rows of one account, or of all, from the
+    resource and recommendation tables; returns the number of groups."""
+    table = CostRollup.__table__
+    if account_id is None:
+        accounts = conn.execute(select(distinct(Resource.account_id)).union(select(table.c.account_id))).scalars()
+        lock_rollups(conn, accounts)
+        scope, stale = None, true()
+    else:
+        lock_rollups(conn, [account_id])
+        scope, stale = Resource.account_id == account_id, table.c.account_id == account_id
+    delta = RollupDelta()
+    delta.add_totals(resource_totals(conn, scope))
+    conn.execute(delete(table).where(stale))
+    groups = len(delta.totals)
+    delta.apply(conn)
+    return groups
+
+
+def _group_value(row: CostRollup, field: str, catalog: Optional[InstanceCatalog]) -> Optional[str]:
+    if field == "family":
+        known = catalog.get(row.provider, row.instance_type) if catalog and row.instance_type else None
+        return known.family if known else None
+    return getattr(row, field) or None
+
+
+def _with_percentage(totals: Dict[str, Any]) -> Dict[str, Any]:
+    cost, savings = totals["monthly_cost"], totals["potential_savings"]
+    return {
+        **totals,
+        "monthly_cost": round(cost, 2),
+        "potential_savings": round(savings, 2),
+        "savings_percentage": round(savings / cost * 100, 1) if cost > 0 else 0,
+    }
+
+
+def cost_breakdown(rows: Iterable[CostRollup], group_by: Sequence[str],
+                   catalog: Optional[InstanceCatalog] = None) -> Dict[str, Any]:
+    """Totals of CostRollup rows grouped by any of BREAKDOWN_FIELDS ("family"
+    is the catalog family of the instance type), costliest group first."""
+    unknown = [field for field in group_by if field not in BREAKDOWN_FIELDS]
+    if unknown:
+        raise ValueError(f"Cannot group by {', '.join(unknown)}; choose from {', '.join(BREAKDOWN_FIELDS)}")
+    group_by = list(dict.fromkeys(group_by))
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    overall = dict.fromkeys(TOTAL_FIELDS, 0)
+    for row in rows:
+        key = tuple(_group_value(row, field, catalog) for field in group_by)
+        totals = groups.setdefault(key, {**dict(zip(group_by, key)), **dict.fromkeys(TOTAL_FIELDS, 0)})
+        for field in TOTAL_FIELDS:
+            totals[field] += getattr(row, field)
+            overall[field] += getattr(row, field)
+    ordered = sorted(groups.values(), key=lambda totals: -totals["monthly_cost"])
+    return {
+        "group_by": group_by,
+        "groups": [_with_percentage(totals) for totals in ordered],
+        "totals": _with_percentage(overall),
+    }
@@ -0,0 +1,321 @@
+import hashlib
+from dataclasses import astuple, dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type
+import numpy as np
+from catalog import InstanceCatalog, load_catalog
+from columnar import ResourceColumns, ResourceRow
+
+
+@dataclass(frozen=True)
+class RuleThresholds:
+    """Tunable limits for the built-in rules (see Settings in config.py)."""
+    downsize_cpu_threshold: float = 30.0
+    downsize_memory_threshold: float = 50.0
+    shrink_storage_gb_threshold: int = 500
+    shrink_factor: float = 0.7
+    rightsize_headroom: float = 0.3  # spare capacity kept above observed usage when right-sizing
+
+
+class Rule:
+    """Base class for optimization rules.
+
+    A rule declares the resource types it applies to and the fields it reads.
+    `matches` tests a single resource, `mask` tests a whole ResourceColumns
+    snapshot at once, and `build` (`build_many` for mask hits) renders the
+    recommendation for a match.
+    """
+    name: str = ""
+    resource_types: Tuple[str, ...] = ()
+    fields: Tuple[str, ...] = ()
+
+    def __init__(self, thresholds: RuleThresholds):
+        self.thresholds = thresholds
+
+    def matches(self, resource) -> bool:
+        raise NotImplementedError
+
+    def mask(self, columns: ResourceColumns) -> np.ndarray:
+        """Vectorized `matches`; rules without one fall back to a row loop."""
+        return np.fromiter((self.matches(r) for r in columns.rows), dtype=bool, count=len(columns))
+
+    def build(self, resource) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def build_many(self, columns: ResourceColumns, indices: np.ndarray) -> List[Dict[str, Any]]:
+        """`build` for the rows at `indices` (matches of `mask`), in order.
+        Rules may compute the numbers as arrays; the default builds one row at a time."""
+        return [self.build(columns.row(i)) for i in indices.tolist()]
+
+    def sql_predicate(self, model):
+        """SQL equivalent of `matches` against `model`'s columns, used to
+        filter candidates in the database. It may select a superset of the
+        matches, never fewer. None means it can't be pushed down."""
+        return None
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies data the rule depends on beyond its thresholds (e.g. a
+        catalog version); part of the rules fingerprint."""
+        return ""
+
+
+class CompiledRules:
+    """Rule instances bound to thresholds and indexed by resource type."""
+
+    def __init__(self, rules: List[Rule], thresholds: RuleThresholds):
+        self.rules = rules
+        self.thresholds = thresholds
+        by_type: Dict[str, List[Rule]] = {}
+        for rule in rules:
+            for resource_type in rule.resource_types:
+                by_type.setdefault(resource_type, []).append(rule)
+        self.by_type: Dict[str, Tuple[Rule, ...]] = {t: tuple(r) for t, r in by_type.items()}
+
+    def for_type(self, resource_type: str) -> Tuple[Rule, ...]:
+        return self.by_type.get(resource_type, ())
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable identifier of the rule set and thresholds; persisted results
+        computed under a different fingerprint are stale."""
+        key = repr(([(rule.name, rule.cache_key) for rule in self.rules], astuple(self.thresholds)))
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def sql_filter(self, model):
+        """WHERE clause selecting only rows some rule could match.
+
+        A type whose rules all provide a SQL predicate is filtered by them;
+        otherwise every row of that type is a candidate.
+        """
+        from sqlalchemy import and_, false, or_
+        clauses = []
+        for resource_type, rules in self.by_type.items():
+            predicates = [rule.sql_predicate(model) for rule in rules]
+            if any(p is None for p in predicates):
+                clauses.append(model.type == resource_type)
+            else:
+                clauses.append(and_(model.type == resource_type, or_(*predicates)))
+        return or_(*clauses) if clauses else false()
+
+
+class RuleRegistry:
+    """Collects rule classes; `compile` binds them to a set of thresholds."""
+
+    def __init__(self):
+        self._rule_classes: List[Type[Rule]] = []
+
+    def register(self, rule_cls: Type[Rule]) -> Type[Rule]:
+        """Register a rule class. Usable as a decorator."""
+        if not rule_cls.name or not rule_cls.resource_types:
+            raise ValueError(f"Rule {rule_cls.__name__} must declare a name and resource_types")
+        unknown = set(rule_cls.fields) - set(ResourceRow._fields)
+        if unknown:
+            raise ValueError(f"Rule {rule_cls.name} reads unknown fields: {sorted(unknown)}")
+        self._rule_classes.append(rule_cls)
+        return rule_cls
+
+    @property
+    def rule_classes(self) -> Tuple[Type[Rule], ...]:
+        return tuple(self._rule_classes)
+
+    def compile(self, thresholds: Optional[RuleThresholds] = None) -> CompiledRules:
+        thresholds = thresholds or RuleThresholds()
+        return CompiledRules([rule_cls(thresholds) for rule_cls in self._rule_classes], thresholds)
+
+
+default_registry = RuleRegistry()
+
+
+@default_registry.register
+class OverprovisionedInstanceRule(Rule):
+    """Instance is over-provisioned (CPU < 30% AND memory < 50% by default)
+    and a cheaper catalog type fits its usage plus headroom."""
+    name = "overprovisioned_instance"
+    resource_types = ("instance",)
+    fields = ("id", "provider", "instance_type", "cpu_utilization", "memory_utilization", "monthly_cost")
+
+    def __init__(self, thresholds: RuleThresholds, catalog: Optional[InstanceCatalog] = None):
+        super().__init__(thresholds)
+        self.catalog = catalog or load_catalog()
+
+    @property
+    def cache_key(self) -> str:
+        return self.catalog.fingerprint
+
+    def _underused(self, resource) -> bool:
+        return (resource.cpu_utilization is not None and
+                resource.memory_utilization is not None and
+                resource.cpu_utilization < self.thresholds.downsize_cpu_threshold and
+                resource.memory_utilization < self.thresholds.downsize_memory_threshold)
+
+    def _rightsize(self, resource):
+        return self.catalog.rightsize(resource.provider, resource.instance_type, resource.cpu_utilization,
+                                      resource.memory_utilization, self.thresholds.rightsize_headroom)
+
+    def matches(self, resource) -> bool:
+        return self._underused(resource) and self._rightsize(resource) is not None
+
+    def _fits(self, columns: ResourceColumns, rows: np.ndarray):
+        """Right-size each of `rows` (indices into `columns`): the current list
+        price, the target's list price (NaN where nothing cheaper fits) and the
+        target type name. Same lookup as `build`."""
+        current_price, target_price = np.full(len(rows), np.nan), np.full(len(rows), np.nan)
+        target_type = np.full(len(rows), None, dtype=object)
+        if not len(rows):
+            return current_price, target_price, target_type
+        # One vectorized family lookup per (provider, instance type) present;
+        # numbering the pairs with a dict is far cheaper than sorting strings
+        scale = 1 + self.thresholds.rightsize_headroom
+        keys = list(zip(columns.provider[rows].tolist(), columns.instance_type[rows].tolist()))
+        codes = {key: k for k, key in enumerate(dict.fromkeys(keys))}
+        group = np.array(list(map(codes.__getitem__, keys)), dtype=np.intp)
+        for key, k in codes.items():
+            positions = np.flatnonzero(group == k)
+            members = rows[positions]
+            current = self.catalog.get(*key)
+            if current is None:
+                continue
+            family = self.catalog.family(current)
+            fits = family.cheapest_fits(
+                current.vcpu * columns.cpu_utilization[members] / 100 * scale,
+                current.memory_gb * columns.memory_utilization[members] / 100 * scale,
+                current.monthly_price,
+            )
+            found = fits >= 0
+            current_price[positions] = current.monthly_price
+            target_price[positions[found]] = family.monthly_price[fits[found]]
+            target_type[positions[found]] = [family.types[i].instance_type for i in fits[found].tolist()]
+        return current_price, target_price, target_type
+
+    def savings(self, columns: ResourceColumns, rows: np.ndarray) -> np.ndarray:
+        """Monthly saving from right-sizing each of `rows` (indices into
+        `columns`), whatever the thresholds; NaN where nothing cheaper fits.
+        Same arithmetic as `build`."""
+        current_price, target_price, _ = self._fits(columns, rows)
+        return columns.monthly_cost[rows] * (1 - target_price / current_price)
+
+    def mask(self, columns: ResourceColumns) -> np.ndarray:
+        mask = ((columns.cpu_utilization < self.thresholds.downsize_cpu_threshold)
+                & (columns.memory_utilization < self.thresholds.downsize_memory_threshold))
+        candidates = np.flatnonzero(mask)
+        fits = self._fits(columns, candidates)
+        # build_many renders a subset of the candidates: keep the lookup for it
+        columns.derived[self] = (candidates, fits)
+        mask[candidates] = ~np.isnan(fits[1])
+        return mask
+
+    def build_many(self, columns: ResourceColumns, indices: np.ndarray) -> List[Dict[str, Any]]:
+        if self in columns.derived:
+            candidates, fits = columns.derived[self]
+            positions = np.searchsorted(candidates, indices)
+            current_price, target_price, target_type = (values[positions] for values in fits)
+        else:
+            current_price, target_price, target_type = self._fits(columns, indices)
+        cost = columns.monthly_cost[indices]
+        monthly_saving = cost * (1 - target_price / current_price)
+        utilization_avg = (columns.cpu_utilization[indices] + columns.memory_utilization[indices]) / 2
+        confidence = np.minimum(0.95, 0.5 + (self.thresholds.downsize_cpu_threshold - utilization_avg) / 60)
+        return [
+            {
+                "resource_id": resource_id,
+                "recommendation_type": "downsize",
+                "current_config": f"{instance_type} - ${monthly_cost}/month",
+                "suggested_config": f"{target} - ${remaining:.0f}/month",
+                "potential_saving": saving,
+                "confidence": round(conf, 2),
+                "reason": f"Low utilization: {cpu}% CPU, {memory}% memory. Downsize to save costs.",
+                "implemented": False
+            }
+            for resource_id, instance_type, monthly_cost, target, remaining, saving, conf, cpu, memory in zip(
+                columns.source("id", indices), columns.source("instance_type", indices),
+                columns.source("monthly_cost", indices), target_type.tolist(), (cost - monthly_saving).tolist(),
+                monthly_saving.tolist(), confidence.tolist(), columns.source("cpu_utilization", indices),
+                columns.source("memory_utilization", indices))
+        ]
+
+    def sql_predicate(self, model):
+        # The catalog fit is checked in Python on the (few) rows this returns
+        from sqlalchemy import and_
+        return and_(model.cpu_utilization < self.thresholds.downsize_cpu_threshold,
+                    model.memory_utilization < self.thresholds.downsize_memory_threshold)
+
+    def build(self, resource) -> Dict[str, Any]:
+        current, target = self._rightsize(resource)
+        # The list-price ratio applied to what the resource is actually billed
+        savings_percent = 1 - target.monthly_price / current.monthly_price
+        monthly_saving = resource.monthly_cost * savings_percent
+
+        # Higher confidence for lower utilization
+        utilization_avg = (resource.cpu_utilization + resource.memory_utilization) / 2
+        confidence = min(0.95, 0.5 + (self.thresholds.downsize_cpu_threshold - utilization_avg) / 60)
+
+        return {
+            "resource_id": resource.id,
+            "recommendation_type": "downsize",
+            "current_config": f"{resource.instance_type} - ${resource.monthly_cost}/month",
+            "suggested_config": f"{target.instance_type} - ${resource.monthly_cost - monthly_saving:.0f}/month",
+            "potential_saving": monthly_saving,
+            "confidence": round(confidence, 2),
+            "reason": f"Low utilization: {resource.cpu_utilization}% CPU, {resource.memory_utilization}% memory. Downsize to save costs.",
+            "implemented": False
+        }
+
+
+@default_registry.register
+class OversizedStorageRule(Rule):
+    """Storage volume is oversized (> 500GB by default)."""
+    name = "oversized_storage"
+    resource_types = ("storage",)
+    fields = ("id", "storage_gb", "monthly_cost")
+
+    def matches(self, resource) -> bool:
+        return bool(resource.storage_gb) and resource.storage_gb > self.thresholds.shrink_storage_gb_threshold
+
+    def mask(self, columns: ResourceColumns) -> np.ndarray:
+        return columns.storage_gb > self.thresholds.shrink_storage_gb_threshold
+
+    def sql_predicate(self, model):
+        return model.storage_gb > self.thresholds.shrink_storage_gb_threshold
+
+    def build_many(self, columns: ResourceColumns, indices: np.ndarray) -> List[Dict[str, Any]]:
+        storage_gb, cost = columns.storage_gb[indices], columns.monthly_cost[indices]
+        suggested_size = (storage_gb * self.thresholds.shrink_factor).astype(np.int64)
+        monthly_saving = cost * round(1 - self.thresholds.shrink_factor, 4)
+        confidence = np.minimum(0.9, 0.6 + (storage_gb - self.thresholds.shrink_storage_gb_threshold) / 1000)
+        return [
+            {
+                "resource_id": resource_id,
+                "recommendation_type": "shrink",
+                "current_config": f"{size}GB - ${monthly_cost}/month",
+                "suggested_config": f"{suggested}GB - ${remaining:.0f}/month",
+                "potential_saving": saving,
+                "confidence": round(conf, 2),
+                "reason": f"Large storage volume ({size}GB). Consider reducing size to optimize costs.",
+                "implemented": False
+            }
+            for resource_id, size, monthly_cost, suggested, remaining, saving, conf in zip(
+                columns.source("id", indices), columns.source("storage_gb", indices),
+                columns.source("monthly_cost", indices), suggested_size.tolist(),
+                (cost - monthly_saving).tolist(), monthly_saving.tolist(), confidence.tolist())
+        ]
+
+    def build(self, resource) -> Dict[str, Any]:
+        threshold = self.thresholds.shrink_storage_gb_threshold
+        # Suggest reducing to shrink_factor (70%) of current size and save the rest
+        suggested_size = int(resource.storage_gb * self.thresholds.shrink_factor)
+        savings_percent = round(1 - self.thresholds.shrink_factor, 4)
+        monthly_saving = resource.monthly_cost * savings_percent
+
+        # Higher confidence for larger volumes
+        confidence = min(0.9, 0.6 + (resource.storage_gb - threshold) / 1000)
+
+        return {
+            "resource_id": resource.id,
+            "recommendation_type": "shrink",
+            "current_config": f"{resource.storage_gb}GB - ${resource.monthly_cost}/month",
+            "suggested_config": f"{suggested_size}GB - ${resource.monthly_cost - monthly_saving:.0f}/month",
+            "potential_saving": monthly_saving,
+            "confidence": round(confidence, 2),
+            "reason": f"Large storage volume ({resource.storage_gb}GB). Consider reducing size to optimize costs.",
+            "implemented": False
+        }
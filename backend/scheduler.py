@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """Runs `refresh` off the request path: on an interval, when notified of
+    changes, or on demand, never more than one run at a time.
+
+    Callers of `refresh_now` that arrive while a run is in progress wait for
+    the next run instead of starting their own, so a burst of requests costs
+    at most one extra run. Handlers serve whatever the last completed run
+    produced; `refreshed_at` and `age()` say how old that is.
+    """
+
+    def __init__(self, refresh: Callable[[], Any], interval: float = 60.0):
+        self._refresh = refresh
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._running = False
+        self._requested = 0  # tickets handed out by refresh_now
+        self._covered = 0  # every ticket up to this one is served by a completed run
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshed_at: Optional[datetime] = None  # start of the last successful run
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self.runs = 0
+        self.coalesced = 0
+
+    def start(self) -> None:
+        """Start the background thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def notify(self) -> None:
+        """Signal that inputs changed: the background thread refreshes soon,
+        without waiting for the interval."""
+        self._wake.set()
+
+    def refresh_now(self) -> None:
+        """Bring the snapshot up to date with everything before this call,
+        running the refresh or joining one that starts after it."""
+        with self._cond:
+            self._requested += 1
+            ticket = self._requested
+            joined = False
+            while self._running and self._covered < ticket:
+                if not joined:
+                    self.coalesced += 1
+                    joined = True
+                self._cond.wait()
+            if self._covered >= ticket:
+                return
+            self._running = True
+            covers = self._requested
+        self._run(covers)
+
+    def age(self) -> Optional[float]:
+        """Seconds since the snapshot's run started, or None before the first run."""
+        if self.refreshed_at is None:
+            return None
+        return (datetime.utcnow() - self.refreshed_at).total_seconds()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "age_seconds": self.age(),
+            "last_duration_seconds": self.last_duration,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "coalesced": self.coalesced,
+            "interval_seconds": self.interval,
+        }
+
+    def _run(self, covers: int) -> None:
+        started_at, start = datetime.utcnow(), time.perf_counter()
+        try:
+            self.last_result = self._refresh()
+            self.refreshed_at = started_at
+            self.last_error = None
+        except Exception as e:
+            self.last_error = repr(e)
+            raise
+        finally:
+            self.last_duration = time.perf_counter() - start
+            with self._cond:
+                self.runs += 1
+                self._running = False
+                # A failed run still releases its waiters; they see last_error
+                self._covered = max(self._covered, covers)
+                self._cond.notify_all()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh_now()
+            except Exception:
+                logger.exception("Background recommendation refresh failed")
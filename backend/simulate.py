@@ -0,0 +1,169 @@
+"""What-if analysis: recommendation counts and savings across a grid of thresholds.
+
+The built-in rules flag an instance when CPU < c and memory < m (and a
+cheaper catalog type fits, which doesn't depend on c or m), and a volume
+when its size > t, saving (1 - f) of its cost. So each resource's saving is
+computed once into a snapshot, and a whole grid is answered by bucketing
+resources by the grid values they fall under and taking prefix sums:
+O(resources + grid cells) instead of one rule pass per combination.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from sqlmodel import Session, func, select
+from columnar import ResourceColumns
+from models import DEFAULT_ACCOUNT, Resource
+from optimizer import OptimizationEngine
+from rules import OverprovisionedInstanceRule, OversizedStorageRule
+
+SNAPSHOT_CHUNK_SIZE = 100_000
+MAX_COMBINATIONS = 100_000
+
+
+@dataclass
+class SimulationSnapshot:
+    """Per-resource inputs of the simulation, independent of the thresholds."""
+    resources: int
+    monthly_cost: float
+    # Instances some cheaper catalog type fits, with the saving of moving to it
+    instance_cpu: np.ndarray
+    instance_memory: np.ndarray
+    instance_saving: np.ndarray
+    # Volumes the storage rule applies to
+    storage_gb: np.ndarray
+    storage_cost: np.ndarray
+
+
+def _rule(optimizer: OptimizationEngine, rule_cls):
+    return next((rule for rule in optimizer.rules.rules if isinstance(rule, rule_cls)), None)
+
+
+class SnapshotBuilder:
+    """Accumulates chunks of tuples in ResourceRow order (see candidate_columns)
+    into a SimulationSnapshot, whoever fetches them."""
+
+    def __init__(self, optimizer: OptimizationEngine):
+        self.downsize = _rule(optimizer, OverprovisionedInstanceRule)
+        self.shrink = _rule(optimizer, OversizedStorageRule)
+        self.resources, self.monthly_cost = 0, 0.0
+        self.parts: Dict[str, List[np.ndarray]] = {field: [] for field in (
+            "instance_cpu", "instance_memory", "instance_saving", "storage_gb", "storage_cost")}
+
+    def add(self, chunk: Sequence[tuple]) -> "SnapshotBuilder":
+        columns = ResourceColumns.from_rows(chunk)
+        self.resources += len(columns)
+        self.monthly_cost += float(columns.monthly_cost.sum())
+        if self.downsize is not None:
+            rows = np.flatnonzero(np.isin(columns.type, self.downsize.resource_types)
+                                  & ~np.isnan(columns.cpu_utilization) & ~np.isnan(columns.memory_utilization))
+            savings = self.downsize.savings(columns, rows)
+            fits = ~np.isnan(savings)
+            self.parts["instance_cpu"].append(columns.cpu_utilization[rows[fits]])
+            self.parts["instance_memory"].append(columns.memory_utilization[rows[fits]])
+            self.parts["instance_saving"].append(savings[fits])
+        if self.shrink is not None:
+            rows = np.flatnonzero(np.isin(columns.type, self.shrink.resource_types) & (columns.storage_gb > 0))
+            self.parts["storage_gb"].append(columns.storage_gb[rows])
+            self.parts["storage_cost"].append(columns.monthly_cost[rows])
+        return self
+
+    def build(self) -> SimulationSnapshot:
+        arrays = {field: np.concatenate(values) if values else np.empty(0) for field, values in self.parts.items()}
+        return SimulationSnapshot(resources=self.resources, monthly_cost=self.monthly_cost, **arrays)
+
+
+def build_snapshot(optimizer: OptimizationEngine, chunks: Iterable[Sequence[tuple]]) -> SimulationSnapshot:
+    """Snapshot from chunks of tuples in ResourceRow order (see candidate_columns)."""
+    builder = SnapshotBuilder(optimizer)
+    for chunk in chunks:
+        builder.add(chunk)
+    return builder.build()
+
+
+def snapshot_query(optimizer: OptimizationEngine, account_id: str = DEFAULT_ACCOUNT):
+    """Column-only SELECT of every resource of the account, in ResourceRow order."""
+    return select(*optimizer.candidate_columns(Resource)).where(Resource.account_id == account_id)
+
+
+def load_snapshot(session: Session, optimizer: OptimizationEngine, account_id: str = DEFAULT_ACCOUNT,
+                  chunk_size: int = SNAPSHOT_CHUNK_SIZE) -> SimulationSnapshot:
+    """Snapshot of every resource of the account, streamed from a column-only query."""
+    rows = session.exec(snapshot_query(optimizer, account_id).execution_options(yield_per=chunk_size))
+    return build_snapshot(optimizer, rows.partitions())
+
+
+def snapshot_version(session: Session, optimizer: OptimizationEngine, account_id: str = DEFAULT_ACCOUNT) -> tuple:
+    """Changes whenever the account's snapshot would: rules, resource count or the latest update."""
+    count, latest = session.exec(
+        select(func.count(Resource.id), func.max(Resource.updated_at)).where(Resource.account_id == account_id)
+    ).one()
+    return account_id, optimizer.fingerprint, count, latest
+
+
+def _grid(values: Optional[Sequence[float]], default: float) -> np.ndarray:
+    return np.unique(np.asarray(values if values else [default], dtype=np.float64))
+
+
+def simulate(snapshot: SimulationSnapshot, optimizer: OptimizationEngine,
+             cpu_thresholds: Optional[Sequence[float]] = None,
+             memory_thresholds: Optional[Sequence[float]] = None,
+             storage_gb_thresholds: Optional[Sequence[float]] = None,
+             shrink_factors: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """Recommendation counts and savings for every combination of the given
+    threshold values (each defaults to the engine's current value).
+
+    Grid values are de-duplicated and sorted; combinations are listed with
+    the CPU threshold varying slowest and the shrink factor fastest.
+    """
+    current = optimizer.rules.thresholds
+    cpu = _grid(cpu_thresholds, current.downsize_cpu_threshold)
+    memory = _grid(memory_thresholds, current.downsize_memory_threshold)
+    storage = _grid(storage_gb_thresholds, current.shrink_storage_gb_threshold)
+    factors = _grid(shrink_factors, current.shrink_factor)
+    if factors.min() < 0 or factors.max() > 1:
+        raise ValueError("Shrink factors must be between 0 and 1")
+    combinations = len(cpu) * len(memory) * len(storage) * len(factors)
+    if combinations > MAX_COMBINATIONS:
+        raise ValueError(f"{combinations} combinations requested; the limit is {MAX_COMBINATIONS}")
+
+    # Instance i is flagged at (c, m) iff cpu_i < c and memory_i < m, i.e. from
+    # the first grid value above it onwards: histogram those positions, then a
+    # 2-D prefix sum gives every cell.
+    shape = (len(cpu) + 1, len(memory) + 1)
+    cells = (np.searchsorted(cpu, snapshot.instance_cpu, side="right") * shape[1]
+             + np.searchsorted(memory, snapshot.instance_memory, side="right"))
+
+    def prefix(weights=None) -> np.ndarray:
+        hist = np.bincount(cells, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+        return hist.cumsum(axis=0).cumsum(axis=1)[:-1, :-1]
+
+    downsize_counts, downsize_savings = prefix(), prefix(snapshot.instance_saving)
+
+    # Volume i is flagged at t iff storage_gb_i > t, i.e. for grid values below
+    # it: a suffix sum over the same kind of histogram.
+    positions = np.searchsorted(storage, snapshot.storage_gb, side="left")
+
+    def suffix(weights=None) -> np.ndarray:
+        hist = np.bincount(positions, weights=weights, minlength=len(storage) + 1)
+        return hist[::-1].cumsum()[::-1][1:]
+
+    shrink_counts, shrink_costs = suffix(), suffix(snapshot.storage_cost)
+    # The rule rounds the saved fraction the same way
+    saved_fraction = np.round(1 - factors, 4)
+
+    counts = (downsize_counts[:, :, None, None] + shrink_counts[None, None, :, None]
+              + np.zeros(len(factors), dtype=np.int64))
+    savings = (downsize_savings[:, :, None, None]
+               + shrink_costs[None, None, :, None] * saved_fraction[None, None, None, :])
+    index = np.indices(counts.shape).reshape(4, -1)
+    rows = zip(cpu[index[0]].tolist(), memory[index[1]].tolist(), storage[index[2]].tolist(),
+               factors[index[3]].tolist(), counts.ravel().tolist(), savings.ravel().tolist())
+    return {
+        "total_resources": snapshot.resources,
+        "total_monthly_cost": round(snapshot.monthly_cost, 2),
+        "results": [
+            {"cpu_threshold": c, "memory_threshold": m, "storage_gb_threshold": t, "shrink_factor": f,
+             "recommendations": n, "potential_savings": round(saving, 2)}
+            for c, m, t, f, n, saving in rows
+        ],
+    }
@@ -0,0 +1,61 @@
+"""Fixed-bin utilization histograms used as mergeable percentile sketches.
+
+Utilization is a percentage, so a histogram with BINS equal-width bins over
+0-100 bounds the percentile error by the bin width (0.5 points) regardless of
+how many samples it summarizes. Two sketches merge by adding their counts,
+which is what makes daily rollups composable into any window.
+"""
+import zlib
+from typing import Sequence
+import numpy as np
+
+BINS = 200
+LOW, HIGH = 0.0, 100.0
+BIN_WIDTH = (HIGH - LOW) / BINS
+COUNT_DTYPE = np.dtype("<u4")
+
+
+def bin_index(values: np.ndarray) -> np.ndarray:
+    """Bin of each value; out-of-range values are clamped to the edge bins."""
+    return np.clip(((values - LOW) / BIN_WIDTH).astype(np.int64), 0, BINS - 1)
+
+
+def grouped_histograms(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """One histogram per group id in [0, n_groups), shape (n_groups, BINS).
+
+    NaN values (missing samples) are not counted.
+    """
+    present = ~np.isnan(values)
+    flat = groups[present] * BINS + bin_index(values[present])
+    return np.bincount(flat, minlength=n_groups * BINS).reshape(n_groups, BINS).astype(COUNT_DTYPE)
+
+
+def encode(counts: np.ndarray) -> bytes:
+    """Compact storage form: zlib-compressed little-endian counts (sparse
+    histograms compress to a few dozen bytes)."""
+    return zlib.compress(np.ascontiguousarray(counts, dtype=COUNT_DTYPE).tobytes())
+
+
+def decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype=COUNT_DTYPE)
+
+
+def decode_many(blobs: Sequence[bytes]) -> np.ndarray:
+    """Stack encoded sketches into a (len(blobs), BINS) array."""
+    if not blobs:
+        return np.zeros((0, BINS), dtype=COUNT_DTYPE)
+    return np.frombuffer(b"".join(zlib.decompress(b) for b in blobs), dtype=COUNT_DTYPE).reshape(-1, BINS)
+
+
+def quantiles(counts: np.ndarray, q: float) -> np.ndarray:
+    """The `q` quantile (0-1) of each histogram row, as the upper edge of the
+    bin containing it, so the estimate never understates usage. Rows without
+    samples give NaN."""
+    counts = np.atleast_2d(counts)
+    cumulative = np.cumsum(counts, axis=1, dtype=np.int64)
+    totals = cumulative[:, -1]
+    rank = np.ceil(q * totals)
+    # First bin whose cumulative count reaches the rank
+    bins = np.argmax(cumulative >= np.maximum(rank, 1)[:, None], axis=1)
+    result = LOW + (bins + 1) * BIN_WIDTH
+    return np.where(totals > 0, result, np.nan)
@@ -0,0 +1,129 @@
+"""Prometheus metrics for requests, the database and the optimizer (served at /metrics).
+
+Where /recommendations time goes:
+- cloudopt_request_phase_seconds splits a handler into refresh, query
+  (SQL + ORM hydration), summary and serialize;
+- cloudopt_db_statement_duration_seconds is time spent in the database
+  alone, so hydration is roughly query minus statement time;
+- cloudopt_rule_* counts and times each rule's evaluations.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+registry = CollectorRegistry()
+
+REQUEST_SECONDS = Histogram(
+    "cloudopt_http_request_duration_seconds", "HTTP request latency, including streamed bodies",
+    ["method", "route", "status"], registry=registry,
+)
+PHASE_SECONDS = Histogram(
+    "cloudopt_request_phase_seconds", "Time spent in each phase of a request handler",
+    ["route", "phase"], registry=registry,
+)
+RULE_EVALUATIONS = Counter("cloudopt_rule_evaluations_total", "Resources evaluated by each rule", ["rule"], registry=registry)
+RULE_MATCHES = Counter("cloudopt_rule_matches_total", "Recommendations produced by each rule", ["rule"], registry=registry)
+RULE_SECONDS = Counter("cloudopt_rule_seconds_total", "Time spent evaluating each rule", ["rule"], registry=registry)
+DB_STATEMENT_SECONDS = Histogram(
+    "cloudopt_db_statement_duration_seconds", "Time spent executing SQL statements, by kind",
+    ["statement"], registry=registry,
+)
+DB_ROWS = Counter(
+    "cloudopt_db_rows_total", "Rows returned or affected by SQL statements (server-side cursors report none)",
+    ["statement"], registry=registry,
+)
+
+STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def observe_rule(rule: str, evaluated: int, matched: int, seconds: float) -> None:
+    """OptimizationEngine observer (see optimizer.RuleObserver)."""
+    RULE_EVALUATIONS.labels(rule).inc(evaluated)
+    RULE_MATCHES.labels(rule).inc(matched)
+    RULE_SECONDS.labels(rule).inc(seconds)
+
+
+@contextmanager
+def phase(route: str, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.labels(route, name).observe(time.perf_counter() - start)
+
+
+def _statement_kind(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ""
+    return kind if kind in STATEMENT_KINDS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._telemetry_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    kind = _statement_kind(statement)
+    DB_STATEMENT_SECONDS.labels(kind).observe(time.perf_counter() - context._telemetry_start)
+    if cursor.rowcount and cursor.rowcount > 0:
+        DB_ROWS.labels(kind).inc(cursor.rowcount)
+
+
+def instrument_engines() -> None:
+    """Time every statement on every engine (including async engines' sync
+    core). Safe to call more than once."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class PoolCollector:
+    """Reports connection pool usage at scrape time for the engines that exist."""
+
+    def __init__(self, pools: Callable[[], Dict[str, Pool]]):
+        self.pools = pools
+
+    def collect(self):
+        gauge = GaugeMetricFamily("cloudopt_db_pool_connections", "Connection pool usage",
+                                  labels=["engine", "state"])
+        for name, pool in self.pools().items():
+            # Only QueuePool-style pools report sizes; SQLite's may not
+            for state, method in (("checked_out", "checkedout"), ("idle", "checkedin"),
+                                  ("overflow", "overflow"), ("size", "size")):
+                if hasattr(pool, method):
+                    gauge.add_metric([name, state], max(0, getattr(pool, method)()))
+        yield gauge
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template, so path
+    parameters don't explode label cardinality."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+import fleetgen
+from analyze import analyze_export, normalize_record, read_records, to_row
+from records import IngestError
+from optimizer import OptimizationEngine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The web and database stack the core modules must not import
+HEAVY_MODULES = ("sqlalchemy", "sqlmodel", "pydantic", "fastapi", "psycopg2", "asyncpg", "dotenv", "config", "models")
+
+
+def run_python(*args, **kwargs):
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    return subprocess.run([sys.executable, *args], cwd=HERE, env=env, capture_output=True, text=True, check=True, **kwargs)
+
+
+def test_core_imports_without_the_web_stack():
+    """Test that the optimizer and the analysis CLI load without SQLAlchemy, FastAPI or a DATABASE_URL."""
+    code = "import sys, analyze; print(' '.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    assert run_python("-c", code).stdout.strip() == ""
+
+
+def test_analyze_export_matches_the_engine(tmp_path):
+    """Test that analyzing a CSV export in chunks gives the engine's recommendations and summary."""
+    path = tmp_path / "fleet.csv"
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        fleetgen.write_csv(fleetgen.generate(2000, seed=5), out)  # no id column
+    engine = OptimizationEngine()
+    expected = engine.analyze_rows(fleetgen.make_rows(2000, seed=5))
+
+    written = []
+    summary = analyze_export(read_records(str(path)), engine, chunk_size=300, on_recommendations=written.extend)
+    assert [{k: v for k, v in rec.items() if k != "name"} for rec in written] == expected
+    assert written[0]["name"].endswith(f"{written[0]['resource_id']:08d}")
+    assert summary["total_resources"] == 2000
+    assert summary["open_recommendations"] == len(expected)
+    assert summary["total_potential_savings"] == pytest.approx(sum(r["potential_saving"] for r in expected))
+
+    result = run_python("analyze.py", str(path), "--vectorized", "--recommendations", str(tmp_path / "recs.ndjson"))
+    assert json.loads(result.stdout) == pytest.approx(summary)
+    assert sum(1 for _ in open(tmp_path / "recs.ndjson")) == len(expected)
+
+
+def test_records_are_checked_like_ingested_rows():
+    """Test that export records are coerced, and bad ones rejected with their line."""
+    record = normalize_record({"id": "7", "type": "storage", "provider": "aws", "storage_gb": "900", "monthly_cost": "90"}, 2)
+    row = to_row(record, 1)
+    assert (row.id, row.storage_gb, row.cpu_utilization) == (7, 900, None)
+    with pytest.raises(IngestError, match="line 3: missing monthly_cost"):
+        normalize_record({"type": "storage", "provider": "aws"}, 3)
+    with pytest.raises(IngestError, match="line 4: invalid cpu_utilization: 'high'"):
+        normalize_record({"type": "instance", "provider": "aws", "cpu_utilization": "high", "monthly_cost": "9"}, 4)
+
+
+def test_cli_reports_the_bad_line(tmp_path):
+    """Test that the CLI names a malformed row's line instead of dumping a traceback."""
+    path = tmp_path / "fleet.csv"
+    path.write_text("type,provider,cpu_utilization,monthly_cost\ninstance,aws,5,10\n\ninstance,aws,x,10\n")
+    with pytest.raises(subprocess.CalledProcessError) as exc:
+        run_python("analyze.py", str(path))
+    assert exc.value.returncode != 0
+    assert exc.value.stderr.strip() == "error: line 4: invalid cpu_utilization: 'x'"
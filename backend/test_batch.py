@@ -0,0 +1,67 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+from batch import run_batch, shard_ranges
+from fleetgen import make_resources
+from optimizer import OptimizationEngine
+from recommendation_store import fleet_summary, implement_many, refresh_accounts
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'fleet.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(make_resources(2000, seed=3))
+        session.commit()
+    engine.dispose()
+    return url
+
+
+def test_shard_ranges_cover_all_ids(database_url):
+    """Test that shards are contiguous, balanced id ranges."""
+    with Session(create_engine(database_url)) as session:
+        ranges = shard_ranges(session, 7)
+    assert ranges[0][0] == 1 and ranges[-1][1] == 2000
+    assert all(prev[1] + 1 == nxt[0] for prev, nxt in zip(ranges, ranges[1:]))
+    assert max(last - first for first, last in ranges) - min(last - first for first, last in ranges) <= 1
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_batch_summary_matches_single_pass(database_url, vectorized):
+    """Test that merging per-shard results gives the single-process summary."""
+    optimizer = OptimizationEngine(vectorized=vectorized)
+    resources = make_resources(2000, seed=3)
+    expected = optimizer.calculate_summary(resources, optimizer.analyze_resources(resources))
+
+    report = run_batch(optimizer, database_url, workers=2, shards=5, chunk_size=100)
+    assert len(report.shards) == 5
+    assert report.workers == 2
+    for key in ("total_resources", "open_recommendations", "savings_percentage"):
+        assert report.summary[key] == expected[key]
+    assert report.summary["total_potential_savings"] == pytest.approx(expected["total_potential_savings"])
+
+
+def test_batch_summary_matches_account_summary(tmp_path):
+    """Test that a batch covers one account and leaves implemented savings out, like /summary."""
+    url = f"sqlite:///{tmp_path / 'accounts.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    resources = make_resources(600, seed=5)
+    for resource in resources[::2]:
+        resource.account_id = "team-a"
+    optimizer = OptimizationEngine()
+    with Session(engine) as session:
+        session.add_all(resources)
+        session.commit()
+        refresh_accounts(engine, optimizer)
+        assert implement_many(session, recommendation_type="shrink", account_id="team-a")
+        expected = {account: fleet_summary(session, optimizer, account) for account in ("default", "team-a")}
+    engine.dispose()
+
+    for account, summary in expected.items():
+        report = run_batch(optimizer, url, workers=2, shards=3, account_id=account)
+        for key in ("total_resources", "open_recommendations", "savings_percentage"):
+            assert report.summary[key] == summary[key]
+        assert report.summary["total_potential_savings"] == pytest.approx(summary["total_potential_savings"])
+    assert "shrink" not in report.summary["recommendations_by_type"]
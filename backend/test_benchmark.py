@@ -0,0 +1,43 @@
+from sqlmodel import Session, create_engine, func, select
+from benchmark import add_cases, compare, latency_stats, prepare_database
+from models import CostRollup, Resource
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """Test that slower medians and lower throughput fail, noise within tolerance passes."""
+    baseline = {"cases": {"GET /summary": {"p50_ms": 10.0, "p99_ms": 20.0, "throughput": 100.0},
+                          "analyze_resources": {"seconds": 1.0}}}
+    ok = {"cases": {"GET /summary": {"p50_ms": 11.0, "p99_ms": 80.0, "throughput": 90.0},
+                    "analyze_resources": {"seconds": 1.2}}}
+    assert compare(ok, baseline, tolerance=0.3) == []
+
+    slow = {"cases": {"GET /summary": {"p50_ms": 14.0, "p99_ms": 20.0, "throughput": 70.0}}}
+    regressions = compare(slow, baseline, tolerance=0.3)
+    assert len(regressions) == 3
+    assert any("missing" in r for r in regressions)
+
+
+def test_latency_stats():
+    stats = latency_stats([0.001] * 98 + [0.5, 0.5])
+    assert stats["p50_ms"] == 1.0
+    assert stats["p99_ms"] == 500.0
+
+
+def test_add_cases_keeps_recorded_numbers():
+    """Test that only cases missing from the baseline are recorded."""
+    baseline = {"cases": {"analyze_resources": {"seconds": 1.0}}, "peak_rss_mb": 100.0}
+    results = {"cases": {"analyze_resources": {"seconds": 1.5}, "simulate[100x100]": {"seconds": 0.02}},
+               "peak_rss_mb": 120.0}
+    assert add_cases(baseline, results) == ["simulate[100x100]"]
+    assert baseline == {"cases": {"analyze_resources": {"seconds": 1.0}, "simulate[100x100]": {"seconds": 0.02}},
+                        "peak_rss_mb": 100.0}
+
+
+def test_prepare_database_replaces_everything(tmp_path):
+    """Test that reusing a scratch database doesn't double-count its rollups."""
+    url = f"sqlite:///{tmp_path / 'bench.db'}"
+    prepare_database(url, 50, seed=1)
+    prepare_database(url, 50, seed=1)
+    with Session(create_engine(url)) as session:
+        assert session.exec(select(func.count(Resource.id))).one() == 50
+        assert session.exec(select(func.sum(CostRollup.resources))).one() == 50
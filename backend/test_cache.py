@@ -0,0 +1,52 @@
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    """Test that entries are served until their TTL runs out."""
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("summary", 1)
+
+    clock.now = 9.9
+    assert cache.get("summary") == 1
+    clock.now = 10
+    assert cache.get("summary") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_size_bound_evicts_least_recently_used():
+    """Test that the cache never grows past maxsize."""
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["size"] == 2
+
+
+def test_invalidate():
+    """Test dropping one key or the whole cache."""
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.invalidate()
+    assert cache.get("b") is None
+    assert cache.stats()["invalidations"] == 2
@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+from catalog import InstanceCatalog, InstanceType, load_catalog
+from columnar import ResourceColumns
+from fleetgen import PROVIDERS, make_resources
+from models import Resource
+from rules import OverprovisionedInstanceRule, RuleThresholds
+
+
+def test_catalog_covers_generated_fleet():
+    """Test that every provider file loads and knows the instance types fleetgen uses."""
+    catalog = load_catalog()
+    for provider, (_, prices) in PROVIDERS.items():
+        for instance_type in prices:
+            assert catalog.get(provider, instance_type) is not None
+    assert catalog.get("aws", "Standard_B2s") is None
+    for index in catalog.families.values():
+        assert list(index.monthly_price) == sorted(index.monthly_price)
+
+
+def test_cheapest_fit_with_headroom():
+    """Test that right-sizing picks the cheapest type in the family that fits usage plus headroom."""
+    catalog = InstanceCatalog([
+        InstanceType("aws", "small", "general", 2, 4, 30),
+        InstanceType("aws", "medium", "general", 2, 8, 60),
+        InstanceType("aws", "large", "general", 4, 16, 120),
+        InstanceType("aws", "himem", "memory", 2, 16, 90),
+    ])
+
+    # 25% of 16 GB is 4 GB, 5.2 GB with 30% headroom: "small" is too tight
+    current, target = catalog.rightsize("aws", "large", 15, 25, headroom=0.3)
+    assert (current.instance_type, target.instance_type) == ("large", "medium")
+    assert catalog.rightsize("aws", "large", 15, 25, headroom=0.0)[1].instance_type == "small"
+    # Nothing cheaper fits, and other families are never suggested
+    assert catalog.rightsize("aws", "large", 90, 90, headroom=0.3) is None
+    assert catalog.rightsize("aws", "himem", 10, 10, headroom=0.3) is None
+    assert catalog.rightsize("aws", "unknown", 10, 10, headroom=0.3) is None
+
+
+def test_savings_use_price_delta():
+    """Test that the saving is the catalog price difference, scaled to the billed cost."""
+    resource = Resource(id=1, name="web", type="instance", provider="aws", instance_type="t3.xlarge",
+                        cpu_utilization=15, memory_utilization=25, monthly_cost=100)
+    rule = OverprovisionedInstanceRule(RuleThresholds())
+    recommendation = rule.build(resource)
+    assert recommendation["suggested_config"] == "t3.large - $50/month"
+    assert recommendation["potential_saving"] == pytest.approx(50.0)
+
+
+def test_vectorized_fit_matches_scalar():
+    """Test that the batched family lookup agrees with the per-row rule on a generated fleet."""
+    resources = make_resources(5_000, seed=7)
+    rule = OverprovisionedInstanceRule(RuleThresholds())
+    expected = np.array([r.type == "instance" and rule.matches(r) for r in resources])
+    columns = ResourceColumns.from_resources(resources)
+    actual = rule.mask(columns) & (columns.type == "instance")
+    assert expected.any()
+    assert (actual == expected).all()
@@ -0,0 +1,24 @@
+import models
+import optimizer
+from config import Settings
+
+
+def test_importing_models_and_optimizer_creates_no_engine():
+    """Test that the domain modules don't set up a database at import time."""
+    assert not hasattr(models, "engine")
+    assert not hasattr(optimizer, "engine")
+
+
+def test_engine_is_lazy_and_shared():
+    """Test that Settings creates one engine on first use, with echo off by default."""
+    settings = Settings(database_url="sqlite://")
+    assert settings._engine is None
+
+    engine = settings.get_engine()
+    assert settings.get_engine() is engine
+    assert engine.echo is False
+
+
+def test_sql_echo_is_configurable():
+    """Test that statement logging can be switched on."""
+    assert Settings(database_url="sqlite://", db_echo=True).get_engine().echo is True
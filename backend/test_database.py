@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import AsyncDatabase, SyncDatabase, async_database_url
+from models import Resource
+
+
+def test_async_database_url():
+    """Test that sync URLs are rewritten for their async drivers."""
+    assert async_database_url("postgresql+psycopg2://user:pw@localhost:5432/cloudopt") == \
+        "postgresql+asyncpg://user:pw@localhost:5432/cloudopt"
+    assert async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://localhost/cloudopt")
+
+
+def test_async_database_runs_sync_session_code():
+    """Test that sync query helpers run unchanged on an AsyncSession."""
+    def add_and_count(session):
+        session.add(Resource(name="web", type="instance", provider="aws", monthly_cost=10))
+        session.commit()
+        return len(session.exec(select(Resource)).all())
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(engine) as session:
+            db = AsyncDatabase(session)
+            assert await db.run(add_and_count) == 1
+            assert len(await db.all(select(Resource))) == 1
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_partitions_stream_the_same_chunks_on_both_drivers():
+    """Test that rows are handed out `size` at a time by either driver."""
+    def resources():
+        return [Resource(name=f"web-{i}", type="instance", provider="aws", monthly_cost=i) for i in range(5)]
+    stmt = select(Resource.name).order_by(Resource.id)
+
+    async def collect(db):
+        return [[row[0] for row in chunk] async for chunk in db.partitions(stmt, 2)]
+
+    # SyncDatabase fetches from threadpool threads
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(resources())
+        session.commit()
+        sync_chunks = asyncio.run(collect(SyncDatabase(session)))
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(engine) as session:
+            session.add_all(resources())
+            await session.commit()
+            chunks = await collect(AsyncDatabase(session))
+        await engine.dispose()
+        return chunks
+
+    assert sync_chunks == asyncio.run(scenario()) == [["web-0", "web-1"], ["web-2", "web-3"], ["web-4"]]
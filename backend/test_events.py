@@ -0,0 +1,56 @@
+import asyncio
+import json
+import threading
+from events import EventBus
+
+
+def parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+    return int(fields["id"]), fields["event"], json.loads(fields["data"])
+
+
+def test_events_reach_only_the_account_subscribers_in_order():
+    """Test fan-out from other threads, account scoping and unchanged-state skipping."""
+    bus = EventBus()
+
+    async def run():
+        first, second = bus.subscribe("a"), bus.subscribe("a")
+        other = bus.subscribe("b")
+        writers = [threading.Thread(target=bus.publish, args=("a", "implemented", {"n": n})) for n in range(5)]
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        assert bus.publish_state("a", "summary", {"open": 1}) is not None
+        assert bus.publish_state("a", "summary", {"open": 1}) is None
+        received = [[parse(await s.next(timeout=1)) for _ in range(6)] for s in (first, second)]
+        assert received[0] == received[1]
+        assert [event_id for event_id, _, _ in received[0]] == list(range(1, 7))
+        assert received[0][-1][1:] == ("summary", {"open": 1})
+        assert await other.next(timeout=0.01) is None
+        bus.unsubscribe(other)
+        assert bus.stats()["subscribers"] == 2
+
+    asyncio.run(run())
+
+
+def test_reconnect_replays_missed_events_or_resets():
+    """Test Last-Event-ID replay from history, and a reset once history or the queue overflows."""
+    bus = EventBus(history=3, queue_size=2)
+    for n in range(4):
+        bus.publish("a", "implemented", {"n": n})
+
+    async def run():
+        resumed = bus.subscribe("a", last_event_id=2)
+        assert [parse(await resumed.next(timeout=1))[2] for _ in range(2)] == [{"n": 2}, {"n": 3}]
+        missed = bus.subscribe("a", last_event_id=0)  # event 1 has left the history
+        assert parse(await missed.next(timeout=1))[:2] == (4, "reset")
+
+        slow = bus.subscribe("a")
+        for n in range(3):
+            bus.publish("a", "implemented", {"n": n})
+        await asyncio.sleep(0)
+        assert parse(await slow.next(timeout=1))[:2] == (7, "reset")
+        assert slow.overflows == 1
+
+    asyncio.run(run())
@@ -0,0 +1,32 @@
+import io
+from collections import Counter
+from fleetgen import generate, make_resources, write_csv
+from ingest import parse_lines
+from optimizer import OptimizationEngine
+
+
+def test_same_seed_same_fleet():
+    """Test that generation is reproducible and seed-dependent."""
+    assert list(generate(500, seed=1)) == list(generate(500, seed=1))
+    assert list(generate(500, seed=1)) != list(generate(500, seed=2))
+
+
+def test_fleet_shape():
+    """Test that the fleet mixes providers and types with unique names and some rule hits."""
+    rows = list(generate(5000, seed=7))
+    assert len({(r["provider"], r["name"]) for r in rows}) == 5000
+    types = Counter(r["type"] for r in rows)
+    assert 0.5 < types["instance"] / 5000 < 0.7
+    assert set(r["provider"] for r in rows) == {"aws", "azure", "gcp"}
+
+    recommendations = OptimizationEngine().analyze_resources(make_resources(5000, seed=7))
+    assert {r["recommendation_type"] for r in recommendations} == {"downsize", "shrink"}
+
+
+def test_csv_round_trips_through_ingest():
+    """Test that the CSV output is accepted by the bulk loader."""
+    out = io.StringIO()
+    assert write_csv(generate(100, seed=3), out) == 100
+    parsed = list(parse_lines(out.getvalue().splitlines(), "csv"))
+    expected = [{k: v for k, v in row.items() if k != "id"} for row in generate(100, seed=3)]
+    assert parsed == expected
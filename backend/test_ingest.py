@@ -0,0 +1,154 @@
+import asyncio
+from functools import partial
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+from ingest import IngestError, LineBatchParser, aiter_line_batches, normalize_row, parse_lines, upsert_batch
+from models import Resource
+
+CSV_LINES = [
+    "name,type,provider,instance_type,size,cpu_utilization,memory_utilization,storage_gb,monthly_cost",
+    "web-1,instance,aws,t3.xlarge,,15,25,,150",
+    "vol-1,storage,aws,,1000GB,,,1000,100",
+]
+
+
+def test_parse_csv_and_ndjson():
+    """Test that both formats normalize to the same row shape."""
+    rows = list(parse_lines(CSV_LINES, "csv"))
+    assert rows[0]["cpu_utilization"] == 15.0
+    assert rows[0]["storage_gb"] is None
+    assert rows[1]["storage_gb"] == 1000
+
+    ndjson = ['{"name": "web-1", "type": "instance", "provider": "aws", "instance_type": "t3.xlarge", '
+              '"cpu_utilization": 15, "memory_utilization": 25, "monthly_cost": 150}']
+    assert list(parse_lines(ndjson, "ndjson")) == rows[:1]
+
+
+def test_rows_are_scoped_to_the_request_account():
+    """Test that rows default to the request's account and may not name another."""
+    rows = list(parse_lines(CSV_LINES, "csv"))
+    assert {r["account_id"] for r in rows} == {"default"}
+    scoped = LineBatchParser("csv", partial(normalize_row, account_id="team-a")).parse(CSV_LINES)
+    assert {r["account_id"] for r in scoped} == {"team-a"}
+
+    header = "account_id," + CSV_LINES[0]
+    with pytest.raises(IngestError):
+        LineBatchParser("csv", partial(normalize_row, account_id="team-a")).parse([header, "team-b," + CSV_LINES[1]])
+
+
+def test_parse_reports_bad_line():
+    """Test that malformed rows are reported with their line number."""
+    with pytest.raises(IngestError) as exc:
+        list(parse_lines(CSV_LINES + ["bad,instance,aws,,,x,1,,10"], "csv"))
+    assert exc.value.line == 4
+
+
+def test_streamed_batches_keep_csv_header():
+    """Test that a body split at arbitrary byte boundaries parses correctly."""
+    body = ("\n".join(CSV_LINES) + "\n").encode()
+
+    async def chunks():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    async def collect():
+        parser = LineBatchParser("csv")
+        return [row async for lines in aiter_line_batches(chunks(), batch_size=1) for row in parser.parse(lines)]
+
+    rows = asyncio.run(collect())
+    assert [r["name"] for r in rows] == ["web-1", "vol-1"]
+
+
+def test_invalid_utf8_names_its_line():
+    """Test that undecodable bytes are reported as an IngestError with their line."""
+    body = ("\n".join(CSV_LINES) + "\n").encode() + b"bad-\xff,instance,aws,,,1,1,,10\n"
+
+    async def chunks():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    async def collect():
+        return [lines async for lines in aiter_line_batches(chunks(), batch_size=1)]
+
+    with pytest.raises(IngestError) as exc:
+        asyncio.run(collect())
+    assert exc.value.line == 4
+    assert "invalid UTF-8" in str(exc.value)
+
+
+def test_parser_records_row_lines():
+    """Test that each parsed row's line is kept, skipping the header and blank lines."""
+    parser = LineBatchParser("csv")
+    parser.parse(CSV_LINES[:2] + [""])
+    assert parser.row_lines == [2]
+    parser.parse(CSV_LINES[2:])
+    assert parser.row_lines == [4]
+
+
+def test_upsert_by_provider_and_name():
+    """Test that re-ingesting a resource updates it in place."""
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        assert upsert_batch(conn, list(parse_lines(CSV_LINES, "csv"))) == 2
+    with engine.begin() as conn:
+        upsert_batch(conn, list(parse_lines([CSV_LINES[0], "web-1,instance,aws,t3.xlarge,,80,90,,150"], "csv")))
+
+    with Session(engine) as session:
+        resources = session.exec(select(Resource).order_by(Resource.name)).all()
+    assert [r.name for r in resources] == ["vol-1", "web-1"]
+    assert resources[1].cpu_utilization == 80
+
+
+def test_identical_reingest_keeps_implemented_recommendations():
+    """Test that re-sending unchanged rows doesn't touch them, so a refresh
+    doesn't reopen their implemented recommendations."""
+    from optimizer import OptimizationEngine
+    from recommendation_store import list_recommendations, mark_implemented, refresh_recommendations
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        upsert_batch(conn, list(parse_lines(CSV_LINES, "csv")))
+    optimizer = OptimizationEngine()
+    with Session(engine) as session:
+        refresh_recommendations(session, optimizer)
+        web = session.exec(select(Resource).where(Resource.name == "web-1")).one()
+        web_id, stamped = web.id, web.updated_at
+        mark_implemented(session, web_id)
+
+    with engine.begin() as conn:
+        upsert_batch(conn, list(parse_lines(CSV_LINES, "csv")))
+    with Session(engine) as session:
+        assert session.exec(select(Resource.updated_at).where(Resource.name == "web-1")).one() == stamped
+        assert refresh_recommendations(session, optimizer) == 0
+        assert [r.implemented for r in list_recommendations(session) if r.resource_id == web_id] == [True]
+
+
+def test_same_name_in_two_accounts():
+    """Test that the natural key includes the account."""
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    rows = list(parse_lines(CSV_LINES, "csv"))
+    with engine.begin() as conn:
+        upsert_batch(conn, rows + [{**row, "account_id": "team-a"} for row in rows])
+    with Session(engine) as session:
+        resources = session.exec(select(Resource).where(Resource.name == "web-1")).all()
+    assert sorted(r.account_id for r in resources) == ["default", "team-a"]
+
+
+def test_large_batch_stays_under_sqlite_variable_limit():
+    """Test that a full 10k-row batch is split into statements SQLite accepts."""
+    from fleetgen import generate
+    from ingest import INGEST_FIELDS
+    import sqlite3
+    from sqlalchemy import event
+    engine = create_engine("sqlite://")
+    # Builds differ; hold this one to SQLite's default limit
+    event.listen(engine, "connect", lambda conn, _: conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 32_766))
+    SQLModel.metadata.create_all(engine)
+    rows = [{f: row[f] for f in INGEST_FIELDS} for row in generate(10_000)]
+    with engine.begin() as conn:
+        assert upsert_batch(conn, rows) == 10_000
+    with Session(engine) as session:
+        assert len(session.exec(select(Resource.id)).all()) == 10_000
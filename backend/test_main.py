@@ -1,9 +1,29 @@
+import asyncio
+import json
 import pytest
+import uuid
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
+import main
 from main import app
 
 client = TestClient(app)
 
+def _new_account(prefix: str) -> dict:
+    """Headers for an account no earlier run has used, so tests that write
+    can be re-run against the same database."""
+    return {"X-Account-Id": f"{prefix}-{uuid.uuid4().hex[:8]}"}
+
+def _open_recommendation(prefix: str):
+    """A new account holding one underutilized instance, refreshed; returns
+    its headers and the instance's open recommendation."""
+    headers = _new_account(prefix)
+    body = "name,type,provider,instance_type,cpu_utilization,memory_utilization,monthly_cost\nweb,instance,aws,t3.xlarge,10,20,150\n"
+    assert client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv", **headers}).status_code == 200
+    client.post("/recommendations/refresh")
+    [recommendation] = client.get("/recommendations", headers=headers).json()["recommendations"]
+    return headers, recommendation
+
 def test_resources_endpoint_basic():
     res = client.get("/resources")
     assert res.status_code == 200
@@ -52,3 +72,378 @@ def test_implement_nonexistent_recommendation():
     """Test implementing recommendation for nonexistent resource."""
     res = client.post("/recommendations/999/implement")
     assert res.status_code == 404
+
+def test_recommendations_summary_covers_whole_fleet():
+    """Test that summary totals count every resource, not just rule candidates."""
+    data = client.get("/recommendations").json()
+    summary = data["summary"]
+    open_recommendations = [r for r in data["recommendations"] if not r["implemented"]]
+    assert summary["total_resources"] >= 8
+    assert summary["total_resources"] > len(data["recommendations"])
+    assert summary["open_recommendations"] == len(open_recommendations)
+    assert summary["total_potential_savings"] == pytest.approx(
+        sum(r["potential_saving"] for r in open_recommendations)
+    )
+
+def test_implement_recommendation_is_persisted():
+    """Test that implementing a recommendation is reflected in later reads."""
+    team, target = _open_recommendation("team-persisted")
+
+    res = client.post(f"/recommendations/{target['resource_id']}/implement", headers=team)
+    assert res.status_code == 200
+
+    data = client.get("/recommendations", headers=team).json()
+    matching = [r for r in data["recommendations"] if r["resource_id"] == target["resource_id"]]
+    assert matching and all(r["implemented"] for r in matching)
+
+def test_resources_cursor_pagination():
+    """Test walking /resources page by page with the next-cursor header."""
+    first = client.get("/resources?limit=3")
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get(f"/resources?limit=3&cursor={cursor}")
+    assert second.status_code == 200
+
+    first_ids = [r["id"] for r in first.json()]
+    second_ids = [r["id"] for r in second.json()]
+    assert first_ids == sorted(first_ids)
+    assert second_ids and min(second_ids) > max(first_ids)
+
+def test_resources_filters():
+    """Test server-side filtering of /resources."""
+    res = client.get("/resources?type=storage&provider=aws&min_monthly_cost=50")
+    assert res.status_code == 200
+    data = res.json()
+    assert data
+    for item in data:
+        assert item["type"] == "storage"
+        assert item["provider"] == "aws"
+        assert item["monthly_cost"] >= 50
+
+def test_resources_invalid_cursor():
+    """Test that a malformed cursor is rejected."""
+    res = client.get("/resources?cursor=not-a-cursor")
+    assert res.status_code == 400
+
+def test_tampered_cursor_values_are_rejected():
+    """Test that cursor keys of the wrong type are a 400, not a database error."""
+    from pagination import encode_cursor
+    for path, position in [
+        ("/resources", {"id": "1"}),
+        ("/resources", {"id": True}),
+        ("/resources", {"id": 2**70}),
+        ("/recommendations?sort=potential_saving", {"potential_saving": "x", "id": 1}),
+        ("/recommendations?sort=potential_saving", {"potential_saving": 10.5, "id": 1.5}),
+    ]:
+        separator = "&" if "?" in path else "?"
+        assert client.get(f"{path}{separator}cursor={encode_cursor(position)}").status_code == 400
+    valid = encode_cursor({"potential_saving": 10, "id": 1})
+    assert client.get(f"/recommendations?sort=potential_saving&cursor={valid}").status_code == 200
+
+def test_recommendations_sorted_pagination():
+    """Test paging recommendations by potential saving, highest first."""
+    everything = client.get("/recommendations?sort=potential_saving").json()["recommendations"]
+    savings = [r["potential_saving"] for r in everything]
+    assert savings == sorted(savings, reverse=True)
+
+    first = client.get("/recommendations?sort=potential_saving&limit=2")
+    assert len(first.json()["recommendations"]) == 2
+    assert "summary" in first.json()
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get(f"/recommendations?sort=potential_saving&limit=2&cursor={cursor}")
+
+    paged = first.json()["recommendations"] + second.json()["recommendations"]
+    assert paged == everything[:len(paged)]
+
+def test_recommendations_ndjson_stream():
+    """Test streaming recommendations as newline-delimited JSON."""
+    res = client.get("/recommendations", headers={"Accept": "application/x-ndjson"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert len(lines) >= 3
+    assert all("resource_id" in rec and "summary" not in rec for rec in lines)
+
+def test_summary_endpoint():
+    """Test that the summary is available without the recommendation list."""
+    res = client.get("/summary")
+    assert res.status_code == 200
+    summary = res.json()
+    assert summary == client.get("/recommendations").json()["summary"]
+
+def test_summary_etag_not_modified():
+    """Test that polling /summary with the last ETag returns 304."""
+    first = client.get("/summary")
+    etag = first.headers["ETag"]
+
+    res = client.get("/summary", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+
+    stats = client.get("/cache/stats").json()["summary"]
+    assert stats["hits"] >= 1
+
+def test_summary_cache_invalidated_on_implement():
+    """Test that implementing a recommendation refreshes the cached summary."""
+    team, target = _open_recommendation("team-summary-cache")
+    before = client.get("/summary", headers=team).json()
+    client.post(f"/recommendations/{target['resource_id']}/implement", headers=team)
+
+    after = client.get("/summary", headers=team).json()
+    assert after["open_recommendations"] < before["open_recommendations"]
+
+def test_summary_cache_invalidated_when_recommendation_goes_away():
+    """Test that a refresh writing no recommendations still drops a summary cached before it."""
+    team = {"X-Account-Id": "team-summary"}
+    header = "name,type,provider,instance_type,size,cpu_utilization,memory_utilization,storage_gb,monthly_cost\n"
+    body = header + "summary-web-1,instance,aws,t3.xlarge,,10,20,,150\n"
+    assert client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv", **team}).status_code == 200
+    client.post("/recommendations/refresh")
+    assert client.get("/summary", headers=team).json()["total_potential_savings"] > 0
+
+    busy = body.replace(",10,20,", ",90,20,")
+    assert client.post("/resources/bulk", content=busy, headers={"Content-Type": "text/csv", **team}).status_code == 200
+    # Fetched between the ingest and the refresh: cached with the old recommendation
+    assert client.get("/summary", headers=team).json()["total_potential_savings"] > 0
+    client.post("/recommendations/refresh")
+    summary = client.get("/summary", headers=team).json()
+    assert summary["total_potential_savings"] == 0 and summary["open_recommendations"] == 0
+
+def test_bulk_ingest_csv():
+    """Test upserting resources from a CSV body."""
+    body = (
+        "name,type,provider,instance_type,size,cpu_utilization,memory_utilization,storage_gb,monthly_cost\n"
+        "bulk-web-1,instance,aws,m5.large,,10,20,,90\n"
+        "bulk-web-1,instance,aws,m5.large,,12,22,,95\n"
+        "bulk-vol-1,storage,gcp,,800GB,,,800,60\n"
+    )
+    res = client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert res.status_code == 200
+    report = res.json()
+    assert report["rows"] == 3
+    assert "rows_per_sec" in report
+
+    again = client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert again.status_code == 200
+    ingested = client.get("/resources?provider=gcp&type=storage").json()
+    assert [r["name"] for r in ingested].count("bulk-vol-1") == 1
+
+def test_bulk_ingest_rejects_bad_rows():
+    """Test that a malformed row rejects the upload."""
+    body = '{"name": "bulk-bad", "type": "instance", "provider": "aws"}\n'
+    res = client.post("/resources/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert res.status_code == 422
+    assert "monthly_cost" in res.json()["detail"]
+
+    res = client.post("/resources/bulk", content=b"name,type\nbulk-\xff,instance\n", headers={"Content-Type": "text/csv"})
+    assert res.status_code == 422
+    assert res.json()["detail"] == "line 2: invalid UTF-8"
+
+def test_ingest_metric_samples():
+    """Test appending utilization samples; re-sending them is a conflict."""
+    resource_id = client.get("/resources?limit=1").json()[0]["id"]
+    # Fresh timestamps, so a re-run against the same database doesn't conflict
+    start = datetime.utcnow()
+    body = "".join(
+        json.dumps({"resource_id": resource_id, "recorded_at": (start + timedelta(minutes=minute)).isoformat() + "Z",
+                    "cpu_utilization": 10 + minute, "memory_utilization": 30}) + "\n"
+        for minute in range(5)
+    )
+    res = client.post("/metrics/samples", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert res.status_code == 200
+    assert res.json()["rows"] == 5
+
+    again = client.post("/metrics/samples", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert again.status_code == 409
+
+def test_metric_samples_are_scoped_to_an_account():
+    """Test that samples for another account's resources are rejected at their line."""
+    team = _new_account("team-samples")
+    body = "name,type,provider,monthly_cost\nsample-host,instance,aws,10\n"
+    assert client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv", **team}).status_code == 200
+    own = client.get("/resources", headers=team).json()[0]["id"]
+    other = client.get("/resources?limit=1").json()[0]["id"]
+
+    recorded_at = datetime.utcnow().isoformat() + "Z"  # fresh, like the account
+
+    def sample(resource_id):
+        return json.dumps({"resource_id": resource_id, "recorded_at": recorded_at, "cpu_utilization": 5}) + "\n"
+
+    headers = {"Content-Type": "application/x-ndjson", **team}
+    res = client.post("/metrics/samples", content=sample(own) + "\n" + sample(other), headers=headers)
+    assert res.status_code == 422
+    assert res.json()["detail"].startswith("line 3:")
+    res = client.post("/metrics/samples", content=sample(own), headers=headers)
+    assert res.status_code == 200 and res.json()["rows"] == 1
+
+def test_metrics_endpoint():
+    """Test that /metrics exposes request, rule and database metrics."""
+    client.get("/recommendations?limit=5")
+    client.post("/recommendations/999999/implement")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    body = res.text
+    assert 'cloudopt_http_request_duration_seconds_count{method="GET",route="/recommendations",status="200"}' in body
+    # Path parameters are reported by route template
+    assert 'route="/recommendations/{resource_id}/implement",status="404"' in body
+    assert 'cloudopt_request_phase_seconds_count{phase="query",route="/recommendations"}' in body
+    assert "cloudopt_db_statement_duration_seconds_count" in body
+    assert 'cloudopt_db_pool_connections{engine="sync",state="checked_out"}' in body
+
+def test_profiler_is_opt_in():
+    assert client.get("/debug/profiler").status_code == 404
+
+def test_recommendations_fast_path_matches_models():
+    """Test that the orjson fast path returns the same documents, compressed on request."""
+    from config import settings
+    paths = ["/recommendations?sort=potential_saving", "/recommendations?limit=2"]
+    fast = [client.get(path, headers={"Accept-Encoding": "gzip"}) for path in paths]
+    settings.json_fast_path = False
+    try:
+        slow = [client.get(path) for path in paths]
+    finally:
+        settings.json_fast_path = True
+    assert fast[0].headers["content-encoding"] == "gzip"
+    documents = [res.json() for res in fast + slow]
+    for document in documents:
+        assert document.pop("snapshot_age_seconds") >= 0
+    assert documents[:2] == documents[2:]
+    assert fast[1].headers["x-next-cursor"] == slow[1].headers["x-next-cursor"]
+
+def test_recommendations_served_from_snapshot():
+    """Test that handlers report the snapshot's age and refreshes can be forced."""
+    res = client.post("/recommendations/refresh")
+    assert res.status_code == 200
+    state = res.json()
+    assert state["refreshed_at"] is not None and state["last_error"] is None
+
+    data = client.get("/recommendations").json()
+    assert data["refreshed_at"] == state["refreshed_at"]
+    assert 0 <= data["snapshot_age_seconds"] < 60
+    assert float(client.get("/summary").headers["X-Snapshot-Age"]) >= 0
+
+def test_failed_first_refresh_returns_503(monkeypatch):
+    """Test that with no snapshot yet and a failing refresh, handlers answer 503 with the error."""
+    def fail():
+        raise RuntimeError("database is down")
+    monkeypatch.setattr(main.scheduler, "refreshed_at", None)
+    monkeypatch.setattr(main.scheduler, "_refresh", fail)
+    for path in ("/recommendations", "/summary"):
+        res = client.get(path)
+        assert res.status_code == 503
+        assert "database is down" in res.json()["detail"]
+
+def test_bulk_implement():
+    """Test implementing several resources in one call, with safe retries."""
+    team, target = _open_recommendation("team-bulk")
+    body = {"resource_ids": [target["resource_id"], 999999]}
+    res = client.post("/recommendations/implement", json=body, headers=team)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["implemented"] == 1
+    assert [r["status"] for r in data["results"]] == ["implemented", "not_found"]
+
+    retry = client.post("/recommendations/implement", json=body, headers=team).json()
+    assert retry["implemented"] == 0
+    assert retry["results"][0]["status"] == "already_implemented"
+    assert retry["results"][0]["implemented_at"] == data["results"][0]["implemented_at"]
+
+    assert client.post("/recommendations/implement", json={}).status_code == 422
+
+def test_simulate_thresholds():
+    """Test the what-if grid endpoint and its input checks."""
+    grid = {"cpu_thresholds": [10, 30, 50], "memory_thresholds": [50, 90]}
+    res = client.post("/recommendations/simulate", json=grid)
+    assert res.status_code == 200
+    data = res.json()
+    assert len(data["results"]) == 6
+    assert data["total_resources"] == client.get("/summary").json()["total_resources"]
+    counts = [r["recommendations"] for r in data["results"]]
+    # Looser thresholds never flag fewer resources
+    assert counts[0] <= counts[2] <= counts[4] and counts[1] <= counts[3] <= counts[5]
+    assert client.post("/recommendations/simulate", json={"shrink_factors": [2]}).status_code == 422
+
+def test_cost_breakdown_matches_summary():
+    """Test that the rollup breakdown stays in step with the fleet summary across writes."""
+    body = (
+        "name,type,provider,instance_type,size,cpu_utilization,memory_utilization,storage_gb,monthly_cost\n"
+        "rollup-web-1,instance,gcp,n1-standard-4,,5,10,,140\n"
+    )
+    assert client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv"}).status_code == 200
+    client.post("/recommendations/refresh")
+
+    res = client.get("/summary/breakdown", params={"group_by": ["provider", "family"]})
+    assert res.status_code == 200
+    data = res.json()
+    summary = client.get("/summary").json()
+    assert data["totals"]["resources"] == summary["total_resources"]
+    assert data["totals"]["open_recommendations"] == summary["open_recommendations"]
+    assert data["totals"]["potential_savings"] == pytest.approx(summary["total_potential_savings"], abs=0.01)
+    assert sum(g["monthly_cost"] for g in data["groups"]) == pytest.approx(summary["total_monthly_cost"], abs=0.1)
+    assert {"provider", "family", "resources"} <= set(data["groups"][0])
+    assert client.get("/summary/breakdown", params={"group_by": "region"}).status_code == 422
+
+def test_requests_are_scoped_to_an_account():
+    """Test that the X-Account-Id header isolates one account's data from the rest."""
+    team = _new_account("team-scoped")
+    account = team["X-Account-Id"]
+    body = (
+        "name,type,provider,instance_type,size,cpu_utilization,memory_utilization,storage_gb,monthly_cost\n"
+        "web-server-1,instance,aws,t3.xlarge,,10,20,,150\n"
+    )
+    assert client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv", **team}).status_code == 200
+    client.post("/recommendations/refresh")
+
+    resources = client.get("/resources", headers=team).json()
+    assert [(r["name"], r["account_id"]) for r in resources] == [("web-server-1", account)]
+    assert all(r["account_id"] == "default" for r in client.get("/resources").json())
+
+    summary = client.get("/summary", headers=team).json()
+    assert summary["total_resources"] == 1 and summary["open_recommendations"] == 1
+    recommendations = client.get("/recommendations", headers=team).json()["recommendations"]
+    assert [r["resource_id"] for r in recommendations] == [resources[0]["id"]]
+    assert client.get("/summary/breakdown", headers=team).json()["totals"]["resources"] == 1
+
+    # Another account's resource can't be implemented from here
+    assert client.post(f"/recommendations/{resources[0]['id']}/implement").status_code == 404
+    assert client.post(f"/recommendations/{resources[0]['id']}/implement", headers=team).status_code == 200
+    assert client.get("/summary", headers=team).json()["open_recommendations"] == 0
+
+def test_event_stream_pushes_deltas():
+    """Test that refreshes and implements publish resource, recommendation and summary deltas."""
+    from main import events
+    team = {"X-Account-Id": "team-events"}
+    body = (
+        "name,type,provider,instance_type,size,cpu_utilization,memory_utilization,storage_gb,monthly_cost\n"
+        "events-web-1,instance,aws,t3.xlarge,,10,20,,150\n"
+    )
+    # The account's first refresh is a full recompute, later ones send deltas
+    assert client.post("/resources/bulk", content=body, headers={"Content-Type": "text/csv", **team}).status_code == 200
+    client.post("/recommendations/refresh")
+
+    async def run():
+        subscription = events.subscribe("team-events")
+        changed = body.replace(",10,20,", ",12,20,")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: client.post(
+            "/resources/bulk", content=changed, headers={"Content-Type": "text/csv", **team}))
+        await loop.run_in_executor(None, lambda: client.post("/recommendations/refresh"))
+        resource_id = client.get("/resources", headers=team).json()[0]["id"]
+        await loop.run_in_executor(None, lambda: client.post(f"/recommendations/{resource_id}/implement", headers=team))
+        frames = []
+        while (frame := await subscription.next(timeout=0.5)) is not None:
+            frames.append(frame.decode())
+        events.unsubscribe(subscription)
+        return resource_id, frames
+
+    resource_id, frames = asyncio.run(run())
+    received = {}
+    for frame in frames:
+        fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        received.setdefault(fields["event"], []).append(json.loads(fields["data"]))
+    assert [r["cpu_utilization"] for r in received["resources"][0]["resources"]] == [12]
+    assert received["recommendations"][0]["resource_ids"] == [resource_id]
+    assert [r["resource_id"] for r in received["recommendations"][0]["recommendations"]] == [resource_id]
+    assert [r["resource_id"] for r in received["implemented"][0]["implemented"]] == [resource_id]
+    assert received["summary"][-1]["open_recommendations"] == 0
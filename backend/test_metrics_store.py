@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+from metrics_store import ingest_samples, normalize_sample, prune_samples, refresh_p95
+from models import Resource, ResourceMetricRollup, ResourceMetricSample
+from optimizer import OptimizationEngine
+from recommendation_store import list_recommendations, refresh_recommendations
+from sketch import BIN_WIDTH, decode, grouped_histograms, quantiles
+
+TODAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def samples(resource_id, cpu_values, memory=20.0, day=TODAY):
+    return [{"resource_id": resource_id, "recorded_at": day + timedelta(minutes=i),
+             "cpu_utilization": cpu, "memory_utilization": memory} for i, cpu in enumerate(cpu_values)]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Snapshot says busy; the samples below say mostly idle
+        session.add(Resource(id=1, name="web", type="instance", provider="aws", instance_type="t3.xlarge",
+                             cpu_utilization=90, memory_utilization=90, monthly_cost=150))
+        session.commit()
+    return engine
+
+
+def test_sketch_quantile_within_one_bin():
+    """Test that histogram quantiles track exact percentiles within the bin width."""
+    values = np.random.default_rng(7).uniform(0, 100, 10_000)
+    p95 = quantiles(grouped_histograms(np.zeros(len(values), dtype=np.int64), values, 1), 0.95)[0]
+    assert abs(p95 - np.percentile(values, 95)) <= BIN_WIDTH
+
+
+def test_normalize_sample_converts_to_naive_utc():
+    """Test that offset timestamps are stored as naive UTC."""
+    sample = normalize_sample({"resource_id": "1", "recorded_at": "2026-01-01T02:00:00+02:00",
+                               "cpu_utilization": "12.5", "memory_utilization": ""}, 1)
+    assert sample["recorded_at"] == datetime(2026, 1, 1)
+    assert sample["cpu_utilization"] == 12.5
+    assert sample["memory_utilization"] is None
+
+
+def test_batches_merge_into_daily_rollup(engine):
+    """Test that separate batches for the same day add up in one sketch."""
+    with engine.begin() as conn:
+        ingest_samples(conn, samples(1, [10.0] * 50))
+    with engine.begin() as conn:
+        ingest_samples(conn, samples(1, [80.0] * 50, day=TODAY + timedelta(hours=2)))
+
+    with Session(engine) as session:
+        rollup = session.exec(select(ResourceMetricRollup)).one()
+        assert rollup.sample_count == 100
+        assert decode(rollup.cpu_sketch).sum() == 100
+        assert len(session.exec(select(ResourceMetricSample)).all()) == 100
+
+
+def test_p95_drives_rules(engine):
+    """Test that p95 mode flags a resource whose samples are idle despite a busy snapshot."""
+    with engine.begin() as conn:
+        ingest_samples(conn, samples(1, [5.0] * 96 + [99.0] * 4))
+
+    with Session(engine) as session:
+        assert refresh_recommendations(session, OptimizationEngine()) == 0
+        assert refresh_recommendations(session, OptimizationEngine(utilization="p95")) == 1
+        resource = session.get(Resource, 1)
+        assert resource.cpu_p95 == pytest.approx(5.0 + BIN_WIDTH)
+        assert [r.resource_id for r in list_recommendations(session)] == [1]
+
+
+def test_p95_cleared_when_samples_leave_window(engine):
+    """Test that resources whose samples slid out of the window lose their p95."""
+    old = TODAY - timedelta(days=20)
+    with engine.begin() as conn:
+        ingest_samples(conn, samples(1, [5.0] * 10, day=old))
+    with Session(engine) as session:
+        assert refresh_p95(session, window_days=30, today=TODAY.date()) == 1
+        assert session.get(Resource, 1).cpu_p95 is not None
+        refresh_p95(session, window_days=14, since=old, today=TODAY.date())
+        session.commit()
+        session.expire_all()
+        assert session.get(Resource, 1).cpu_p95 is None
+
+    with engine.begin() as conn:
+        prune_samples(conn, before=date.today() - timedelta(days=14))
+    with Session(engine) as session:
+        assert session.exec(select(ResourceMetricSample)).all() == []
+        assert len(session.exec(select(ResourceMetricRollup)).all()) == 1
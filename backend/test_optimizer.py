@@ -1,6 +1,8 @@
 import pytest
+import numpy as np
 from optimizer import OptimizationEngine
 from models import Resource
+from rules import Rule, RuleRegistry, RuleThresholds, default_registry
 
 def test_overprovisioned_instance_detection():
     """Test detection of over-provisioned instances."""
@@ -49,3 +51,120 @@ def test_oversized_storage_detection():
     rec = recommendations[0]
     assert rec["recommendation_type"] == "shrink"
     assert rec["potential_saving"] > 0
+
+def test_vectorized_matches_per_row():
+    """Test that columnar evaluation produces the same output as the per-row path."""
+    resources = [
+        Resource(id=1, name="web", type="instance", provider="aws",
+                 instance_type="t3.xlarge", cpu_utilization=15, memory_utilization=25, monthly_cost=150),
+        Resource(id=2, name="db", type="instance", provider="aws",
+                 instance_type="m5.xlarge", cpu_utilization=75, memory_utilization=85, monthly_cost=180),
+        Resource(id=3, name="idle", type="instance", provider="gcp",
+                 instance_type="n1-standard-2", monthly_cost=50),
+        Resource(id=4, name="backup", type="storage", provider="aws",
+                 storage_gb=1000, monthly_cost=100),
+        Resource(id=5, name="logs", type="storage", provider="aws",
+                 storage_gb=500, monthly_cost=75),
+        Resource(id=6, name="worker", type="instance", provider="azure",
+                 instance_type="Standard_D2s_v3", cpu_utilization=8, memory_utilization=20, monthly_cost=70),
+    ]
+
+    expected = OptimizationEngine().analyze_resources(resources)
+    actual = OptimizationEngine(vectorized=True).analyze_resources(resources)
+
+    assert [r["resource_id"] for r in actual] == [1, 4, 6]
+    assert actual == expected
+
+def test_thresholds_come_from_config():
+    """Test that rule thresholds can be tuned without code changes."""
+    resource = Resource(
+        id=1, name="db-server", type="instance", provider="aws",
+        instance_type="m5.xlarge", cpu_utilization=35, memory_utilization=45,
+        monthly_cost=180
+    )
+
+    assert OptimizationEngine().analyze_resources([resource]) == []
+
+    thresholds = RuleThresholds(downsize_cpu_threshold=40.0)
+    recommendations = OptimizationEngine(thresholds=thresholds).analyze_resources([resource])
+    assert len(recommendations) == 1
+    assert recommendations[0]["recommendation_type"] == "downsize"
+
+def test_custom_rule_registry():
+    """Test that registered rules only run for their declared resource types."""
+    registry = RuleRegistry()
+    for rule_cls in default_registry.rule_classes:
+        registry.register(rule_cls)
+
+    @registry.register
+    class ExpensiveStorageRule(Rule):
+        name = "expensive_storage"
+        resource_types = ("storage",)
+        fields = ("id", "monthly_cost")
+
+        def matches(self, resource):
+            return resource.monthly_cost > 90
+
+        def build(self, resource):
+            return {"resource_id": resource.id, "recommendation_type": "review",
+                    "potential_saving": 0.0, "implemented": False}
+
+    resources = [
+        Resource(id=1, name="backup", type="storage", provider="aws", storage_gb=1000, monthly_cost=100),
+        Resource(id=2, name="web", type="instance", provider="aws", instance_type="t3.xlarge",
+                 cpu_utilization=90, memory_utilization=90, monthly_cost=150),
+    ]
+
+    for vectorized in (False, True):
+        recommendations = OptimizationEngine(registry=registry, vectorized=vectorized).analyze_resources(resources)
+        assert [r["recommendation_type"] for r in recommendations] == ["shrink", "review"]
+
+def test_rule_with_unknown_field_is_rejected():
+    """Test that rules must declare fields the engine actually loads."""
+    class BadRule(Rule):
+        name = "bad"
+        resource_types = ("instance",)
+        fields = ("owner_email",)
+
+    with pytest.raises(ValueError):
+        RuleRegistry().register(BadRule)
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_observer_reports_per_rule_counts(vectorized):
+    """Test that the rule observer sees evaluations and matches for each rule."""
+    calls = {}
+    engine = OptimizationEngine(vectorized=vectorized,
+                                observer=lambda rule, evaluated, matched, seconds: calls.update({rule: (evaluated, matched)}))
+    resources = [
+        Resource(id=1, name="a", type="instance", provider="aws", instance_type="t3.xlarge",
+                 cpu_utilization=10, memory_utilization=20, monthly_cost=100),
+        Resource(id=2, name="b", type="instance", provider="aws", instance_type="t3.xlarge",
+                 cpu_utilization=90, memory_utilization=90, monthly_cost=100),
+        Resource(id=3, name="c", type="storage", provider="aws", storage_gb=1000, monthly_cost=50),
+    ]
+    assert len(engine.analyze_resources(resources)) == 2
+    assert calls == {"overprovisioned_instance": (2, 1), "oversized_storage": (1, 1)}
+
+def test_analyze_rows_matches_resources():
+    """Test that compact column-only rows give the same recommendations as Resource objects."""
+    from columnar import ResourceRow
+    from fleetgen import make_resources, make_rows
+    resources, rows = make_resources(500, seed=3), make_rows(500, seed=3)
+    assert all(isinstance(r, ResourceRow) for r in rows)
+    expected = OptimizationEngine().analyze_resources(resources)
+    assert OptimizationEngine().analyze_rows(rows) == expected
+    assert OptimizationEngine(vectorized=True).analyze_rows(tuple(r) for r in rows) == expected
+
+def test_build_many_matches_build():
+    """Test that bulk-rendered matches equal per-row builds, with or without a prior mask."""
+    from columnar import ResourceColumns
+    from fleetgen import make_rows
+    rows = make_rows(2000, seed=11)
+    for rule in OptimizationEngine().rules.rules:
+        indices = np.array([i for i, r in enumerate(rows) if r.type in rule.resource_types and rule.matches(r)])
+        expected = [rule.build(rows[i]) for i in indices]
+        assert rule.build_many(ResourceColumns.from_rows(rows), indices) == expected
+        columns = ResourceColumns.from_rows(rows)
+        assert (np.flatnonzero(rule.mask(columns) & (columns.type == rule.resource_types[0])) == indices).all()
+        assert rule.build_many(columns, indices) == expected
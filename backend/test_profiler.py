@@ -0,0 +1,27 @@
+import threading
+import time
+from profiler import SamplingProfiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_other_threads():
+    """Test that stacks of running threads show up in folded output."""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        profiler.start(interval=0.001)
+        time.sleep(0.1)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert not profiler.running
+    assert profiler.samples > 0
+    assert "busy_loop (test_profiler.py" in profiler.folded()
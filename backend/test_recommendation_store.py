@@ -0,0 +1,146 @@
+from datetime import datetime
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+from models import Resource, Recommendation
+from optimizer import OptimizationEngine
+from recommendation_store import (
+    fleet_summary, implement_many, list_recommendations, mark_implemented, refresh_accounts, refresh_recommendations,
+)
+from rules import RuleThresholds
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            Resource(id=1, name="web", type="instance", provider="aws", instance_type="t3.xlarge",
+                     cpu_utilization=15, memory_utilization=25, monthly_cost=150),
+            Resource(id=2, name="db", type="instance", provider="aws", instance_type="m5.xlarge",
+                     cpu_utilization=75, memory_utilization=85, monthly_cost=180),
+            Resource(id=3, name="backup", type="storage", provider="aws", storage_gb=1000, monthly_cost=100),
+        ])
+        session.commit()
+        yield session
+
+
+def test_refresh_only_recomputes_changed_resources(session):
+    """Test that unchanged resources are skipped on subsequent refreshes."""
+    optimizer = OptimizationEngine()
+    assert refresh_recommendations(session, optimizer) == 2
+    assert refresh_recommendations(session, optimizer) == 0
+    assert [r.resource_id for r in list_recommendations(session)] == [1, 3]
+
+    db = session.get(Resource, 2)
+    db.cpu_utilization = 10
+    db.memory_utilization = 20
+    web = session.get(Resource, 1)
+    web.cpu_utilization = 90
+    session.commit()
+
+    assert refresh_recommendations(session, optimizer) == 1
+    assert sorted(r.resource_id for r in list_recommendations(session)) == [2, 3]
+
+
+def test_threshold_change_forces_full_recompute(session):
+    """Test that results computed under other thresholds are replaced."""
+    refresh_recommendations(session, OptimizationEngine())
+    strict = OptimizationEngine(thresholds=RuleThresholds(shrink_storage_gb_threshold=2000))
+
+    refresh_recommendations(session, strict)
+    assert [r.resource_id for r in list_recommendations(session)] == [1]
+
+
+def test_implemented_recommendations_are_kept(session):
+    """Test that implementing persists and survives a refresh of the resource."""
+    optimizer = OptimizationEngine()
+    refresh_recommendations(session, optimizer)
+
+    updated = mark_implemented(session, 3)
+    assert len(updated) == 1
+    assert updated[0].implemented and updated[0].implemented_at is not None
+    assert mark_implemented(session, 3) == []
+
+    backup = session.get(Resource, 3)
+    backup.monthly_cost = 90
+    session.commit()
+    refresh_recommendations(session, optimizer)
+
+    rows = session.exec(select(Recommendation).where(Recommendation.resource_id == 3)).all()
+    assert sorted(r.implemented for r in rows) == [False, True]
+
+
+def test_refresh_looks_back_to_open_transactions(session, monkeypatch):
+    """Test that rows stamped by a transaction open during a refresh are
+    picked up by the next one, without reopening implemented recommendations."""
+    import recommendation_store
+    optimizer = OptimizationEngine()
+    in_flight = datetime.utcnow()
+    monkeypatch.setattr(recommendation_store, "_oldest_open_transaction", lambda session: in_flight)
+    assert refresh_recommendations(session, optimizer) == 2
+    mark_implemented(session, 3)
+
+    # The open ingest commits after the refresh, with the stamp it took before it
+    db = session.get(Resource, 2)
+    db.cpu_utilization, db.memory_utilization, db.updated_at = 10, 20, in_flight
+    session.commit()
+    monkeypatch.setattr(recommendation_store, "_oldest_open_transaction", lambda session: datetime.min)
+    assert refresh_recommendations(session, optimizer) == 1
+    # Everything is re-evaluated now, the implemented resource included
+    assert refresh_recommendations(session, optimizer) == 2
+    rows = list_recommendations(session)
+    assert sorted((r.resource_id, r.implemented) for r in rows) == [(1, False), (2, False), (3, True)]
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_refresh_streams_candidates_in_chunks(session, monkeypatch, vectorized):
+    """Test that chunked candidate fetching yields the same recommendations."""
+    import recommendation_store
+    monkeypatch.setattr(recommendation_store, "REFRESH_CHUNK_SIZE", 1)
+    assert refresh_recommendations(session, OptimizationEngine(vectorized=vectorized)) == 2
+    assert [r.resource_id for r in list_recommendations(session)] == [1, 3]
+
+
+def test_implement_many_is_idempotent(session, monkeypatch):
+    """Test batched bulk implementation and its per-resource results on retry."""
+    import recommendation_store
+    monkeypatch.setattr(recommendation_store, "IMPLEMENT_BATCH_SIZE", 2)
+    refresh_recommendations(session, OptimizationEngine())
+
+    results = implement_many(session, [3, 1, 2, 99, 3])
+    assert [(r["resource_id"], r["status"]) for r in results] == [
+        (3, "implemented"), (1, "implemented"), (2, "no_recommendation"), (99, "not_found"),
+    ]
+    assert all(r.implemented for r in list_recommendations(session))
+
+    retry = implement_many(session, [1, 3])
+    assert [r["status"] for r in retry] == ["already_implemented", "already_implemented"]
+    assert retry[0]["implemented_at"] == results[1]["implemented_at"]
+
+
+def test_implement_many_by_filter(session):
+    """Test implementing every open recommendation matching a filter."""
+    refresh_recommendations(session, OptimizationEngine())
+    results = implement_many(session, recommendation_type="shrink", provider="aws")
+    assert [(r["resource_id"], r["status"]) for r in results] == [(3, "implemented")]
+    assert implement_many(session, recommendation_type="shrink") == []
+    assert [r.implemented for r in list_recommendations(session)] == [False, True]
+
+
+def test_accounts_are_refreshed_and_implemented_separately(session):
+    """Test that each account has its own recommendations, watermark and scope."""
+    session.add(Resource(id=4, account_id="team-a", name="web", type="instance", provider="aws",
+                         instance_type="t3.xlarge", cpu_utilization=10, memory_utilization=20, monthly_cost=150))
+    session.commit()
+    optimizer = OptimizationEngine()
+    assert refresh_recommendations(session, optimizer, "team-a") == 1
+    assert [r.resource_id for r in list_recommendations(session)] == [4]
+    assert refresh_accounts(session.get_bind(), optimizer, workers=4) == 2
+    assert refresh_accounts(session.get_bind(), optimizer, workers=4) == 0
+
+    assert fleet_summary(session, optimizer, "team-a")["open_recommendations"] == 1
+    assert fleet_summary(session, optimizer)["total_resources"] == 3
+    assert mark_implemented(session, 4) == []
+    assert [r["status"] for r in implement_many(session, [1, 4])] == ["implemented", "not_found"]
+    assert [r["status"] for r in implement_many(session, [4], account_id="team-a")] == ["implemented"]
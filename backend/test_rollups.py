@@ -0,0 +1,93 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+from catalog import load_catalog
+from fleetgen import generate
+from ingest import upsert_batch
+from models import CostRollup, Resource
+from optimizer import OptimizationEngine
+from recommendation_store import implement_many, mark_implemented, refresh_accounts, refresh_recommendations
+from rollups import cost_breakdown, rebuild_rollups
+
+
+def rollup_state(session):
+    return {
+        (r.account_id, r.provider, r.type, r.instance_type): (r.resources, r.monthly_cost, r.open_recommendations, r.potential_savings)
+        for r in session.exec(select(CostRollup)).all()
+    }
+
+
+def assert_matches_rebuild(session):
+    """The incrementally maintained table equals a recompute from scratch."""
+    incremental = rollup_state(session)
+    rebuild_rollups(session.connection())
+    rebuilt = rollup_state(session)
+    session.rollback()
+    assert incremental.keys() == rebuilt.keys()
+    for group, totals in rebuilt.items():
+        assert incremental[group] == pytest.approx(totals), group
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_ingest_and_recommendation_changes_keep_rollups_current(engine):
+    """Test that ingests, refreshes and implements maintain the rollups incrementally."""
+    rows = list(generate(500, seed=4, accounts=2))
+    with engine.begin() as conn:
+        upsert_batch(conn, rows)
+    with Session(engine) as session:
+        assert sum(totals[0] for totals in rollup_state(session).values()) == 500
+        assert {group[0] for group in rollup_state(session)} == {"account-00", "account-01"}
+        refresh_recommendations(session, OptimizationEngine(), "account-00")
+        assert_matches_rebuild(session)
+    refresh_accounts(engine, OptimizationEngine())
+
+    # Re-ingest some resources into other groups, at other costs and utilizations
+    moved = [{**row, "instance_type": "m5.large" if row["type"] == "instance" else None,
+              "cpu_utilization": 90, "monthly_cost": row["monthly_cost"] * 2} for row in rows[:100]]
+    with engine.begin() as conn:
+        upsert_batch(conn, moved + rows[100:150])
+    with Session(engine) as session:
+        assert_matches_rebuild(session)
+        refresh_recommendations(session, OptimizationEngine(), "account-01")
+        assert_matches_rebuild(session)
+
+        account = "account-01"
+        ids = session.exec(select(Resource.id).where(Resource.account_id == account)).all()
+        implement_many(session, ids[:200], account_id=account)
+        assert_matches_rebuild(session)
+        implement_many(session, recommendation_type="shrink", account_id=account)
+        assert_matches_rebuild(session)
+        mark_implemented(session, ids[-1], account)
+        assert_matches_rebuild(session)
+
+
+def test_cost_breakdown_groups_and_totals():
+    """Test grouping rollup rows by any field, including catalog family."""
+    rows = [
+        CostRollup(provider="aws", type="instance", instance_type="m5.large", resources=2, monthly_cost=140,
+                   open_recommendations=1, potential_savings=35),
+        CostRollup(provider="aws", type="instance", instance_type="m5.xlarge", resources=1, monthly_cost=140,
+                   open_recommendations=0, potential_savings=0),
+        CostRollup(provider="aws", type="storage", instance_type="", resources=3, monthly_cost=300,
+                   open_recommendations=2, potential_savings=150),
+    ]
+    by_family = cost_breakdown(rows, ["provider", "family"], load_catalog())
+    assert by_family["group_by"] == ["provider", "family"]
+    assert [(g["provider"], g["family"], g["resources"]) for g in by_family["groups"]] == [
+        ("aws", None, 3), ("aws", "general", 3),
+    ]
+    assert by_family["groups"][1]["savings_percentage"] == 12.5
+    assert by_family["totals"] == {"resources": 6, "monthly_cost": 580, "open_recommendations": 3,
+                                   "potential_savings": 185, "savings_percentage": 31.9}
+
+    assert cost_breakdown(rows, ["type"])["groups"][0] == {
+        "type": "storage", "resources": 3, "monthly_cost": 300, "open_recommendations": 2,
+        "potential_savings": 150, "savings_percentage": 50.0,
+    }
+    with pytest.raises(ValueError):
+        cost_breakdown(rows, ["region"])
@@ -0,0 +1,67 @@
+import threading
+import time
+import pytest
+from scheduler import RefreshScheduler
+
+
+def test_concurrent_refreshes_are_coalesced():
+    """Test that callers arriving during a run share the next run instead of each starting one."""
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return len(calls)
+
+    scheduler = RefreshScheduler(refresh)
+    first = threading.Thread(target=scheduler.refresh_now)
+    first.start()
+    started.wait()
+    waiters = [threading.Thread(target=scheduler.refresh_now) for _ in range(8)]
+    for t in waiters:
+        t.start()
+    while scheduler.coalesced < len(waiters):
+        time.sleep(0.001)
+    release.set()
+    for t in [first] + waiters:
+        t.join()
+
+    # One run in progress plus a single follow-up for everyone who arrived during it
+    assert len(calls) == 2
+    assert scheduler.runs == 2
+    assert scheduler.refreshed_at is not None and scheduler.age() >= 0
+
+
+def test_notify_wakes_background_thread():
+    """Test that a change signal triggers a refresh without waiting for the interval."""
+    done = threading.Event()
+    scheduler = RefreshScheduler(done.set, interval=3600)
+    scheduler.start()
+    try:
+        scheduler.notify()
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
+    assert scheduler.runs == 1
+
+
+def test_failed_refresh_keeps_last_snapshot():
+    """Test that a failing run is reported but the previous snapshot stays served."""
+    results = iter([1, RuntimeError("database unavailable")])
+
+    def refresh():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    scheduler = RefreshScheduler(refresh)
+    scheduler.refresh_now()
+    refreshed_at = scheduler.refreshed_at
+    with pytest.raises(RuntimeError):
+        scheduler.refresh_now()
+    assert scheduler.refreshed_at == refreshed_at
+    assert scheduler.stats()["last_result"] == 1
+    assert "database unavailable" in scheduler.last_error
@@ -0,0 +1,45 @@
+import gzip
+import json
+from datetime import datetime
+from models import RecommendationResponse, RecommendationsListResponse
+from serialization import RECOMMENDATION_FIELDS, encode_line, encode_recommendations, json_response, negotiate_encoding
+
+ROWS = [
+    # RECOMMENDATION_COLUMNS order: response fields, then id
+    (1, "downsize", "t3.xlarge - $150/month", "t3.large - $75/month", 74.99, 0.73, "Low utilization", False, 10),
+    (4, "shrink", "1000GB - $100/month", "700GB - $70/month", 30.000000000000004, 0.9, "Large volume", True, 11),
+]
+SUMMARY = {"total_resources": 8, "total_monthly_cost": 1234.5, "savings_percentage": 8.5}
+SNAPSHOT = {"refreshed_at": datetime(2024, 5, 1, 12, 30, 15, 250000), "snapshot_age_seconds": 4.2}
+
+
+def test_fast_encoding_matches_response_models():
+    """Test that the orjson path produces the same document as the response models."""
+    models = [RecommendationResponse(**dict(zip(RECOMMENDATION_FIELDS, row))) for row in ROWS]
+    expected = RecommendationsListResponse(recommendations=models, summary=SUMMARY, **SNAPSHOT).model_dump_json()
+    assert json.loads(encode_recommendations(ROWS, SUMMARY, **SNAPSHOT)) == json.loads(expected)
+    assert json.loads(encode_line(ROWS[0])) == json.loads(models[0].model_dump_json())
+    assert encode_line(ROWS[0]).endswith(b"\n")
+
+
+def test_negotiate_encoding():
+    """Test Accept-Encoding negotiation by q-value and server preference."""
+    assert negotiate_encoding("gzip, deflate", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("gzip, br", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip;q=0.8", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("*", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=0, identity", ["br", "gzip"]) is None
+    assert negotiate_encoding("", ["br", "gzip"]) is None
+
+
+def test_json_response_compresses_large_bodies():
+    """Test that only bodies over the size threshold are compressed."""
+    body = encode_recommendations(ROWS * 50, SUMMARY)
+    res = json_response(body, "gzip", min_size=1024)
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(res.body) == body
+
+    small = json_response(b"{}", "gzip", min_size=1024)
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in json_response(body, "gzip", min_size=None).headers
@@ -0,0 +1,46 @@
+import pytest
+from fleetgen import make_rows
+from optimizer import OptimizationEngine
+from rules import RuleThresholds
+from simulate import MAX_COMBINATIONS, build_snapshot, simulate
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    rows = make_rows(5_000, seed=11)
+    # Chunked like a streamed query
+    return rows, build_snapshot(OptimizationEngine(), [rows[:1_500], rows[1_500:]])
+
+
+def test_grid_matches_rule_evaluation(fleet):
+    """Test that every grid cell equals running the engine with those thresholds."""
+    rows, snapshot = fleet
+    result = simulate(snapshot, OptimizationEngine(), cpu_thresholds=[40, 20, 30, 30],
+                      memory_thresholds=[35, 60], storage_gb_thresholds=[250, 1000], shrink_factors=[0.5, 0.8])
+    assert result["total_resources"] == len(rows)
+    assert len(result["results"]) == 3 * 2 * 2 * 2
+    assert [r["cpu_threshold"] for r in result["results"][::8]] == [20, 30, 40]
+
+    for cell in result["results"]:
+        thresholds = RuleThresholds(
+            downsize_cpu_threshold=cell["cpu_threshold"], downsize_memory_threshold=cell["memory_threshold"],
+            shrink_storage_gb_threshold=cell["storage_gb_threshold"], shrink_factor=cell["shrink_factor"],
+        )
+        recommendations = OptimizationEngine(thresholds=thresholds).analyze_rows(rows)
+        assert cell["recommendations"] == len(recommendations)
+        assert cell["potential_savings"] == pytest.approx(sum(r["potential_saving"] for r in recommendations), abs=0.01)
+
+
+def test_defaults_and_limits(fleet):
+    """Test that omitted dimensions use the engine's thresholds and oversized grids are refused."""
+    rows, snapshot = fleet
+    optimizer = OptimizationEngine()
+    (cell,) = simulate(snapshot, optimizer)["results"]
+    assert cell["cpu_threshold"] == optimizer.rules.thresholds.downsize_cpu_threshold
+    assert cell["recommendations"] == len(optimizer.analyze_rows(rows))
+
+    too_many = list(range(int(MAX_COMBINATIONS ** 0.5) + 1))
+    with pytest.raises(ValueError):
+        simulate(snapshot, optimizer, cpu_thresholds=too_many, memory_thresholds=too_many)
+    with pytest.raises(ValueError):
+        simulate(snapshot, optimizer, shrink_factors=[1.5])
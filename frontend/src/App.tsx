@@ -1,5 +1,7 @@
 import { useEffect, useState } from 'react';
-import { resourcesApi, type Resource, type RecommendationsResponse } from '@/services/resources';
+import {
+  resourcesApi, subscribeToChanges, updateById, type Resource, type RecommendationsResponse,
+} from '@/services/resources';
 import ResourcesTable from '@/components/ResourcesTable';
 import RecommendationsPanel from '@/components/RecommendationsPanel';
 import SummaryHeader from '@/components/SummaryHeader';
@@ -34,8 +36,8 @@ export default function App() {
     setLoadingSummary(true);
     setSummaryError(undefined);
     try {
-      const data = await resourcesApi.getRecommendations();
-      setSummary(data.summary);
+      const data = await resourcesApi.getSummary();
+      setSummary(data);
     } catch (e: any) {
       setSummaryError(e.message || 'Failed to load summary');
     } finally {
@@ -57,6 +59,15 @@ export default function App() {
     checkHealth();
     fetchResources();
     fetchSummary();
+    // Apply pushed changes instead of re-fetching the lists
+    return subscribeToChanges({
+      resources: (changed) => setResources((prev) => updateById(prev, changed, (r) => r.id)),
+      summary: setSummary,
+      reset: () => {
+        fetchResources();
+        fetchSummary();
+      },
+    });
   }, []);
 
   return (
@@ -107,7 +118,7 @@ export default function App() {
             </div>
             {/* Recommendations panel */}
             <div className="card">
-              <RecommendationsPanel onImplement={fetchSummary} />
+              <RecommendationsPanel />
             </div>
           </div>
         </div>
@@ -1,11 +1,9 @@
 import React, { useEffect, useState } from 'react';
-import { type Recommendation, type RecommendationsResponse, resourcesApi } from '@/services/resources';
+import {
+  type Recommendation, type RecommendationsResponse, replaceOpenRecommendations, resourcesApi, subscribeToChanges,
+} from '@/services/resources';
 
-interface RecommendationsPanelProps {
-  onImplement?: () => void;
-}
-
-const RecommendationsPanel: React.FC<RecommendationsPanelProps> = ({ onImplement }) => {
+const RecommendationsPanel: React.FC = () => {
   const [recommendations, setRecommendations] = useState<Recommendation[]>([]);
   const [summary, setSummary] = useState<RecommendationsResponse['summary']>();
   const [loading, setLoading] = useState(true);
@@ -29,6 +27,19 @@ const RecommendationsPanel: React.FC<RecommendationsPanelProps> = ({ onImplement
 
   useEffect(() => {
     fetchRecommendations();
+    // Refreshes and implements (from any tab) arrive as deltas
+    return subscribeToChanges({
+      recommendations: (resourceIds, open) =>
+        setRecommendations((prev) => replaceOpenRecommendations(prev, resourceIds, open)),
+      implemented: ({ implemented }) => {
+        const ids = new Set(implemented.map((item) => item.resource_id));
+        setRecommendations((prev) =>
+          prev.map((rec) => (ids.has(rec.resource_id) ? { ...rec, implemented: true } : rec))
+        );
+      },
+      summary: setSummary,
+      reset: fetchRecommendations,
+    });
     // eslint-disable-next-line
   }, []);
 
@@ -42,8 +53,6 @@ const RecommendationsPanel: React.FC<RecommendationsPanelProps> = ({ onImplement
         )
       );
       setToast({ message: "Recommendation marked as implemented.", type: "success" });
-      if (onImplement) onImplement();
-      fetchRecommendations();
     } catch (e: any) {
       setToast({ message: e.message || "Failed to update.", type: "error" });
     } finally {
@@ -1,7 +1,9 @@
 import axios from 'axios';
 import type { AxiosResponse } from 'axios';
 
-const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
+export const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
+// Account the dashboard is scoped to; the backend uses its default account when unset
+export const ACCOUNT_ID = import.meta.env.VITE_ACCOUNT_ID;
 
 // Create axios instance with default config
 const apiClient = axios.create({
@@ -9,6 +11,7 @@ const apiClient = axios.create({
   timeout: 10000,
   headers: {
     'Content-Type': 'application/json',
+    ...(ACCOUNT_ID ? { 'X-Account-Id': ACCOUNT_ID } : {}),
   },
 });
 
@@ -1,4 +1,4 @@
-import apiClient from './api';
+import apiClient, { ACCOUNT_ID, API_BASE_URL } from './api';
 
 export interface Resource {
   id: number;
@@ -26,17 +26,119 @@ export interface Recommendation {
   implemented: boolean;
 }
 
+export interface Summary {
+  total_resources: number;
+  total_monthly_cost: number;
+  total_potential_savings: number;
+  open_recommendations: number;
+  savings_percentage: number;
+}
+
 export interface RecommendationsResponse {
   recommendations: Recommendation[];
-  summary: {
-    total_resources: number;
-    total_monthly_cost: number;
-    total_potential_savings: number;
-    open_recommendations: number;
-    savings_percentage: number;
-  };
+  summary: Summary;
+}
+
+export interface ImplementResult {
+  resource_id: number;
+  status: 'implemented' | 'already_implemented' | 'no_recommendation' | 'not_found';
+  implemented_at: string | null;
+}
+
+export interface BulkImplementResponse {
+  implemented: number;
+  results: ImplementResult[];
+}
+
+export type BreakdownField = 'provider' | 'type' | 'instance_type' | 'family';
+
+export interface CostTotals {
+  resources: number;
+  monthly_cost: number;
+  open_recommendations: number;
+  potential_savings: number;
+  savings_percentage: number;
+}
+
+export interface CostGroup extends CostTotals {
+  provider?: string | null;
+  type?: string | null;
+  instance_type?: string | null;
+  family?: string | null;
+}
+
+export interface CostBreakdown {
+  group_by: BreakdownField[];
+  groups: CostGroup[];
+  totals: CostTotals;
+}
+
+export interface ImplementedEvent {
+  implemented: { resource_id: number; implemented_at: string }[];
+}
+
+// Deltas pushed by GET /events (see backend/events.py)
+export interface ChangeHandlers {
+  // Changed resources, to merge by id
+  resources?: (resources: Resource[]) => void;
+  // The open recommendations of these resources are now exactly these
+  recommendations?: (resourceIds: number[], recommendations: Recommendation[]) => void;
+  implemented?: (event: ImplementedEvent) => void;
+  summary?: (summary: Summary) => void;
+  // Too much changed or events were missed: re-fetch everything
+  reset?: () => void;
 }
 
+const CHANGE_EVENTS: Record<string, (handlers: ChangeHandlers, data: any) => void> = {
+  resources: (h, data) => h.resources?.(data.resources),
+  recommendations: (h, data) => h.recommendations?.(data.resource_ids, data.recommendations),
+  implemented: (h, data) => h.implemented?.(data),
+  summary: (h, data) => h.summary?.(data),
+  reset: (h) => h.reset?.(),
+};
+
+// One EventSource per page, shared by every subscriber
+let changeSource: EventSource | null = null;
+const changeSubscribers = new Set<ChangeHandlers>();
+
+// Subscribe to the account's change feed; returns a function that unsubscribes.
+// EventSource reconnects by itself, resuming from the last event it saw.
+export const subscribeToChanges = (handlers: ChangeHandlers): (() => void) => {
+  changeSubscribers.add(handlers);
+  if (!changeSource) {
+    // EventSource can't send the X-Account-Id header, so the account goes in the query
+    const query = ACCOUNT_ID ? `?account=${encodeURIComponent(ACCOUNT_ID)}` : '';
+    changeSource = new EventSource(`${API_BASE_URL}/events${query}`);
+    for (const [event, dispatch] of Object.entries(CHANGE_EVENTS)) {
+      changeSource.addEventListener(event, (e) => {
+        const data = JSON.parse((e as MessageEvent).data);
+        changeSubscribers.forEach((subscriber) => dispatch(subscriber, data));
+      });
+    }
+  }
+  return () => {
+    changeSubscribers.delete(handlers);
+    if (changeSubscribers.size === 0 && changeSource) {
+      changeSource.close();
+      changeSource = null;
+    }
+  };
+};
+
+// Replace rows of a list that changed, matched by key, keeping its order
+export const updateById = <T>(list: T[], changed: T[], key: (item: T) => number): T[] => {
+  const updates = new Map(changed.map((item) => [key(item), item]));
+  return list.map((item) => updates.get(key(item)) ?? item);
+};
+
+// Swap the open recommendations of the given resources for their new ones
+export const replaceOpenRecommendations = (
+  list: Recommendation[], resourceIds: number[], open: Recommendation[],
+): Recommendation[] => {
+  const changed = new Set(resourceIds);
+  return [...list.filter((rec) => rec.implemented || !changed.has(rec.resource_id)), ...open];
+};
+
 export const resourcesApi = {
   // Get all resources with pagination
   getResources: async (limit = 20, offset = 0): Promise<Resource[]> => {
@@ -50,11 +152,30 @@ export const resourcesApi = {
     return response.data;
   },
 
+  // Get summary totals only (cached server-side)
+  getSummary: async (): Promise<Summary> => {
+    const response = await apiClient.get('/summary');
+    return response.data;
+  },
+
+  // Cost and savings per group, from server-side rollups
+  getCostBreakdown: async (groupBy: BreakdownField[] = ['provider', 'type', 'instance_type']): Promise<CostBreakdown> => {
+    const params = new URLSearchParams(groupBy.map((field) => ['group_by', field]));
+    const response = await apiClient.get(`/summary/breakdown?${params}`);
+    return response.data;
+  },
+
   // Mark recommendation as implemented
   implementRecommendation: async (resourceId: number): Promise<void> => {
     await apiClient.post(`/recommendations/${resourceId}/implement`);
   },
 
+  // Mark many recommendations as implemented in one request (safe to retry)
+  implementRecommendations: async (resourceIds: number[]): Promise<BulkImplementResponse> => {
+    const response = await apiClient.post('/recommendations/implement', { resource_ids: resourceIds });
+    return response.data;
+  },
+
   // Health check
   healthCheck: async (): Promise<{ status: string }> => {
     const response = await apiClient.get('/healthz');